@@ -3,4 +3,8 @@ import os
 __current_directory = os.path.dirname(os.path.abspath(__file__))
 ASSET_PATH = os.path.join(__current_directory, "assets")
 CREDENTIAL_FILE_PATH = os.path.join(os.getcwd(), "data", ".credentials")
+MEDIA_SYNC_STATE_FILE_PATH = os.path.join(os.getcwd(), "data", "media_sync_state.json")
+TASK_INDEX_FILE_PATH = os.path.join(os.getcwd(), "data", "task_index.db")
+TOKEN_STATE_FILE_PATH = os.path.join(os.getcwd(), "data", "token_state.db")
+LOGIN_LOCK_DIR_PATH = os.path.join(os.getcwd(), "data", "login_locks")
 APP_NAME = "Anki Sync Server"
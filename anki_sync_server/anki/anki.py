@@ -1,26 +1,57 @@
 import copy
+import logging
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import copy_context
 from threading import Lock
-from typing import List
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
-from anki.collection import Collection, SyncOutput, SyncStatus
+from anki.collection import AddNoteRequest, Collection, SyncOutput, SyncStatus
 from anki.notes import Note
+from anki.sync_pb2 import MediaSyncProgress
 
 from anki_sync_server.anki.cloze_note import ClozeNote
+from anki_sync_server.anki.group_commit import GroupCommitter
 from anki_sync_server.anki.media_creator import MediaCreator
+from anki_sync_server.anki.media_sync_lane import MediaSyncLane
+from anki_sync_server.anki.media_sync_state import MediaSyncState
 from anki_sync_server.anki.model_creator import ModelCreator
 from anki_sync_server.anki.note_creator import NoteCreator
+from anki_sync_server.anki.prepared_note import PreparedNote
+from anki_sync_server.anki.sync_freshness import SyncFreshnessTracker, SyncMarker
+from anki_sync_server.metrics import LOCK_HOLD_SECONDS, SYNC_OUTCOMES
 from anki_sync_server.setup.credential_storage import CredentialStorage
+from anki_sync_server.timeline import Timeline, active_timelines, recording, timed
 from anki_sync_server.tts.base import TtsService
 
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+# A note waiting to be committed, with the progress callback and the timelines
+# of the call that added it
+PendingNote = Tuple[PreparedNote, ProgressCallback | None, Tuple[Timeline, ...]]
+
+# Phases of adding notes, in the order they are reported to progress callbacks.
+PHASES = ["prepare", "pre_sync", "add", "sync", "media_sync"]
+
 
 class Anki:
+    MEDIA_SYNC_POLL_MIN_SECONDS = 0.02
+    MEDIA_SYNC_POLL_MAX_SECONDS = 1.0
+
     def __init__(
         self,
         collection: Collection,
         tts_service: TtsService,
         deck_name: str = "English Vocabulary",
         media_sync_timeout_seconds: int = 600,
+        group_commit_window_seconds: float = 0,
+        group_commit_max_notes: int = 50,
+        prepare_concurrency: int = 8,
+        sync_staleness_seconds: float = 0,
+        media_sync_state: MediaSyncState | None = None,
     ) -> None:
         self._lock = Lock()
         self._collection = collection
@@ -28,30 +59,323 @@ class Anki:
         self._model_creator = ModelCreator(collection)
         self._media_creator = MediaCreator(collection)
         self._anki_model = None
+        self._deck_id = None
+        # Whether a sync merged remote changes since the cache was checked
+        self._recheck_model_and_deck = False
         self._tts_service = tts_service
         self._note_creator = NoteCreator(self._media_creator, self._tts_service)
         self._auth = CredentialStorage().get_anki_session()
         self._media_sync_timeout_seconds = media_sync_timeout_seconds
+        self._group_committer = None
+        if group_commit_window_seconds > 0:
+            self._group_committer = GroupCommitter(
+                self._commit_notes,
+                window_seconds=group_commit_window_seconds,
+                max_items=group_commit_max_notes,
+            )
+        self._sync_freshness = SyncFreshnessTracker(sync_staleness_seconds)
+        self._prepare_executor = ThreadPoolExecutor(
+            max_workers=prepare_concurrency, thread_name_prefix="prepare-note"
+        )
+        self._media_sync_lane = None
+        if media_sync_state is not None:
+            self._media_sync_lane = MediaSyncLane(self._sync_media, media_sync_state)
+
+    def warm_up(self) -> None:
+        """Do the one-time work of the first note ahead of time.
 
-    def add_cloze_note(self, notes: List[ClozeNote]) -> Note:
+        Resolves the note type and deck, connects to the TTS API and pulls
+        changes from AnkiWeb, so that the first note is as fast as later ones.
+        """
+        self._tts_service.warm_up()
         with self._lock:
-            self._sync(True)
-            deck_id = self._collection.decks.id(self._deck_name)
+            self._resolve_model_and_deck()
+            if not self._sync_freshness.is_fresh(self._sync_marker()):
+                self._sync(True)
+
+    def media_sync_generation(self) -> int | None:
+        """The media sync generation that covers every note added so far.
+
+        Returns:
+            int | None: The generation to look up in ``MediaSyncState``, or
+            None if media is synced before ``add_cloze_note`` returns.
+        """
+        if self._media_sync_lane is None:
+            return None
+        return self._media_sync_lane.latest_generation()
+
+    def add_cloze_note(
+        self, notes: List[ClozeNote], on_progress: ProgressCallback | None = None
+    ) -> List[Note]:
+        """Add the notes to the collection and sync them to AnkiWeb.
+
+        Audio synthesis and media writes happen before the collection lock is
+        taken, so the lock is only held for the note insert and the syncs.
+        When group commit is enabled, notes submitted by concurrent callers
+        within the commit window share one pre-sync and one post-sync.
+
+        Returns:
+            List[Note]: The notes created for this call, in order.
+        """
+        results = self.add_cloze_notes(notes, on_progress)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def add_cloze_notes(
+        self, notes: List[ClozeNote], on_progress: ProgressCallback | None = None
+    ) -> List[Any]:
+        """Add the notes as one unit and report the outcome of each note.
+
+        The audio of all notes is synthesized concurrently, then the notes
+        are inserted under one lock acquisition with one sync round trip.
+        ``on_progress`` is called with a progress dictionary whenever a new
+        phase starts and while media is being synced.
+
+        Returns:
+            List[Any]: The created ``Note`` for each cloze note, or the
+            exception raised while preparing or adding it.
+        """
+        self._report_progress([on_progress], "prepare")
+        with timed("prepare"):
+            prepared_notes = self._prepare_notes(notes)
+        return self._commit_prepared_notes(prepared_notes, on_progress)
+
+    def add_prepared_notes(
+        self,
+        prepared_notes: List[PreparedNote],
+        on_progress: ProgressCallback | None = None,
+    ) -> List[Any]:
+        """Add notes synthesized elsewhere by ``NoteCreator.synthesize``.
+
+        Their media is written to the collection first, then the notes are
+        committed like in ``add_cloze_notes``.
+
+        Returns:
+            List[Any]: The created ``Note`` for each prepared note, or the
+            exception raised while writing its media or adding it.
+        """
+        return self._commit_prepared_notes(
+            [self._write_media(prepared_note) for prepared_note in prepared_notes],
+            on_progress,
+        )
+
+    def _commit_prepared_notes(
+        self, prepared_notes: List[Any], on_progress: ProgressCallback | None
+    ) -> List[Any]:
+        timelines = active_timelines()
+        ready_notes = [
+            (prepared_note, on_progress, timelines)
+            for prepared_note in prepared_notes
+            if not isinstance(prepared_note, Exception)
+        ]
+        committed_notes = iter(self._commit(ready_notes) if ready_notes else [])
+        return [
+            prepared_note
+            if isinstance(prepared_note, Exception)
+            else next(committed_notes)
+            for prepared_note in prepared_notes
+        ]
+
+    def _prepare_notes(self, notes: List[ClozeNote]) -> List[Any]:
+        if len(notes) == 1:
+            return [self._prepare_note(notes[0])]
+        # Each note runs in a copy of this context, to time its TTS calls
+        contexts = [copy_context() for _ in notes]
+        return list(
+            self._prepare_executor.map(
+                lambda context, note: context.run(self._prepare_note, note),
+                contexts,
+                notes,
+            )
+        )
+
+    def _prepare_note(self, cloze_note: ClozeNote) -> PreparedNote | Exception:
+        try:
+            return self._note_creator.prepare(cloze_note)
+        except Exception as e:
+            return e
+
+    def _write_media(self, prepared_note: PreparedNote) -> PreparedNote | Exception:
+        try:
+            return self._note_creator.write_media(prepared_note)
+        except Exception as e:
+            return e
+
+    def _commit(self, pending_notes: List[PendingNote]) -> List[Any]:
+        if self._group_committer is None:
+            return self._commit_notes(pending_notes)
+        with timed("group_commit"):
+            return self._group_committer.submit(pending_notes)
+
+    def _commit_notes(self, pending_notes: List[PendingNote]) -> List[Any]:
+        """Insert notes under one lock acquisition and one sync round trip.
+
+        Returns:
+            List[Any]: The created ``Note`` for each prepared note, or the
+            exception raised while adding it.
+        """
+        callbacks = list({id(cb): cb for _, cb, _ in pending_notes if cb}.values())
+        timelines = {
+            id(timeline): timeline
+            for _, _, note_timelines in pending_notes
+            for timeline in note_timelines
+        }
+
+        def report(phase: str, **details: Any) -> None:
+            self._report_progress(callbacks, phase, **details)
+
+        with recording(*timelines.values()), self._locked():
+            if not self._sync_freshness.is_fresh(self._sync_marker()):
+                report("pre_sync")
+                with timed("pre_sync"):
+                    self._sync(True, report)
+            report("add")
+            with timed("add", notes=len(pending_notes)):
+                results = self._add_prepared_notes(
+                    [prepared_note for prepared_note, _, _ in pending_notes]
+                )
 
-            if self._anki_model is None:
-                self._anki_model = self._model_creator.create_model()
+            if any(not isinstance(result, Exception) for result in results):
+                report("sync")
+                with timed("sync"):
+                    self._sync(report=report)
+            return results
 
-            for cloze_note in notes:
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the collection lock, timing how long it takes to get it and
+        how long it is held."""
+        with timed("lock_wait"):
+            self._lock.acquire()
+        acquired_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._lock.release()
+            LOCK_HOLD_SECONDS.observe(time.monotonic() - acquired_at)
+
+    def _add_prepared_notes(self, prepared_notes: List[PreparedNote]) -> List[Any]:
+        """Fill and insert notes. Must be called while holding the lock.
+
+        Returns:
+            List[Any]: The created ``Note`` for each prepared note, or the
+            exception raised while adding it.
+        """
+        deck_id = self._resolve_model_and_deck()
+
+        results: List[Any] = []
+        for prepared_note in prepared_notes:
+            try:
                 note = self._collection.new_note(self._anki_model)
-                note = self._note_creator.convert(note, cloze_note)
+                results.append(self._note_creator.fill(note, prepared_note))
+            except Exception as e:
+                results.append(e)
+
+        filled_notes = [
+            result for result in results if not isinstance(result, Exception)
+        ]
+        added_notes = iter(self._add_notes(filled_notes, deck_id))
+        return [
+            result if isinstance(result, Exception) else next(added_notes)
+            for result in results
+        ]
+
+    def _resolve_model_and_deck(self) -> int:
+        """Resolve the note type and the deck once and cache them.
+
+        Must be called while holding the lock.
+
+        Returns:
+            int: The deck id.
+        """
+        if self._recheck_model_and_deck:
+            # The note type or the deck may have been changed or deleted on
+            # another device
+            if self._anki_model is not None:
+                self._anki_model = self._collection.models.get(self._anki_model["id"])
+            if self._deck_id is not None and not self._collection.decks.get(
+                self._deck_id, default=False
+            ):
+                self._deck_id = None
+            self._recheck_model_and_deck = False
+        if self._anki_model is None:
+            self._anki_model = self._model_creator.create_model()
+        if self._deck_id is None:
+            self._deck_id = self._collection.decks.id(self._deck_name)
+        return self._deck_id
+
+    def _add_notes(self, notes: List[Note], deck_id: int) -> List[Any]:
+        """Add the notes in one backend call, as one transaction and undo entry.
+
+        If the backend rejects the batch, the notes are added one by one so
+        that only the failing notes are reported as failed.
+
+        Returns:
+            List[Any]: Each added ``Note``, or the exception raised while
+            adding it.
+        """
+        if not notes:
+            return []
+        try:
+            self._collection.add_notes(
+                [AddNoteRequest(note=note, deck_id=deck_id) for note in notes]
+            )
+            return notes
+        except Exception as e:
+            if len(notes) == 1:
+                return [e]
+
+        results: List[Any] = []
+        for note in notes:
+            try:
                 self._collection.add_note(note, deck_id)
+                results.append(note)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _sync_marker(self) -> SyncMarker:
+        return self._collection.db.scalar("select usn from col"), self._collection.mod
 
-            self._sync()
-            return note
+    @staticmethod
+    def _report_progress(
+        callbacks: List[ProgressCallback | None], phase: str, **details: Any
+    ) -> None:
+        progress = {
+            "phase": phase,
+            "current": PHASES.index(phase),
+            "total": len(PHASES),
+            **details,
+        }
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(progress)
+            except Exception:
+                logger.exception("Progress callback failed")
 
-    def _sync(self, allow_force_download: bool = False) -> None:
+    def _sync(
+        self,
+        allow_force_download: bool = False,
+        report: Callable[..., None] | None = None,
+    ) -> None:
+        try:
+            self._sync_collection(allow_force_download, report)
+        except BaseException:
+            SYNC_OUTCOMES.labels(outcome="error").inc()
+            self._sync_freshness.record_failure()
+            raise
+        self._sync_freshness.record_success(self._sync_marker())
+
+    def _sync_collection(
+        self, allow_force_download: bool, report: Callable[..., None] | None
+    ) -> None:
         sync_status = self._collection.sync_status(self._auth)
         if sync_status.required == SyncStatus.NO_CHANGES:
+            SYNC_OUTCOMES.labels(outcome="no_changes").inc()
             return
 
         sync_attempt_result = self._collection.sync_collection(self._auth, True)
@@ -63,18 +387,22 @@ class Anki:
             new_auth = self._auth
 
         if sync_attempt_result.required == SyncOutput.NO_CHANGES:
-            print("No changes is required")
-            self._sync_media(new_auth)
+            logger.info("No changes is required")
+            SYNC_OUTCOMES.labels(outcome="no_changes").inc()
+            self._request_media_sync(new_auth, report)
             return
 
         if sync_attempt_result.required == SyncOutput.NORMAL_SYNC:
-            print("Normal sync is required")
+            logger.info("Normal sync is required")
+            SYNC_OUTCOMES.labels(outcome="normal_sync").inc()
             self._collection.sync_collection(self._auth, True)
-            self._sync_media(new_auth)
+            self._recheck_model_and_deck = True
+            self._request_media_sync(new_auth, report)
             return
 
         if sync_attempt_result.required == SyncOutput.FULL_UPLOAD:
-            print("No data on server, skip.")
+            logger.info("No data on server, skip.")
+            SYNC_OUTCOMES.labels(outcome="full_upload").inc()
             return
 
         if (
@@ -83,22 +411,66 @@ class Anki:
         ):
             if not allow_force_download:
                 raise Exception("Failed to sync, force download is not allowed")
+            SYNC_OUTCOMES.labels(outcome="full_download").inc()
             self._collection.full_upload_or_download(
                 auth=new_auth, server_usn=None, upload=False
             )
-            self._sync_media(new_auth)
-
-    def _sync_media(self, new_auth) -> None:
-        print("Syncing media")
-        self._collection.sync_media(auth=new_auth)
-        synced = False
-        for _ in range(self._media_sync_timeout_seconds):
-            sync_status = self._collection.media_sync_status()
-            print(sync_status.progress)
-            if not sync_status.active:
-                synced = True
-                break
-            time.sleep(1)
-
-        if not synced:
-            raise Exception("Media sync timed out")
+            # The downloaded collection may have a different note type and deck
+            self._anki_model = None
+            self._deck_id = None
+            self._request_media_sync(new_auth, report)
+
+    def _request_media_sync(
+        self, new_auth, report: Callable[..., None] | None
+    ) -> None:
+        if self._media_sync_lane is None:
+            self._sync_media(new_auth, report)
+        else:
+            self._media_sync_lane.request(new_auth)
+
+    def _sync_media(self, new_auth, report: Callable[..., None] | None = None) -> None:
+        """Start a media sync and wait for it to finish.
+
+        The status is polled quickly at first and then with an increasing
+        interval, so short media syncs return almost immediately.
+        """
+        logger.info("Syncing media")
+        with timed("media_sync"):
+            self._collection.sync_media(auth=new_auth)
+            deadline = time.monotonic() + self._media_sync_timeout_seconds
+            interval = self.MEDIA_SYNC_POLL_MIN_SECONDS
+            reported_progress = None
+            while True:
+                sync_status = self._collection.media_sync_status()
+                if report is not None:
+                    media_progress = _parse_media_sync_progress(sync_status.progress)
+                    # Each report updates the state of every waiting caller
+                    if media_progress != reported_progress:
+                        report("media_sync", media=media_progress)
+                        reported_progress = media_progress
+                if not sync_status.active:
+                    return
+                if time.monotonic() >= deadline:
+                    raise Exception("Media sync timed out")
+                time.sleep(interval)
+                interval = min(interval * 2, self.MEDIA_SYNC_POLL_MAX_SECONDS)
+
+
+def _parse_media_sync_progress(progress: MediaSyncProgress) -> Dict[str, int]:
+    """Extract the counts from the backend's human-readable progress strings,
+    e.g. ``checked="Checked: 12"``, ``added="Added: 3↑ 0↓"``."""
+
+    def counts(text: str, size: int) -> List[int]:
+        numbers = [int(number) for number in re.findall(r"\d+", text)]
+        return (numbers + [0] * size)[:size]
+
+    (checked,) = counts(progress.checked, 1)
+    uploaded, downloaded = counts(progress.added, 2)
+    removed_remote, removed_local = counts(progress.removed, 2)
+    return {
+        "checked": checked,
+        "uploaded": uploaded,
+        "downloaded": downloaded,
+        "removedRemote": removed_remote,
+        "removedLocal": removed_local,
+    }
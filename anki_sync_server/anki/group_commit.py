@@ -0,0 +1,102 @@
+import time
+from threading import Condition, Event
+from typing import Any, Callable, Generic, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _PendingRequest(Generic[T]):
+    def __init__(self, items: List[T]) -> None:
+        self.items = items
+        self.results: List[Any] = []
+        self.error: BaseException | None = None
+        self.done = Event()
+
+
+class GroupCommitter(Generic[T, R]):
+    """Coalesce concurrent submissions into a single commit call.
+
+    The first caller to arrive becomes the leader of a group. With no commit
+    in flight, it commits its items right away, so a lone caller is not
+    delayed. Otherwise callers queue up behind the commit in flight, and once
+    it ends, or ``max_items`` items are pending, or the leader has waited
+    ``window_seconds``, the leader hands every pending item to ``commit`` in
+    one call. A slow commit thereby lets the following group grow.
+
+    ``commit`` must return one result per item, in order. A result may be an
+    exception instance to report a per-item failure; an exception raised by
+    ``commit`` itself fails every caller in the group.
+    """
+
+    def __init__(
+        self,
+        commit: Callable[[List[T]], List[Any]],
+        window_seconds: float = 0.5,
+        max_items: int = 50,
+    ) -> None:
+        self._commit = commit
+        self._window_seconds = window_seconds
+        self._max_items = max_items
+        self._condition = Condition()
+        self._pending: List[_PendingRequest[T]] = []
+        self._pending_items = 0
+        self._has_leader = False
+        self._commits_in_flight = 0
+
+    def submit(self, items: List[T]) -> List[Any]:
+        """Submit items and block until the group containing them is committed.
+
+        Returns:
+            List[Any]: The commit results for ``items``, in order.
+        """
+        request = _PendingRequest(items)
+        with self._condition:
+            self._pending.append(request)
+            self._pending_items += len(items)
+            is_leader = not self._has_leader
+            if is_leader:
+                self._has_leader = True
+            else:
+                self._condition.notify_all()
+
+        if is_leader:
+            self._lead()
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def _lead(self) -> None:
+        deadline = time.monotonic() + self._window_seconds
+        with self._condition:
+            while self._commits_in_flight and self._pending_items < self._max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            group = self._pending
+            self._pending = []
+            self._pending_items = 0
+            self._has_leader = False
+            self._commits_in_flight += 1
+
+        items = [item for request in group for item in request.items]
+        try:
+            results = self._commit(items)
+        except BaseException as e:
+            for request in group:
+                request.error = e
+                request.done.set()
+            return
+        finally:
+            with self._condition:
+                self._commits_in_flight -= 1
+                self._condition.notify_all()
+
+        offset = 0
+        for request in group:
+            request.results = results[offset : offset + len(request.items)]
+            offset += len(request.items)
+            request.done.set()
@@ -1,4 +1,4 @@
-import uuid
+import hashlib
 
 from anki.collection import Collection
 
@@ -10,7 +10,23 @@ class MediaCreator:
         self._collection = collection
 
     def create_media(self, data: bytes, filename_prefix: str, extension: str) -> str:
-        media_filename = f"{filename_prefix}-{uuid.uuid4()}.{extension}"
+        """Write the data to the media folder under a content-addressed name.
+
+        Identical data always maps to the same filename, so it is only written
+        and synced once.
+        """
+        media_filename = self.media_filename(data, filename_prefix, extension)
+        return self.write_media(media_filename, data)
+
+    @staticmethod
+    def media_filename(data: bytes, filename_prefix: str, extension: str) -> str:
+        digest = hashlib.sha1(data).hexdigest()
+        return f"{filename_prefix}-{digest}.{extension}"
+
+    def write_media(self, media_filename: str, data: bytes) -> str:
+        if self._collection.media.have(media_filename):
+            return media_filename
+
         thread = ThreadWithReturnValue(
             target=self._collection.media.write_data,
             args=(
@@ -0,0 +1,96 @@
+import logging
+import time
+from threading import Condition, Thread
+from typing import Any, Callable
+
+from anki_sync_server.anki.media_sync_state import MediaSyncState
+
+logger = logging.getLogger(__name__)
+
+
+class MediaSyncLane:
+    """Run media syncs in a background thread, off the collection lock.
+
+    Requests are coalesced: a sync starts once no new request arrived for
+    ``debounce_seconds``, or ``max_delay_seconds`` after the first pending
+    request, and covers every request made before it started. Failed syncs
+    are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        sync_media: Callable[[Any], None],
+        state: MediaSyncState,
+        debounce_seconds: float = 2,
+        max_delay_seconds: float = 10,
+        max_retry_delay_seconds: float = 300,
+    ) -> None:
+        self._sync_media = sync_media
+        self._state = state
+        self._debounce_seconds = debounce_seconds
+        self._max_delay_seconds = max_delay_seconds
+        self._max_retry_delay_seconds = max_retry_delay_seconds
+        self._condition = Condition()
+        self._auth = None
+        self._first_requested_at: float | None = None
+        self._last_requested_at: float | None = None
+        self._thread = Thread(target=self._run, name="media-sync-lane", daemon=True)
+        self._thread.start()
+
+    def request(self, auth) -> int:
+        """Schedule a media sync with the given auth.
+
+        Returns:
+            int: The generation that is synced once ``MediaSyncState``
+            reports it as completed.
+        """
+        with self._condition:
+            generation = self._state.request()
+            self._auth = auth
+            self._mark_pending()
+            return generation
+
+    def latest_generation(self) -> int:
+        return self._state.read()[0]
+
+    def _run(self) -> None:
+        retry_delay = self._debounce_seconds
+        while True:
+            auth, generation = self._wait_for_batch()
+            try:
+                self._sync_media(auth)
+            except Exception:
+                logger.exception("Background media sync failed")
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, self._max_retry_delay_seconds)
+                self._mark_pending()
+                continue
+            retry_delay = self._debounce_seconds
+            self._state.complete(generation)
+
+    def _wait_for_batch(self):
+        with self._condition:
+            while True:
+                if self._first_requested_at is None:
+                    self._condition.wait()
+                    continue
+                ready_at = min(
+                    self._last_requested_at + self._debounce_seconds,
+                    self._first_requested_at + self._max_delay_seconds,
+                )
+                now = time.monotonic()
+                if now >= ready_at:
+                    break
+                self._condition.wait(ready_at - now)
+
+            self._first_requested_at = None
+            self._last_requested_at = None
+            return self._auth, self._state.read()[0]
+
+    def _mark_pending(self) -> None:
+        with self._condition:
+            now = time.monotonic()
+            if self._first_requested_at is None:
+                self._first_requested_at = now
+            self._last_requested_at = now
+            self._condition.notify_all()
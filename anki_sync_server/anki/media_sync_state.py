@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+from threading import Lock
+from typing import Tuple
+
+
+class MediaSyncState:
+    """Generation counters of background media syncs, persisted in a small
+    JSON file so other processes can tell whether a note's media was synced.
+
+    Every media sync request gets the next ``requested`` generation. When a
+    media sync succeeds, ``completed`` is advanced to the last generation
+    requested before that sync started.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = Lock()
+
+    def request(self) -> int:
+        with self._lock:
+            requested, completed = self._read()
+            requested += 1
+            self._write(requested, completed)
+            return requested
+
+    def complete(self, generation: int) -> None:
+        with self._lock:
+            requested, completed = self._read()
+            self._write(requested, max(completed, generation))
+
+    def read(self) -> Tuple[int, int]:
+        """
+        Returns:
+            Tuple[int, int]: The last requested and last completed generation.
+        """
+        return self._read()
+
+    def is_synced(self, generation: int) -> bool:
+        return self._read()[1] >= generation
+
+    def _read(self) -> Tuple[int, int]:
+        try:
+            with open(self._path, "r") as file:
+                data = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return 0, 0
+        return data.get("requested", 0), data.get("completed", 0)
+
+    def _write(self, requested: int, completed: int) -> None:
+        directory = os.path.dirname(self._path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump({"requested": requested, "completed": completed}, file)
+        os.replace(tmp_path, self._path)
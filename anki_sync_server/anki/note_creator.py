@@ -1,48 +1,109 @@
-from typing import Tuple
+from typing import Dict, Tuple
 
 from anki.notes import Note
 
 from anki_sync_server.anki.cloze_note import ClozeNote
 from anki_sync_server.anki.media_creator import MediaCreator
+from anki_sync_server.anki.prepared_note import PreparedNote
+from anki_sync_server.timeline import timed
 from anki_sync_server.tts.base import TtsService
 from anki_sync_server.utils import remove_anki_cloze_tags, remove_html_tags
 
 
 class NoteCreator:
-    def __init__(self, media_creator: MediaCreator, tts_service: TtsService) -> None:
+    def __init__(
+        self, media_creator: MediaCreator | None, tts_service: TtsService
+    ) -> None:
+        """
+        Args:
+            media_creator: Writes media to the collection; may be None in
+                processes that only ``synthesize`` notes.
+            tts_service: Synthesizes the audio of the notes.
+        """
         self._media_creator = media_creator
         self._tts_service = tts_service
 
     def convert(self, empty_note: Note, cloze_note: ClozeNote) -> Note:
-        empty_note["Text"] = cloze_note["englishExample"]
-        empty_note["TextTranslation"] = cloze_note["exampleTranslation"]
-        empty_note["EnDefinition"] = cloze_note["englishDefinition"]
-        empty_note["DefinitionTranslation"] = cloze_note["definitionTranslation"]
-        empty_note["Word"] = cloze_note["word"]
-        empty_note["PartOfSpeech"] = cloze_note["partOfSpeech"]
-        empty_note["CefrLevel"] = cloze_note["cefrLevel"]
-        empty_note["Code"] = cloze_note["code"]
+        return self.fill(empty_note, self.prepare(cloze_note))
 
+    def prepare(self, cloze_note: ClozeNote) -> PreparedNote:
+        """Synthesize the audio and write the media files of a cloze note.
+
+        This does not touch the collection's notes, so it can run without
+        holding the collection lock.
+        """
         word_audio_file, text_audio_file = self._create_audio_files(
             cloze_note["word"], cloze_note["englishExample"]
         )
+        return PreparedNote(
+            self._build_fields(cloze_note, word_audio_file, text_audio_file)
+        )
+
+    def synthesize(self, cloze_note: ClozeNote) -> PreparedNote:
+        """Synthesize the audio of a cloze note without writing any media.
+
+        The audio is kept in ``PreparedNote.media`` so that the note can be
+        prepared on a node without the collection and written by
+        ``write_media`` where the collection lives.
+        """
+        extension = self._tts_service.get_file_extension()
+        word_audio = self._tts_service.generate_audio(cloze_note["word"])
+        text_audio = self._tts_service.generate_audio(
+            self._audio_text(cloze_note["englishExample"])
+        )
+        word_audio_file = MediaCreator.media_filename(
+            word_audio, "googletts", extension
+        )
+        text_audio_file = MediaCreator.media_filename(
+            text_audio, "googletts", extension
+        )
+        return PreparedNote(
+            self._build_fields(cloze_note, word_audio_file, text_audio_file),
+            {word_audio_file: word_audio, text_audio_file: text_audio},
+        )
 
-        empty_note["DefinitionAudio"] = "[sound:{}]".format(word_audio_file)
-        empty_note["TextAudio"] = "[sound:{}]".format(text_audio_file)
+    def write_media(self, prepared_note: PreparedNote) -> PreparedNote:
+        """Write the media still held by a synthesized note to the collection."""
+        with timed("media_write"):
+            for filename, data in prepared_note.media.items():
+                self._media_creator.write_media(filename, data)
+        return PreparedNote(prepared_note.fields)
 
+    def fill(self, empty_note: Note, prepared_note: PreparedNote) -> Note:
+        for name, value in prepared_note.fields.items():
+            empty_note[name] = value
         return empty_note
 
+    @staticmethod
+    def _build_fields(
+        cloze_note: ClozeNote, word_audio_file: str, text_audio_file: str
+    ) -> Dict[str, str]:
+        return {
+            "Text": cloze_note["englishExample"],
+            "TextTranslation": cloze_note["exampleTranslation"],
+            "EnDefinition": cloze_note["englishDefinition"],
+            "DefinitionTranslation": cloze_note["definitionTranslation"],
+            "Word": cloze_note["word"],
+            "PartOfSpeech": cloze_note["partOfSpeech"],
+            "CefrLevel": cloze_note["cefrLevel"],
+            "Code": cloze_note["code"],
+            "DefinitionAudio": "[sound:{}]".format(word_audio_file),
+            "TextAudio": "[sound:{}]".format(text_audio_file),
+        }
+
+    @staticmethod
+    def _audio_text(english_example: str) -> str:
+        return remove_anki_cloze_tags(remove_html_tags(english_example))
+
     def _create_audio_files(self, word: str, english_example: str) -> Tuple[str, str]:
-        word_audio_file = self._media_creator.create_media(
-            self._tts_service.generate_audio(word),
-            "googletts",
-            ".mp3",
-        )
-        text_audio_file = self._media_creator.create_media(
-            self._tts_service.generate_audio(
-                remove_anki_cloze_tags(remove_html_tags(english_example))
-            ),
-            "googletts",
-            ".mp3",
-        )
+        extension = self._tts_service.get_file_extension()
+        word_audio = self._tts_service.generate_audio(word)
+        text_audio = self._tts_service.generate_audio(self._audio_text(english_example))
+        with timed("media_write"):
+            word_audio_file = self._media_creator.create_media(
+                word_audio, "googletts", extension
+            )
+            text_audio_file = self._media_creator.create_media(
+                text_audio, "googletts", extension
+            )
         return word_audio_file, text_audio_file
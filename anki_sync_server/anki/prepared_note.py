@@ -0,0 +1,38 @@
+import base64
+from typing import Any, Dict
+
+
+class PreparedNote:
+    """Field values of a cloze note whose audio has already been synthesized,
+    ready to be added to the collection.
+
+    ``media`` holds the audio files that still have to be written to the
+    media folder, keyed by filename. It is empty when they were written
+    while preparing the note.
+    """
+
+    def __init__(
+        self, fields: Dict[str, str], media: Dict[str, bytes] | None = None
+    ) -> None:
+        self.fields = fields
+        self.media = media or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to JSON-serializable data, e.g. to pass it between tasks."""
+        return {
+            "fields": self.fields,
+            "media": {
+                filename: base64.b64encode(data).decode("ascii")
+                for filename, data in self.media.items()
+            },
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "PreparedNote":
+        return PreparedNote(
+            data["fields"],
+            {
+                filename: base64.b64decode(encoded)
+                for filename, encoded in data.get("media", {}).items()
+            },
+        )
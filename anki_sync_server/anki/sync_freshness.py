@@ -0,0 +1,43 @@
+import time
+from threading import Lock
+from typing import Callable, Tuple
+
+# (synced USN, collection modification time) recorded right after a sync
+SyncMarker = Tuple[int, int]
+
+
+class SyncFreshnessTracker:
+    """Track whether the collection was synced recently enough to skip a
+    pre-sync round trip to AnkiWeb.
+
+    The collection counts as fresh when the last sync succeeded less than
+    ``staleness_seconds`` ago, no sync has failed since, and the collection's
+    sync marker has not changed, i.e. nothing else wrote to it in between.
+    """
+
+    def __init__(
+        self,
+        staleness_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._staleness_seconds = staleness_seconds
+        self._clock = clock
+        self._lock = Lock()
+        self._synced_at: float | None = None
+        self._marker: SyncMarker | None = None
+
+    def is_fresh(self, marker: SyncMarker) -> bool:
+        with self._lock:
+            if self._synced_at is None or marker != self._marker:
+                return False
+            return self._clock() - self._synced_at < self._staleness_seconds
+
+    def record_success(self, marker: SyncMarker) -> None:
+        with self._lock:
+            self._synced_at = self._clock()
+            self._marker = marker
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._synced_at = None
+            self._marker = None
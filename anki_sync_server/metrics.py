@@ -0,0 +1,151 @@
+"""Prometheus metrics of the API and worker processes.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set, every process writes its samples to
+files in that directory and ``create_registry`` aggregates them, so that one
+scrape covers all uWSGI workers or Celery pool processes. The directory must be
+emptied before the processes start, and ``mark_dead`` called as each one exits.
+"""
+
+import logging
+import os
+from typing import Any, Dict, Iterable
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+logger = logging.getLogger(__name__)
+
+# From audio cache hits and media writes to full syncs
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+
+TTS_SECONDS = Histogram(
+    "anki_tts_seconds",
+    "Time to get the audio of a text, from the audio cache or the TTS API",
+    ["cached"],
+    buckets=LATENCY_BUCKETS,
+)
+TTS_BYTES = Counter("anki_tts_bytes", "Bytes of audio synthesized by the TTS API")
+MEDIA_WRITE_SECONDS = Histogram(
+    "anki_media_write_seconds",
+    "Time to write the media files of a note to the collection",
+    buckets=LATENCY_BUCKETS,
+)
+LOCK_WAIT_SECONDS = Histogram(
+    "anki_lock_wait_seconds",
+    "Time waiting for the collection lock",
+    buckets=LATENCY_BUCKETS,
+)
+LOCK_HOLD_SECONDS = Histogram(
+    "anki_lock_hold_seconds",
+    "Time the collection lock is held to add notes",
+    buckets=LATENCY_BUCKETS,
+)
+SYNC_SECONDS = Histogram(
+    "anki_sync_seconds",
+    "Duration of collection syncs, before (pre_sync) and after (sync) adding notes",
+    ["phase"],
+    buckets=LATENCY_BUCKETS,
+)
+MEDIA_SYNC_SECONDS = Histogram(
+    "anki_media_sync_seconds", "Duration of media syncs", buckets=LATENCY_BUCKETS
+)
+SYNC_OUTCOMES = Counter(
+    "anki_sync_outcomes",
+    "Collection syncs by the kind of sync AnkiWeb required",
+    ["outcome"],
+)
+TASK_SECONDS = Histogram(
+    "anki_task_seconds",
+    "Time from queueing a card creation task to its end",
+    ["task", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSIONS = Counter(
+    "anki_admissions",
+    "Card creation requests by admission decision: admitted, or rejected because"
+    " the queue is full or the client's quota is used up",
+    ["decision"],
+)
+
+
+def observe_phase(phase: str, seconds: float, details: Dict[str, Any]) -> None:
+    """Observe a phase timed with ``timeline.timed`` in its histogram, if any."""
+    if phase == "tts":
+        cached = "true" if details.get("cached") else "false"
+        TTS_SECONDS.labels(cached=cached).observe(seconds)
+    elif phase == "media_write":
+        MEDIA_WRITE_SECONDS.observe(seconds)
+    elif phase == "lock_wait":
+        LOCK_WAIT_SECONDS.observe(seconds)
+    elif phase in ("pre_sync", "sync"):
+        SYNC_SECONDS.labels(phase=phase).observe(seconds)
+    elif phase == "media_sync":
+        MEDIA_SYNC_SECONDS.observe(seconds)
+
+
+class QueueDepthCollector:
+    """Messages waiting in each broker queue, read when scraped."""
+
+    def __init__(self, celery_app, queues: Iterable[str]) -> None:
+        self._celery_app = celery_app
+        self._queues = list(queues)
+
+    def describe(self):
+        # Keeps the registry from collecting, i.e. connecting to the broker,
+        # when the collector is registered
+        yield self._gauge()
+
+    def collect(self):
+        gauge = self._gauge()
+        try:
+            with self._celery_app.connection_for_read() as connection:
+                channel = connection.default_channel
+                for queue in self._queues:
+                    declared = channel.queue_declare(queue=queue, passive=True)
+                    gauge.add_metric([queue], declared.message_count)
+        except Exception:
+            logger.exception("Failed to read the broker queue depth")
+        yield gauge
+
+    @staticmethod
+    def _gauge() -> GaugeMetricFamily:
+        return GaugeMetricFamily(
+            "anki_queue_depth", "Messages waiting in the broker queue", labels=["queue"]
+        )
+
+
+def create_registry(*collectors) -> CollectorRegistry:
+    """The registry to expose: the samples of all processes in multiprocess
+    mode, of this process otherwise, and those of ``collectors``."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    for collector in collectors:
+        registry.register(collector)
+    return registry
+
+
+def mark_dead() -> None:
+    """Drop the live gauge samples of this process from the multiprocess
+    directory, as the process exits."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        mark_process_dead(os.getpid())
@@ -1,12 +1,21 @@
+import logging
 import os
-from threading import Lock
+from threading import Lock, Thread
+from typing import TYPE_CHECKING
 
-from anki_sync_server import CREDENTIAL_FILE_PATH
-from anki_sync_server.anki.anki import Anki
+from anki_sync_server import CREDENTIAL_FILE_PATH, MEDIA_SYNC_STATE_FILE_PATH
+from anki_sync_server.anki.media_sync_state import MediaSyncState
 from anki_sync_server.setup.credential_storage import CredentialStorage
 from anki_sync_server.thread import ThreadWithReturnValue
+from anki_sync_server.tts.audio_cache import AudioCache
+from anki_sync_server.tts.connection_pool import HttpsConnectionPool
 from anki_sync_server.tts.google import GcpTtsService
-from anki_sync_server.utils import create_anki_collection
+from anki_sync_server.tts.transcoder import AudioTranscoder
+
+if TYPE_CHECKING:
+    from anki_sync_server.anki.note_creator import NoteCreator
+
+logger = logging.getLogger(__name__)
 
 if not os.path.exists(CREDENTIAL_FILE_PATH):
     raise Exception(
@@ -20,6 +29,50 @@ CredentialStorage().load(CREDENTIAL_FILE_PATH)
 # Lazy initialization to support multi-process workers
 _anki = None
 _anki_lock = Lock()
+_note_synthesizer = None
+_note_synthesizer_lock = Lock()
+
+
+def prepare_concurrency() -> int:
+    """Notes of a task whose audio is synthesized at once."""
+    return int(os.getenv("ANKI_PREPARE_CONCURRENCY", "8"))
+
+
+def _tts_connection_pool_size() -> int:
+    """Connections to the TTS API per process, by default one for every note
+    the tasks of the worker may synthesize at once."""
+    worker_concurrency = int(os.getenv("CELERY_WORKER_CONCURRENCY", "1"))
+    default_size = worker_concurrency * prepare_concurrency()
+    return int(os.getenv("TTS_CONNECTION_POOL_SIZE", str(default_size)))
+
+
+def _create_tts_service() -> GcpTtsService:
+    tts_service = GcpTtsService(
+        CredentialStorage().get_gcp_tts_api_key(),
+        connection_pool=HttpsConnectionPool(
+            GcpTtsService.HOST, max_size=_tts_connection_pool_size()
+        ),
+        audio_encoding=os.getenv("TTS_AUDIO_ENCODING", "MP3"),
+    )
+    transcode_format = os.getenv("TTS_TRANSCODE_FORMAT", "")
+    if transcode_format:
+        tts_service.set_transcoder(
+            AudioTranscoder(
+                transcode_format,
+                bitrate=os.getenv("TTS_TRANSCODE_BITRATE", "32k"),
+                trim_silence=os.getenv("TTS_TRIM_SILENCE", "true").lower() == "true",
+            )
+        )
+    tts_cache_max_mb = int(os.getenv("TTS_CACHE_MAX_MB", "512"))
+    if tts_cache_max_mb > 0:
+        tts_cache_dir = os.path.join(os.getcwd(), "data", "tts_cache")
+        tts_service.set_audio_cache(
+            AudioCache(
+                os.getenv("TTS_CACHE_DIR", tts_cache_dir),
+                tts_cache_max_mb * 1024 * 1024,
+            )
+        )
+    return tts_service
 
 
 def _get_anki():
@@ -29,17 +82,73 @@ def _get_anki():
         with _anki_lock:
             # Double-check locking pattern
             if _anki is None:
+                # Imported here, so that processes which only queue tasks
+                # never load the Anki backend
+                from anki_sync_server.anki.anki import Anki
+                from anki_sync_server.utils import create_anki_collection
+
                 print("Creating Anki collection")
                 _collection_thread = ThreadWithReturnValue(target=create_anki_collection)
                 _collection_thread.start()
                 collection = _collection_thread.join()
                 
                 print("Loading Anki wrapper")
-                tts_service = GcpTtsService(CredentialStorage().get_gcp_tts_api_key())
-                _anki = Anki(collection, tts_service)
+                tts_service = _create_tts_service()
+                media_sync_state = None
+                if os.getenv("ANKI_BACKGROUND_MEDIA_SYNC", "false").lower() == "true":
+                    media_sync_state = MediaSyncState(MEDIA_SYNC_STATE_FILE_PATH)
+                _anki = Anki(
+                    collection,
+                    tts_service,
+                    group_commit_window_seconds=int(
+                        os.getenv("ANKI_GROUP_COMMIT_WINDOW_MS", "0")
+                    )
+                    / 1000,
+                    group_commit_max_notes=int(
+                        os.getenv("ANKI_GROUP_COMMIT_MAX_NOTES", "50")
+                    ),
+                    sync_staleness_seconds=float(
+                        os.getenv("ANKI_SYNC_STALENESS_SECONDS", "30")
+                    ),
+                    prepare_concurrency=prepare_concurrency(),
+                    media_sync_state=media_sync_state,
+                )
     return _anki
 
 
+def get_note_synthesizer() -> "NoteCreator":
+    """Get or create a note creator that only synthesizes audio, for workers
+    of the two-stage pipeline that never open the collection."""
+    global _note_synthesizer
+    if _note_synthesizer is None:
+        with _note_synthesizer_lock:
+            if _note_synthesizer is None:
+                from anki_sync_server.anki.note_creator import NoteCreator
+
+                _note_synthesizer = NoteCreator(None, _create_tts_service())
+    return _note_synthesizer
+
+
+def warm_up() -> None:
+    """Open the collection, resolve the note type and deck, connect to the TTS
+    API and sync, if enabled with ``ANKI_WARM_UP``."""
+    if os.getenv("ANKI_WARM_UP", "false").lower() != "true":
+        return
+    try:
+        _get_anki().warm_up()
+    except Exception:
+        logger.exception("Warm-up failed")
+
+
+def start_warm_up() -> None:
+    """Warm up in the background, so the process can start serving meanwhile.
+
+    Requests arriving during the warm-up wait for it to finish instead of
+    repeating it.
+    """
+    Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
 # Provide a property-like access pattern for backwards compatibility
 class _AnkiProxy:
     """Proxy object that provides lazy initialization of the Anki instance."""
@@ -0,0 +1,84 @@
+import math
+import time
+from typing import Callable
+
+from anki_sync_server.metrics import ADMISSIONS
+from anki_sync_server.tasks.task_index import TaskIndex
+
+# Tasks still unfinished after this long are assumed lost, e.g. with a worker
+OUTSTANDING_TASK_WINDOW_SECONDS = 3600
+# Period over which the throughput of the workers is measured
+THROUGHPUT_WINDOW_SECONDS = 300
+MAX_RETRY_AFTER_SECONDS = 300
+
+
+class AdmissionControl:
+    """Decides whether notes may be queued, by how many notes are already
+    waiting in the queue, in total and per client.
+
+    The counts come from the task index, which all API processes share; tasks
+    started longer than ``task_time_limit_seconds`` ago are not counted. The
+    limits are soft: processes admitting notes at the same time may exceed
+    them by the notes of one request each. A request is always admitted when
+    nothing is queued, so that a batch larger than a limit can still run.
+    """
+
+    def __init__(
+        self,
+        task_index: TaskIndex,
+        max_queued_notes: int = 1000,
+        max_queued_notes_per_client: int = 200,
+        task_time_limit_seconds: float | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._task_index = task_index
+        self._max_queued_notes = max_queued_notes
+        self._max_queued_notes_per_client = max_queued_notes_per_client
+        self._task_time_limit_seconds = task_time_limit_seconds
+        self._clock = clock
+
+    def admit(self, client: str, note_count: int) -> int | None:
+        """Admit ``note_count`` notes from the client into the queue.
+
+        Returns:
+            None if they are admitted, and otherwise the seconds after which
+            the workers are expected to have made room for them
+        """
+        now = self._clock()
+        # A task still started after its time limit is stuck or its worker
+        # is gone, and is no longer taking up room in the queue
+        started_since = (
+            None
+            if self._task_time_limit_seconds is None
+            else now - self._task_time_limit_seconds
+        )
+        queued, client_queued = self._task_index.queued_notes(
+            now - OUTSTANDING_TASK_WINDOW_SECONDS, client, started_since
+        )
+        if self._exceeds(queued, note_count, self._max_queued_notes):
+            decision = "queue_full"
+            excess = queued + note_count - self._max_queued_notes
+        elif self._exceeds(
+            client_queued, note_count, self._max_queued_notes_per_client
+        ):
+            decision = "client_quota"
+            excess = client_queued + note_count - self._max_queued_notes_per_client
+        else:
+            ADMISSIONS.labels(decision="admitted").inc()
+            return None
+
+        ADMISSIONS.labels(decision=decision).inc()
+        return self._retry_after(excess, now)
+
+    @staticmethod
+    def _exceeds(queued: int, note_count: int, limit: int) -> bool:
+        return limit > 0 and queued > 0 and queued + note_count > limit
+
+    def _retry_after(self, excess: int, now: float) -> int:
+        """Seconds for the workers to finish ``excess`` notes at their recent
+        throughput."""
+        finished = self._task_index.finished_notes(now - THROUGHPUT_WINDOW_SECONDS)
+        if finished == 0:
+            return MAX_RETRY_AFTER_SECONDS
+        seconds = excess / (finished / THROUGHPUT_WINDOW_SECONDS)
+        return min(max(math.ceil(seconds), 1), MAX_RETRY_AFTER_SECONDS)
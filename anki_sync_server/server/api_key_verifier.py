@@ -0,0 +1,166 @@
+import fcntl
+import hashlib
+import hmac
+import math
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Iterator, Tuple
+
+import bcrypt
+
+from anki_sync_server.sqlite_store import SqliteStore
+
+# Seconds over which login attempts are counted per client
+_THROTTLE_WINDOW_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS login_attempts (
+    client TEXT NOT NULL,
+    attempted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS login_attempts_client
+    ON login_attempts (client, attempted_at);
+CREATE INDEX IF NOT EXISTS login_attempts_attempted_at
+    ON login_attempts (attempted_at);
+"""
+
+
+class ApiKeyVerifier:
+    """Checks the API key presented to /login against its bcrypt hash, without
+    letting login attempts take over the API processes.
+
+    - At most ``max_concurrent`` hashes run at a time across all processes,
+      each holding a lock file in ``lock_dir``. Attempts beyond that fail fast.
+    - Each client gets ``attempts_per_minute`` hashes per minute across all
+      processes, counted in a SQLite table in ``lock_dir``. Attempts that fail
+      fast are not counted.
+    - A key that was verified is remembered for ``cache_seconds`` by its HMAC
+      under a key of this process, so repeated logins skip the hash.
+    """
+
+    def __init__(
+        self,
+        lock_dir: str,
+        max_concurrent: int = 1,
+        attempts_per_minute: int = 10,
+        cache_seconds: float = 300,
+        max_clients: int = 10000,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._lock_dir = lock_dir
+        self._max_concurrent = max_concurrent
+        self._attempts_per_minute = attempts_per_minute
+        self._cache_seconds = cache_seconds
+        self._max_clients = max_clients
+        self._clock = clock
+        self._lock = Lock()
+        self._attempts = SqliteStore(os.path.join(lock_dir, "attempts.db"), _SCHEMA)
+        self._hmac_key = os.urandom(32)
+        # HMAC of a verified key -> (hash it was verified against, expiry time)
+        self._verified: OrderedDict[bytes, Tuple[bytes, float]] = OrderedDict()
+
+    def verify(
+        self, client: str, api_key: str, hashed_api_key: bytes
+    ) -> Tuple[bool, float | None]:
+        """verify the API key presented by the client
+
+        Returns:
+            Tuple[bool, float | None]: Whether the key is valid, and the seconds
+            after which the client may retry if the attempt was throttled
+            instead of checked
+        """
+        digest = hmac.new(self._hmac_key, api_key.encode(), hashlib.sha256).digest()
+        if self._is_verified(digest, hashed_api_key):
+            return True, None
+
+        # Checked before taking a slot, so that a throttled client does not
+        # keep other clients from one
+        retry_after = self._throttle(client, record=False)
+        if retry_after is not None:
+            return False, retry_after
+
+        with self._slot() as acquired:
+            if not acquired:
+                return False, 1
+            retry_after = self._throttle(client, record=True)
+            if retry_after is not None:
+                return False, retry_after
+            is_valid = bcrypt.checkpw(api_key.encode(), hashed_api_key)
+
+        if is_valid:
+            self._remember(digest, hashed_api_key)
+        return is_valid, None
+
+    def _is_verified(self, digest: bytes, hashed_api_key: bytes) -> bool:
+        with self._lock:
+            entry = self._verified.get(digest)
+            if entry is None:
+                return False
+            verified_hash, expires_at = entry
+            if verified_hash != hashed_api_key or self._clock() >= expires_at:
+                del self._verified[digest]
+                return False
+            return True
+
+    def _remember(self, digest: bytes, hashed_api_key: bytes) -> None:
+        if self._cache_seconds <= 0:
+            return
+        with self._lock:
+            self._verified[digest] = (
+                hashed_api_key,
+                self._clock() + self._cache_seconds,
+            )
+            self._verified.move_to_end(digest)
+            while len(self._verified) > self._max_clients:
+                self._verified.popitem(last=False)
+
+    def _throttle(self, client: str, record: bool) -> float | None:
+        """The seconds until the client may attempt again, or None after
+        counting an attempt if ``record`` is set."""
+        now = self._clock()
+        with self._attempts.connect() as connection:
+            if record:
+                # Counting and recording in one write transaction keeps
+                # processes from both taking the last attempt
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute(
+                    "DELETE FROM login_attempts WHERE attempted_at <= ?",
+                    (now - _THROTTLE_WINDOW_SECONDS,),
+                )
+            count, first_attempted_at = connection.execute(
+                "SELECT COUNT(*), MIN(attempted_at) FROM login_attempts"
+                " WHERE client = ? AND attempted_at > ?",
+                (client, now - _THROTTLE_WINDOW_SECONDS),
+            ).fetchone()
+            if count >= self._attempts_per_minute:
+                return math.ceil(first_attempted_at + _THROTTLE_WINDOW_SECONDS - now)
+            if record:
+                connection.execute(
+                    "INSERT INTO login_attempts (client, attempted_at) VALUES (?, ?)",
+                    (client, now),
+                )
+        return None
+
+    @contextmanager
+    def _slot(self) -> Iterator[bool]:
+        """Hold one of the lock files, if any is free."""
+        os.makedirs(self._lock_dir, exist_ok=True)
+        for index in range(self._max_concurrent):
+            fd = os.open(
+                os.path.join(self._lock_dir, f"{index}.lock"), os.O_RDWR | os.O_CREAT
+            )
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                yield True
+            finally:
+                # Closing the file releases the lock
+                os.close(fd)
+            return
+        yield False
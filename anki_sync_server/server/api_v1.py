@@ -1,21 +1,286 @@
+import ipaddress
+import json
+import logging
+import math
+import os
+import socket
+import sqlite3
+import time
 from datetime import datetime, timedelta, timezone
+from queue import Empty
+from threading import BoundedSemaphore
+from urllib.parse import urlparse
 
-import bcrypt
-from flask import Blueprint, jsonify, make_response, request
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from flask import Blueprint, Response, jsonify, make_response, request
 from flask_restful import Api, Resource, abort
 from marshmallow import ValidationError
 
+from anki_sync_server import LOGIN_LOCK_DIR_PATH
 from anki_sync_server.anki.cloze_note import ClozeNote as ClozeNoteScheme
 from anki_sync_server.server import anki
+from anki_sync_server.server.admission_control import AdmissionControl
+from anki_sync_server.server.api_key_verifier import ApiKeyVerifier
 from anki_sync_server.server.authentication import token_required
 from anki_sync_server.server.task_status import TaskStatus
+from anki_sync_server.server.task_watcher import TERMINAL_STATUSES, TaskWatcher
 from anki_sync_server.server.token_issuer import TokenIssuer
 from anki_sync_server.setup.credential_storage import CredentialStorage
-from anki_sync_server.tasks.card_creation_task import add_cloze_note_task
+from anki_sync_server.tasks.card_creation_task import (
+    add_cloze_note_task,
+    add_cloze_notes_task,
+    serialize_note_results,
+)
+from anki_sync_server.tasks.card_pipeline_task import (
+    enqueue_cloze_note_pipeline,
+    enqueue_cloze_notes_pipeline,
+    two_stage_pipeline_enabled,
+)
+from anki_sync_server.tasks.celery_app import celery_app, task_index
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint("api_v1", __name__)
 api = Api(bp)
 
+api_key_verifier = ApiKeyVerifier(
+    LOGIN_LOCK_DIR_PATH,
+    max_concurrent=int(os.getenv("LOGIN_MAX_CONCURRENT", "1")),
+    attempts_per_minute=int(os.getenv("LOGIN_ATTEMPTS_PER_MINUTE", "10")),
+    cache_seconds=float(os.getenv("LOGIN_CACHE_SECONDS", "300")),
+)
+
+admission_control = AdmissionControl(
+    task_index,
+    max_queued_notes=int(os.getenv("ANKI_MAX_QUEUED_NOTES", "1000")),
+    max_queued_notes_per_client=int(
+        os.getenv("ANKI_MAX_QUEUED_NOTES_PER_CLIENT", "200")
+    ),
+    task_time_limit_seconds=celery_app.conf.task_time_limit,
+)
+
+
+def request_client() -> str:
+    """The address of the client. Behind nginx, which passes it on as
+    X-Real-IP, TRUST_PROXY_HEADERS is set; otherwise clients could forge the
+    header, and the address of the connection is used."""
+    if os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true":
+        return request.headers.get("X-Real-IP", request.remote_addr)
+    return request.remote_addr
+
+
+def queue_only_enabled() -> bool:
+    """Whether synchronous requests also go through the task queue, so that
+    the API process never opens the collection."""
+    return os.getenv("ANKI_API_QUEUE_ONLY", "false").lower() == "true"
+
+
+def enqueue_cloze_note(note_data, callback_url=None):
+    created_at = time.time()
+    if two_stage_pipeline_enabled():
+        task = enqueue_cloze_note_pipeline(note_data, callback_url, created_at)
+        index_queued_task(task, "commit_cloze_note", [note_data], created_at)
+        return task
+    if callback_url is None:
+        task = add_cloze_note_task.delay(note_data, queued_at=created_at)
+    else:
+        task = add_cloze_note_task.delay(
+            note_data, callback_url=callback_url, queued_at=created_at
+        )
+    index_queued_task(task, "add_cloze_note", [note_data], created_at)
+    return task
+
+
+def enqueue_cloze_notes(notes_data, callback_url=None):
+    created_at = time.time()
+    if two_stage_pipeline_enabled():
+        task = enqueue_cloze_notes_pipeline(notes_data, callback_url, created_at)
+        index_queued_task(task, "commit_cloze_notes", notes_data, created_at)
+        return task
+    if callback_url is None:
+        task = add_cloze_notes_task.delay(notes_data, queued_at=created_at)
+    else:
+        task = add_cloze_notes_task.delay(
+            notes_data, callback_url=callback_url, queued_at=created_at
+        )
+    index_queued_task(task, "add_cloze_notes", notes_data, created_at)
+    return task
+
+
+# Words of a task's notes kept in the task index
+MAX_INDEXED_WORDS = 10
+
+
+def index_queued_task(task, task_name, notes_data, created_at):
+    """Record a queued task in the task index, for listing and lookups."""
+    notes = {
+        "count": len(notes_data),
+        "words": [note["word"] for note in notes_data[:MAX_INDEXED_WORDS]],
+    }
+    try:
+        task_index.record_queued(
+            task.id, task_name, notes, created_at, client=request_client()
+        )
+    except sqlite3.Error:
+        logger.exception(f"Failed to index task {task.id}")
+
+
+def admission_rejection(note_count: int):
+    """The 429 response to queueing ``note_count`` notes, if admission control
+    rejects them, with when to retry."""
+    try:
+        retry_after = admission_control.admit(request_client(), note_count)
+    except sqlite3.Error:
+        # Admit the notes rather than fail the request
+        logger.exception("Failed to read the queued notes")
+        return None
+    if retry_after is None:
+        return None
+    return (
+        {"message": "Too many notes are queued, try again later"},
+        429,
+        {"Retry-After": str(retry_after)},
+    )
+
+
+def read_callback_url() -> str | None:
+    """The ``callbackUrl`` query parameter, a webhook notified when the task
+    finishes."""
+    callback_url = request.args.get("callbackUrl")
+    if callback_url is None:
+        return None
+    parsed_url = urlparse(callback_url)
+    if parsed_url.scheme not in ("http", "https") or not parsed_url.hostname:
+        abort(400, message="callbackUrl must be an absolute http(s) URL")
+    if not is_allowed_callback_host(parsed_url.hostname):
+        abort(400, message="callbackUrl must point to a public host")
+    return callback_url
+
+
+def is_allowed_callback_host(host: str) -> bool:
+    """Whether the worker may send webhooks to ``host``.
+
+    With WEBHOOK_ALLOWED_HOSTS set, only the hosts listed there are allowed.
+    Otherwise every address the host resolves to must be public, so that
+    clients cannot make the worker reach the internal network.
+    """
+    allowed_hosts = {
+        allowed_host.strip().lower()
+        for allowed_host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",")
+        if allowed_host.strip()
+    }
+    if allowed_hosts:
+        return host.lower() in allowed_hosts
+    try:
+        addresses = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        return False
+    for *_, socket_address in addresses:
+        # Drop the scope of IPv6 link-local addresses, e.g. "fe80::1%eth0"
+        address = ipaddress.ip_address(socket_address[0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            return False
+    return True
+
+
+# Upper bound of the ``wait`` query parameter
+MAX_WAIT_MS = 30000
+# Statuses of a task that has not finished yet
+UNFINISHED_STATUSES = ("pending", "started", "retry")
+# How long to wait for the result of a task the watcher saw finish
+RESULT_FETCH_TIMEOUT_SECONDS = 5
+
+task_watcher = TaskWatcher(TaskStatus.get_task_statuses)
+
+
+def get_task_result(task, timeout: float):
+    """Wait up to ``timeout`` seconds for a queued task to finish.
+
+    The wait goes through ``task_watcher``, which polls all waited-on and
+    streamed tasks with one query, and the result is fetched once the task
+    has finished.
+
+    Returns:
+        The task's result, or None if it did not finish in time. A task that
+        raised instead of returning, e.g. because it was revoked or its worker
+        was lost, gets the failure result the task itself returns on errors.
+    """
+    deadline = time.monotonic() + timeout
+    queue = task_watcher.subscribe([task.id])
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                status = queue.get(timeout=remaining)
+            except Empty:
+                return None
+            if status["status"] not in UNFINISHED_STATUSES:
+                break
+    finally:
+        task_watcher.unsubscribe(queue)
+
+    try:
+        result = task.get(timeout=RESULT_FETCH_TIMEOUT_SECONDS, propagate=False)
+    except CeleryTimeoutError:
+        return None
+    if isinstance(result, dict):
+        return result
+    return {
+        "success": False,
+        "error": {"type": type(result).__name__, "message": str(result)},
+    }
+
+
+def wait_for_task(task):
+    """Block until a queued task finishes.
+
+    Aborts with 504 and the task ID, which can still be polled, if the task
+    does not finish within ``ANKI_API_SYNC_TIMEOUT_SECONDS``.
+    """
+    timeout = float(os.getenv("ANKI_API_SYNC_TIMEOUT_SECONDS", "120"))
+    result = get_task_result(task, timeout)
+    if result is None:
+        abort(
+            504,
+            message="Timed out waiting for the task",
+            taskId=task.id,
+            statusUrl=f"/api/v1/tasks/{task.id}",
+        )
+    return result
+
+
+def read_wait_seconds() -> float:
+    """The ``wait`` query parameter, in milliseconds, converted to seconds."""
+    wait = request.args.get("wait", "0")
+    if not wait.isdigit():
+        abort(400, message="wait must be a non-negative number of milliseconds")
+    return min(int(wait), MAX_WAIT_MS) / 1000
+
+
+def task_response(task, wait_seconds: float, **details):
+    """Respond with the task's result if it finishes within ``wait_seconds``
+    (200 OK), and with the task's status URL otherwise (202 Accepted)."""
+    if wait_seconds > 0:
+        result = get_task_result(task, wait_seconds)
+        if result is not None:
+            return {
+                "taskId": task.id,
+                "status": "success" if result.get("success") else "failure",
+                "statusUrl": f"/api/v1/tasks/{task.id}",
+                "result": result,
+                **details,
+            }, 200
+
+    return {
+        "taskId": task.id,
+        "status": "pending",
+        "statusUrl": f"/api/v1/tasks/{task.id}",
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        **details,
+    }, 202
+
 
 class ClozeNote(Resource):
     @token_required
@@ -29,25 +294,100 @@ class ClozeNote(Resource):
         # Check if synchronous mode is requested
         async_mode = request.args.get("async", "true").lower() == "true"
 
+        if async_mode or queue_only_enabled():
+            rejection = admission_rejection(1)
+            if rejection is not None:
+                return rejection
+
+        if not async_mode and queue_only_enabled():
+            result = wait_for_task(enqueue_cloze_note(ClozeNoteScheme().dump(note)))
+            if not result["success"]:
+                abort(500, message=result["error"]["message"], error=result["error"])
+            return {"status": "ok"}
+
         if not async_mode:
             # Legacy synchronous mode
             anki.add_cloze_note([note])
             return {"status": "ok"}
 
-        # Asynchronous mode: queue task and return task ID
-        task = add_cloze_note_task.delay(ClozeNoteScheme().dump(note))
-
-        return {
-            "taskId": task.id,
-            "status": "pending",
-            "statusUrl": f"/api/v1/tasks/{task.id}",
-            "createdAt": datetime.now(timezone.utc).isoformat(),
-        }, 202
+        # Asynchronous mode: queue task and return task ID, or its result if
+        # it finishes within the requested wait
+        wait_seconds = read_wait_seconds()
+        callback_url = read_callback_url()
+        task = enqueue_cloze_note(ClozeNoteScheme().dump(note), callback_url)
+        return task_response(task, wait_seconds)
 
 
 api.add_resource(ClozeNote, "/clozeNotes")
 
 
+class ClozeNoteBatch(Resource):
+    MAX_BATCH_SIZE = 500
+
+    @token_required
+    def post(self):
+        """Create many cloze notes as one unit.
+
+        Accepts a JSON array of notes, or one note per line when the request
+        content type is ``application/x-ndjson``.
+        """
+        notes_data = self._read_notes()
+        if not isinstance(notes_data, list) or not notes_data:
+            abort(400, message="Expected a non-empty list of notes")
+        if len(notes_data) > self.MAX_BATCH_SIZE:
+            abort(400, message=f"At most {self.MAX_BATCH_SIZE} notes per batch")
+
+        try:
+            notes = ClozeNoteScheme(many=True).load(notes_data)
+        except ValidationError as err:
+            abort(400, message=err.messages)
+            return
+
+        async_mode = request.args.get("async", "true").lower() == "true"
+
+        notes_data = ClozeNoteScheme(many=True).dump(notes)
+
+        if async_mode or queue_only_enabled():
+            rejection = admission_rejection(len(notes))
+            if rejection is not None:
+                return rejection
+
+        if not async_mode and queue_only_enabled():
+            result = wait_for_task(enqueue_cloze_notes(notes_data))
+            if "results" not in result:
+                abort(500, message=result["error"]["message"], error=result["error"])
+            return {"status": "ok", "results": result["results"]}
+
+        if not async_mode:
+            results = serialize_note_results(anki.add_cloze_notes(notes))
+            return {"status": "ok", "results": results}
+
+        wait_seconds = read_wait_seconds()
+        callback_url = read_callback_url()
+        task = enqueue_cloze_notes(notes_data, callback_url)
+        return task_response(task, wait_seconds, count=len(notes))
+
+    def _read_notes(self):
+        if request.mimetype != "application/x-ndjson":
+            return request.get_json(silent=True)
+
+        notes_data = []
+        for line_number, line in enumerate(request.stream, start=1):
+            if not line.strip():
+                continue
+            # Stop reading the stream as soon as the batch is too large
+            if len(notes_data) == self.MAX_BATCH_SIZE:
+                abort(400, message=f"At most {self.MAX_BATCH_SIZE} notes per batch")
+            try:
+                notes_data.append(json.loads(line))
+            except ValueError:
+                abort(400, message=f"Invalid JSON on line {line_number}")
+        return notes_data
+
+
+api.add_resource(ClozeNoteBatch, "/clozeNotes:batch")
+
+
 class TaskStatusResource(Resource):
     @token_required
     def get(self, task_id):
@@ -63,6 +403,204 @@ class TaskStatusResource(Resource):
 api.add_resource(TaskStatusResource, "/tasks/<task_id>")
 
 
+def read_since() -> float | None:
+    """The ``since`` query parameter, an ISO 8601 time, as a Unix time."""
+    since = request.args.get("since")
+    if since is None:
+        return None
+    try:
+        since = datetime.fromisoformat(since)
+    except ValueError:
+        abort(400, message="since must be an ISO 8601 date and time")
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return since.timestamp()
+
+
+class TaskListResource(Resource):
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+    STATUSES = ("pending", "started", "success", "failure")
+
+    @token_required
+    def get(self):
+        """List tasks from the task index, newest first.
+
+        Tasks can be filtered by ``status`` and by ``since``, an ISO 8601 time
+        they were created at or after. Further pages are fetched by passing the
+        returned ``nextCursor`` as ``cursor``.
+        """
+        status = request.args.get("status")
+        if status is not None and status not in self.STATUSES:
+            abort(400, message=f"status must be one of {', '.join(self.STATUSES)}")
+
+        since = read_since()
+
+        limit = request.args.get("limit", str(self.DEFAULT_LIMIT))
+        if not limit.isdigit() or not 1 <= int(limit) <= self.MAX_LIMIT:
+            abort(400, message=f"limit must be between 1 and {self.MAX_LIMIT}")
+
+        try:
+            tasks, next_cursor = task_index.search(
+                status=status,
+                since=since,
+                limit=int(limit),
+                cursor=request.args.get("cursor"),
+            )
+        except ValueError as err:
+            abort(400, message=str(err))
+            return
+        return {"tasks": tasks, "nextCursor": next_cursor}
+
+
+api.add_resource(TaskListResource, "/tasks")
+
+
+class TaskTimingsResource(Resource):
+    DEFAULT_WINDOW = timedelta(hours=1)
+
+    @token_required
+    def get(self):
+        """Percentiles of the time tasks spent in each phase.
+
+        Covers the tasks that finished since ``since``, by default in the
+        last hour.
+        """
+        since = read_since()
+        if since is None:
+            since = (datetime.now(timezone.utc) - self.DEFAULT_WINDOW).timestamp()
+        return {
+            "since": datetime.fromtimestamp(since, timezone.utc).isoformat(),
+            **task_index.timing_percentiles(since),
+        }
+
+
+api.add_resource(TaskTimingsResource, "/tasks/timings")
+
+
+def is_unknown_task(status) -> bool:
+    """Whether the task was never queued through the API and has no result.
+
+    Only the task index knows createdAt, and a task without a result backend
+    entry is pending.
+    """
+    return status["status"] == "pending" and status.get("createdAt") is None
+
+
+class TaskLookupResource(Resource):
+    MAX_TASKS = 100
+
+    @token_required
+    def post(self):
+        """Get the status of many tasks at once.
+
+        Accepts ``{"ids": [...]}``. Tasks that were never queued through the
+        API and have no result are listed in ``notFound``.
+        """
+        body = request.get_json(silent=True)
+        task_ids = body.get("ids") if isinstance(body, dict) else None
+        if (
+            not isinstance(task_ids, list)
+            or not task_ids
+            or not all(isinstance(task_id, str) for task_id in task_ids)
+        ):
+            abort(400, message="Expected a non-empty list of task ids in ids")
+        task_ids = list(dict.fromkeys(task_ids))
+        if len(task_ids) > self.MAX_TASKS:
+            abort(400, message=f"At most {self.MAX_TASKS} tasks per lookup")
+
+        statuses = TaskStatus.get_task_statuses(task_ids)
+        not_found = [
+            task_id for task_id, status in statuses.items() if is_unknown_task(status)
+        ]
+        return {
+            "tasks": [
+                status
+                for task_id, status in statuses.items()
+                if task_id not in not_found
+            ],
+            "notFound": not_found,
+        }
+
+
+api.add_resource(TaskLookupResource, "/tasks:lookup")
+
+
+class TaskStreamResource(Resource):
+    MAX_TASKS = 100
+    KEEP_ALIVE_SECONDS = 15
+    MAX_DURATION_SECONDS = int(os.getenv("TASK_STREAM_MAX_SECONDS", "600"))
+    # Each stream holds a thread of the API process for its whole life
+    _streams = BoundedSemaphore(int(os.getenv("TASK_STREAM_MAX_PER_PROCESS", "2")))
+
+    @token_required
+    def get(self):
+        """Stream the status changes of tasks as Server-Sent Events.
+
+        The tasks are given as comma-separated ``ids``. The stream ends with an
+        ``end`` event once every task has succeeded or failed or is unknown,
+        and with a ``timeout`` event after ``MAX_DURATION_SECONDS``.
+        """
+        task_ids = list(
+            dict.fromkeys(
+                task_id for task_id in request.args.get("ids", "").split(",") if task_id
+            )
+        )
+        if not task_ids:
+            abort(400, message="Expected comma-separated task ids in ids")
+        if len(task_ids) > self.MAX_TASKS:
+            abort(400, message=f"At most {self.MAX_TASKS} tasks per stream")
+
+        if not self._streams.acquire(blocking=False):
+            return (
+                {"message": "Too many task streams, poll the task status instead"},
+                503,
+                {"Retry-After": str(self.KEEP_ALIVE_SECONDS)},
+            )
+        response = Response(
+            self._stream(task_ids),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        # Also runs if the client disconnects before the stream starts
+        response.call_on_close(self._streams.release)
+        return response
+
+    def _stream(self, task_ids):
+        queue = task_watcher.subscribe(task_ids)
+        unfinished = set(task_ids)
+        deadline = time.monotonic() + self.MAX_DURATION_SECONDS
+        try:
+            while unfinished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    timeout = {"taskIds": sorted(unfinished)}
+                    yield f"event: timeout\ndata: {json.dumps(timeout)}\n\n"
+                    return
+                try:
+                    status = queue.get(
+                        timeout=min(self.KEEP_ALIVE_SECONDS, remaining)
+                    )
+                except Empty:
+                    if time.monotonic() < deadline:
+                        yield ": keep-alive\n\n"
+                    continue
+                if is_unknown_task(status):
+                    unfinished.discard(status["taskId"])
+                    not_found = {"taskId": status["taskId"]}
+                    yield f"event: notFound\ndata: {json.dumps(not_found)}\n\n"
+                    continue
+                if status["status"] in TERMINAL_STATUSES:
+                    unfinished.discard(status["taskId"])
+                yield f"event: status\ndata: {json.dumps(status)}\n\n"
+            yield "event: end\ndata: {}\n\n"
+        finally:
+            task_watcher.unsubscribe(queue)
+
+
+api.add_resource(TaskStreamResource, "/tasks/stream")
+
+
 @bp.route("/health", methods=["GET"])
 @token_required
 def health():
@@ -81,7 +619,16 @@ def login():
         )
 
     hashed_api_key = CredentialStorage().get_hashed_api_key()
-    if not bcrypt.checkpw(auth["key"].encode(), hashed_api_key):
+    is_valid, retry_after = api_key_verifier.verify(
+        request_client(), auth["key"], hashed_api_key
+    )
+    if retry_after is not None:
+        return make_response(
+            jsonify({"message": "Too many login attempts, try again later"}),
+            429,
+            {"Retry-After": str(math.ceil(retry_after))},
+        )
+    if not is_valid:
         return make_response(
             jsonify({"message": "Could not verify API key!"}),
             403,
@@ -1,12 +1,18 @@
 """Source: https://circleci.com/blog/authentication-decorators-flask/"""
 
+import os
 from functools import wraps
 
-from flask import jsonify, make_response, request
+import jwt
+from flask import g, jsonify, make_response, request
 
+from anki_sync_server.server.token_cache import VerifiedTokenCache
 from anki_sync_server.server.token_issuer import TokenIssuer
 from anki_sync_server.setup.credential_storage import CredentialStorage
 
+# Access tokens are verified once per process, then looked up until they expire
+verified_tokens = VerifiedTokenCache(int(os.getenv("ACCESS_TOKEN_CACHE_SIZE", "1024")))
+
 
 def token_required(f):
     @wraps(f)
@@ -18,10 +24,16 @@ def token_required(f):
         if not token:  # throw error if no token provided
             return make_response(jsonify({"message": "A valid token is missing!"}), 401)
         secret_key = CredentialStorage().get_server_secret_key()
-        token_issuer = TokenIssuer(secret_key)
-        is_valid, error = token_issuer.verify(token, "access")
-        if not is_valid:
-            return make_response(jsonify({"message": error}), 401)
+        claims = verified_tokens.get(token, secret_key)
+        if claims is None:
+            token_issuer = TokenIssuer(secret_key)
+            is_valid, error = token_issuer.verify(token, "access")
+            if not is_valid:
+                return make_response(jsonify({"message": error}), 401)
+            # The signature was just verified
+            claims = jwt.decode(token, options={"verify_signature": False})
+            verified_tokens.put(token, secret_key, claims)
+        g.token_claims = claims
         return f(*args, **kwargs)
 
     return decorator
@@ -1,7 +1,10 @@
-from flask import Flask
+from flask import Flask, Response
 from flask_cors import CORS
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from anki_sync_server.server.api_v1 import bp
+from anki_sync_server.metrics import QueueDepthCollector, create_registry, mark_dead
+from anki_sync_server.server import start_warm_up
+from anki_sync_server.server.api_v1 import bp, queue_only_enabled
 from anki_sync_server.tasks.celery_app import celery_app
 
 app = Flask(__name__)
@@ -11,9 +14,48 @@ CORS(app)
 celery_app.conf.update(app.config)
 
 
+metrics_registry = create_registry(
+    QueueDepthCollector(
+        celery_app,
+        {
+            celery_app.conf.task_default_queue,
+            *(route["queue"] for route in celery_app.conf.task_routes.values()),
+        },
+    )
+)
+
+
 @app.route("/")
 def home():
     return {"status": "ok"}
 
 
+@app.route("/metrics")
+def metrics():
+    return Response(generate_latest(metrics_registry), mimetype=CONTENT_TYPE_LATEST)
+
+
 app.register_blueprint(bp, url_prefix="/api/v1")
+
+
+def warm_up_api_process() -> None:
+    """Warm up, unless requests are only queued, in which case the API process
+    never opens the collection."""
+    if not queue_only_enabled():
+        start_warm_up()
+
+
+try:
+    import uwsgi
+    from uwsgidecorators import postfork
+except ImportError:
+    # Not running under uWSGI
+    uwsgi = None
+
+if uwsgi is not None:
+    uwsgi.atexit = mark_dead
+    if uwsgi.opt.get("lazy-apps"):
+        # The app is loaded in each worker, after the fork
+        warm_up_api_process()
+    else:
+        postfork(warm_up_api_process)
@@ -0,0 +1,48 @@
+import copy
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Tuple
+
+
+class TaskStateCache:
+    """Bounded LRU cache of task statuses that can no longer change.
+
+    Entries expire after their own TTL, e.g. when the result backend forgets
+    the task. Callers get copies, so cached statuses cannot be modified.
+    """
+
+    def __init__(
+        self, max_entries: int = 10000, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._max_entries = max_entries
+        self._clock = clock
+        self._lock = Lock()
+        # task ID -> (expiry time, status)
+        self._entries: OrderedDict[str, Tuple[float, Dict[str, Any]]] = OrderedDict()
+
+    def get(self, task_id: str) -> Dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None:
+                return None
+            expires_at, status = entry
+            if self._clock() >= expires_at:
+                del self._entries[task_id]
+                return None
+            self._entries.move_to_end(task_id)
+        return copy.deepcopy(status)
+
+    def put(self, task_id: str, status: Dict[str, Any], ttl_seconds: float) -> None:
+        if ttl_seconds <= 0 or self._max_entries <= 0:
+            return
+        status = copy.deepcopy(status)
+        with self._lock:
+            self._entries[task_id] = (self._clock() + ttl_seconds, status)
+            self._entries.move_to_end(task_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,14 +1,42 @@
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
 
+from celery import states
+from celery.backends.database import DatabaseBackend, session_cleanup
 from celery.result import AsyncResult
 
-from anki_sync_server.tasks.celery_app import celery_app
+from anki_sync_server import MEDIA_SYNC_STATE_FILE_PATH
+from anki_sync_server.anki.media_sync_state import MediaSyncState
+from anki_sync_server.server.task_state_cache import TaskStateCache
+from anki_sync_server.tasks.celery_app import celery_app, task_index
+
+
+class _TaskMetaResult:
+    """The parts of AsyncResult used by TaskStatus, backed by task metadata
+    that was already fetched from the result backend."""
+
+    def __init__(self, task_id: str, meta: Dict[str, Any]) -> None:
+        self.id = task_id
+        self.state = meta["status"]
+        self.result = meta.get("result")
+        self.info = self.result
+        self.date_done = meta.get("date_done")
+
+    def successful(self) -> bool:
+        return self.state == states.SUCCESS
+
+    def failed(self) -> bool:
+        return self.state == states.FAILURE
 
 
 class TaskStatus:
     """Helper class to convert Celery task state to API response format."""
 
+    # Statuses of finished tasks, served without querying the result backend
+    _terminal_states = TaskStateCache(int(os.getenv("TASK_STATE_CACHE_SIZE", "10000")))
+
     @staticmethod
     def get_task_status(task_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -20,16 +48,116 @@ class TaskStatus:
         Returns:
             Dictionary with task metadata or None if task not found
         """
+        cached_status = TaskStatus._terminal_states.get(task_id)
+        if cached_status is not None:
+            return cached_status
+
         try:
             async_result = AsyncResult(task_id, app=celery_app)
 
             if async_result is None:
                 return None
 
-            return TaskStatus._serialize_task_state(async_result)
+            status = TaskStatus._serialize_task_state(async_result)
         except Exception:
             return None
 
+        TaskStatus._add_index_timestamps([status])
+        TaskStatus._cache_if_terminal(status)
+        return status
+
+    @staticmethod
+    def get_task_statuses(task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch the status of many tasks, with a single query when the result
+        backend is a database.
+
+        Args:
+            task_ids: Celery task IDs
+
+        Returns:
+            Dictionary mapping each task ID to its task metadata
+        """
+        statuses = {}
+        for task_id in task_ids:
+            cached_status = TaskStatus._terminal_states.get(task_id)
+            if cached_status is not None:
+                statuses[task_id] = cached_status
+
+        uncached_task_ids = [task_id for task_id in task_ids if task_id not in statuses]
+        if uncached_task_ids:
+            metas = TaskStatus._fetch_task_metas(uncached_task_ids)
+            uncached_statuses = [
+                TaskStatus._serialize_task_state(
+                    _TaskMetaResult(task_id, metas[task_id])
+                )
+                for task_id in uncached_task_ids
+            ]
+            TaskStatus._add_index_timestamps(uncached_statuses)
+            for status in uncached_statuses:
+                TaskStatus._cache_if_terminal(status)
+                statuses[status["taskId"]] = status
+        return {task_id: statuses[task_id] for task_id in task_ids}
+
+    @staticmethod
+    def _add_index_timestamps(statuses: List[Dict[str, Any]]) -> None:
+        """Fill in when the tasks were queued and started from the task index,
+        as the result backend only records when they finished."""
+        try:
+            tasks = task_index.get([status["taskId"] for status in statuses])
+        except sqlite3.Error:
+            return
+        for status in statuses:
+            task = tasks.get(status["taskId"])
+            if task is not None:
+                status["createdAt"] = task["createdAt"]
+                status["startedAt"] = task["startedAt"]
+
+    @staticmethod
+    def _cache_if_terminal(status: Dict[str, Any]) -> None:
+        """Cache the status of a finished task until the result backend
+        forgets it after ``result_expires``."""
+        if status["status"] not in ("success", "failure"):
+            return
+        result = status["result"]
+        if isinstance(result, dict) and (
+            result.get("mediaSync", {}).get("status") == "pending"
+        ):
+            # Still changes once the media is synced
+            return
+
+        ttl_seconds = celery_app.conf.result_expires
+        if isinstance(ttl_seconds, timedelta):
+            ttl_seconds = ttl_seconds.total_seconds()
+        if not ttl_seconds:
+            return
+        try:
+            completed_at = datetime.fromisoformat(status["completedAt"])
+            age = datetime.now(timezone.utc) - completed_at
+            ttl_seconds -= max(age.total_seconds(), 0)
+        except (TypeError, ValueError):
+            pass
+        TaskStatus._terminal_states.put(status["taskId"], status, ttl_seconds)
+
+    @staticmethod
+    def _fetch_task_metas(task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        backend = celery_app.backend
+        if not isinstance(backend, DatabaseBackend):
+            return {task_id: backend.get_task_meta(task_id) for task_id in task_ids}
+
+        session = backend.ResultSession()
+        with session_cleanup(session):
+            rows = (
+                session.query(backend.task_cls)
+                .filter(backend.task_cls.task_id.in_(task_ids))
+                .all()
+            )
+            metas = {
+                row.task_id: backend.meta_from_decoded(row.to_dict()) for row in rows
+            }
+        pending = {"status": states.PENDING, "result": None}
+        return {task_id: metas.get(task_id, pending) for task_id in task_ids}
+
     @staticmethod
     def _serialize_task_state(async_result: AsyncResult) -> Dict[str, Any]:
         """
@@ -45,6 +173,7 @@ class TaskStatus:
         state_mapping = {
             "PENDING": "pending",
             "STARTED": "started",
+            "PROGRESS": "started",
             "SUCCESS": "success",
             "FAILURE": "failure",
             "RETRY": "retry",
@@ -56,6 +185,7 @@ class TaskStatus:
             "taskId": async_result.id,
             "status": api_state,
             "createdAt": None,
+            "startedAt": None,
             "completedAt": None,
             "progress": {
                 "current": 0,
@@ -65,16 +195,21 @@ class TaskStatus:
             "error": None,
         }
 
+        # Add progress reported by the worker while the task is running
+        if async_result.state == "PROGRESS" and isinstance(async_result.info, dict):
+            response["progress"] = async_result.info
+
         # Add result if task succeeded
         if async_result.successful():
             response["status"] = "success"
-            response["completedAt"] = datetime.now(timezone.utc).isoformat()
-            response["result"] = async_result.result
+            response["progress"] = {"current": 1, "total": 1}
+            response["completedAt"] = TaskStatus._completed_at(async_result)
+            response["result"] = TaskStatus._resolve_media_sync(async_result.result)
 
         # Add error if task failed
         elif async_result.failed():
             response["status"] = "failure"
-            response["completedAt"] = datetime.now(timezone.utc).isoformat()
+            response["completedAt"] = TaskStatus._completed_at(async_result)
 
             # Extract error info
             exc = async_result.info
@@ -87,3 +222,30 @@ class TaskStatus:
                 }
 
         return response
+
+    @staticmethod
+    def _completed_at(async_result: AsyncResult) -> str:
+        """When the task finished, as recorded by the result backend."""
+        date_done = getattr(async_result, "date_done", None)
+        if isinstance(date_done, str):
+            return date_done
+        if isinstance(date_done, datetime):
+            if date_done.tzinfo is None:
+                date_done = date_done.replace(tzinfo=timezone.utc)
+            return date_done.isoformat()
+        return datetime.now(timezone.utc).isoformat()
+
+    @staticmethod
+    def _resolve_media_sync(result: Any) -> Any:
+        """Mark the media of a finished task as synced once the background
+        media sync lane has completed the task's generation."""
+        if not isinstance(result, dict):
+            return result
+        media_sync = result.get("mediaSync")
+        if not isinstance(media_sync, dict) or media_sync.get("status") != "pending":
+            return result
+
+        media_sync_state = MediaSyncState(MEDIA_SYNC_STATE_FILE_PATH)
+        if not media_sync_state.is_synced(media_sync.get("generation", 0)):
+            return result
+        return {**result, "mediaSync": {**media_sync, "status": "synced"}}
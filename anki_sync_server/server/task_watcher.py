@@ -0,0 +1,96 @@
+import logging
+from queue import Queue
+from threading import Condition, Thread
+from typing import Any, Callable, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+# API states after which a task's status no longer changes
+TERMINAL_STATUSES = ("success", "failure")
+
+
+class TaskWatcher:
+    """Poll the status of watched tasks from one background thread and push
+    every change to the queues of the subscribers of that task.
+
+    Each poll fetches all watched tasks at once, so the load on the result
+    backend depends on the number of watched tasks, not on the number of
+    subscribers. A task is no longer polled once it reaches a terminal status
+    or loses its last subscriber.
+    """
+
+    def __init__(
+        self,
+        fetch_statuses: Callable[[List[str]], Dict[str, Dict[str, Any]]],
+        poll_interval_seconds: float = 0.5,
+    ) -> None:
+        self._fetch_statuses = fetch_statuses
+        self._poll_interval_seconds = poll_interval_seconds
+        self._condition = Condition()
+        self._subscribers: Dict[str, Set[Queue]] = {}
+        self._last_statuses: Dict[str, Dict[str, Any]] = {}
+        self._thread: Thread | None = None
+
+    def subscribe(self, task_ids: List[str]) -> Queue:
+        """Watch the tasks.
+
+        Returns:
+            Queue: Receives the status of a task whenever it changes, starting
+            with its current status.
+        """
+        queue = Queue()
+        with self._condition:
+            for task_id in task_ids:
+                self._subscribers.setdefault(task_id, set()).add(queue)
+                if task_id in self._last_statuses:
+                    queue.put(self._last_statuses[task_id])
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run, name="task-watcher", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+        return queue
+
+    def unsubscribe(self, queue: Queue) -> None:
+        with self._condition:
+            for task_id in list(self._subscribers):
+                self._drop(task_id, queue)
+
+    def _drop(self, task_id: str, queue: Queue) -> None:
+        subscribers = self._subscribers.get(task_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[task_id]
+            self._last_statuses.pop(task_id, None)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._subscribers:
+                    self._condition.wait()
+                task_ids = list(self._subscribers)
+
+            try:
+                statuses = self._fetch_statuses(task_ids)
+            except Exception:
+                logger.exception("Failed to fetch task statuses")
+                statuses = {}
+
+            with self._condition:
+                for task_id, status in statuses.items():
+                    self._publish(task_id, status)
+                self._condition.wait(self._poll_interval_seconds)
+
+    def _publish(self, task_id: str, status: Dict[str, Any]) -> None:
+        subscribers = self._subscribers.get(task_id)
+        if not subscribers or self._last_statuses.get(task_id) == status:
+            return
+        self._last_statuses[task_id] = status
+        for queue in subscribers:
+            queue.put(status)
+        if status["status"] in TERMINAL_STATUSES:
+            for queue in list(subscribers):
+                self._drop(task_id, queue)
@@ -0,0 +1,68 @@
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Tuple
+
+
+class VerifiedTokenCache:
+    """Bounded LRU cache of the access tokens that passed verification.
+
+    Tokens are keyed by their SHA-256 digest and stay valid until their own
+    expiration time. Their decoded claims are kept with them, so a cached token
+    is not decoded again. All entries are dropped when the secret key they were
+    verified with changes.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, clock: Callable[[], float] = time.time
+    ) -> None:
+        self._max_entries = max_entries
+        self._clock = clock
+        self._lock = Lock()
+        self._secret_key: str | None = None
+        # token digest -> (expiration time, claims)
+        self._entries: OrderedDict[bytes, Tuple[float, Dict[str, Any]]] = (
+            OrderedDict()
+        )
+
+    def get(self, token: str, secret_key: str | None) -> Dict[str, Any] | None:
+        """The claims of ``token`` if it was verified with ``secret_key`` and
+        has not expired yet."""
+        digest = _digest(token)
+        with self._lock:
+            if secret_key != self._secret_key:
+                self._entries.clear()
+                self._secret_key = secret_key
+                return None
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if self._clock() >= expires_at:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return claims
+
+    def put(self, token: str, secret_key: str | None, claims: Dict[str, Any]) -> None:
+        expires_at = claims["exp"]
+        if self._max_entries <= 0 or self._clock() >= expires_at:
+            return
+        digest = _digest(token)
+        with self._lock:
+            if secret_key != self._secret_key:
+                self._entries.clear()
+                self._secret_key = secret_key
+            self._entries[digest] = (expires_at, claims)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
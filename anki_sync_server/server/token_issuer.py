@@ -3,9 +3,16 @@ from typing import Literal, Tuple
 
 import jwt
 
-from anki_sync_server import APP_NAME
+from anki_sync_server import APP_NAME, TOKEN_STATE_FILE_PATH
+from anki_sync_server.server.token_state_store import TokenStateStore
 from anki_sync_server.setup.credential_storage import CredentialStorage
 
+# Shared by the API processes, so that a refresh token issued by one of them is
+# valid in all of them
+token_state = TokenStateStore(TOKEN_STATE_FILE_PATH)
+
+_UNSET = object()
+
 
 class TokenIssuer:
     def __init__(self, secret_key: str):
@@ -23,8 +30,7 @@ class TokenIssuer:
             "type": token_type,
         }
         if token_type == "refresh":
-            CredentialStorage().set_refresh_token_created_at(payload["iat"])
-            CredentialStorage().save()
+            token_state.set("refresh_token_created_at", payload["iat"])
         return jwt.encode(payload, self.secret_key, algorithm="HS256")
 
     def verify(
@@ -39,7 +45,6 @@ class TokenIssuer:
             Tuple[bool, str]: A tuple of a boolean indicating whether the token is
             valid and a error message
         """
-        refresh_token_created_at = CredentialStorage().get_refresh_token_created_at()
         try:
             decoded_token = jwt.decode(token, self.secret_key, algorithms=["HS256"])
             if (
@@ -53,13 +58,27 @@ class TokenIssuer:
                 token_type == "refresh"
                 and decoded_token["type"] == token_type
                 and decoded_token["iss"] == APP_NAME
-                and refresh_token_created_at is not None
-                and refresh_token_created_at == decoded_token["iat"]
             ):
-                return True, None
+                # Only refresh tokens are checked against the token state, so
+                # verifying an access token does not touch the disk
+                refresh_token_created_at = self._refresh_token_created_at()
+                if (
+                    refresh_token_created_at is not None
+                    and refresh_token_created_at == decoded_token["iat"]
+                ):
+                    return True, None
 
             return False, "Invalid token"
         except jwt.ExpiredSignatureError:
             return False, "Token has expired"
         except jwt.InvalidTokenError:
             return False, "Invalid token"
+
+    @staticmethod
+    def _refresh_token_created_at() -> float | None:
+        # Refresh tokens issued before the token state store was introduced
+        # were recorded in the credentials file
+        created_at = token_state.get("refresh_token_created_at", _UNSET)
+        if created_at is _UNSET:
+            return CredentialStorage().get_refresh_token_created_at()
+        return created_at
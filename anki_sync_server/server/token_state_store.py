@@ -0,0 +1,45 @@
+import json
+import time
+from typing import Any
+
+from anki_sync_server.sqlite_store import SqliteStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_state (
+    name TEXT PRIMARY KEY,
+    value TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class TokenStateStore:
+    """SQLite table of the token state that changes while the server runs,
+    such as when the current refresh token was issued.
+
+    Every read goes to the database, so all API processes see a change as
+    soon as it is committed. A write replaces one row in a transaction, and
+    the database is opened in WAL mode, so readers do not wait for it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._database = SqliteStore(path, _SCHEMA)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """The value stored as ``name``, or ``default`` if it was never set."""
+        with self._database.connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM token_state WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return default
+        return json.loads(row[0])
+
+    def set(self, name: str, value: Any) -> None:
+        with self._database.connect() as connection:
+            connection.execute(
+                "INSERT INTO token_state (name, value, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET"
+                " value = excluded.value, updated_at = excluded.updated_at",
+                (name, json.dumps(value), time.time()),
+            )
@@ -1,11 +1,20 @@
 import pickle
 import threading
-from multiprocessing import Lock
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, Mapping
 
-from anki.sync import SyncAuth
+if TYPE_CHECKING:
+    from anki.sync import SyncAuth
 
 
 class CredentialStorage:
+    """Process-wide credentials.
+
+    Reads are served from an immutable snapshot, which writers replace with an
+    updated copy while holding the writer lock. Readers never wait, and always
+    see either the old or the new snapshot.
+    """
+
     _instance = None
     _lock = threading.Lock()
     _initialized = False
@@ -26,22 +35,22 @@ class CredentialStorage:
         with self._initialized_lock:
             if self._initialized:
                 return
-            self._reader_lock = Lock()
-            self._writer_lock = Lock()
-            self._reader_count = 0
-
-            self._data = {
-                "anki_session": None,
-                "gcp_tts_api_key": None,
-                "hashed_api_key": None,
-                "server_secret_key": None,
-                "refresh_token_created_at": None,
-            }
+            self._writer_lock = threading.Lock()
+
+            self._data: Mapping[str, Any] = MappingProxyType(
+                {
+                    "anki_session": None,
+                    "gcp_tts_api_key": None,
+                    "hashed_api_key": None,
+                    "server_secret_key": None,
+                    "refresh_token_created_at": None,
+                }
+            )
             self._initialized = True
 
     @staticmethod
     def _writer(func):
-        """The writer part of the first reader-writer algorithm."""
+        """Serialize writers, which replace the snapshot instead of mutating it."""
 
         def wrapper(*args, **kwargs):
             with CredentialStorage()._writer_lock:
@@ -49,73 +58,52 @@ class CredentialStorage:
 
         return wrapper
 
-    @staticmethod
-    def _reader(func):
-        """The reader part of the first reader-writer algorithm."""
-
-        def wrapper(*args, **kwargs):
-            with CredentialStorage()._reader_lock:
-                CredentialStorage()._reader_count += 1
-                if CredentialStorage()._reader_count == 1:
-                    CredentialStorage()._writer_lock.acquire()
-
-            result = func(*args, **kwargs)
-
-            with CredentialStorage()._reader_lock:
-                CredentialStorage()._reader_count -= 1
-                if CredentialStorage()._reader_count == 0:
-                    CredentialStorage()._writer_lock.release()
-
-            return result
-
-        return wrapper
+    def _replace(self, **changes: Any) -> None:
+        """Swap in a snapshot with ``changes``; callers hold the writer lock."""
+        self._data = MappingProxyType({**self._data, **changes})
 
-    @_reader
-    def get_anki_session(self) -> SyncAuth | None:
+    def get_anki_session(self) -> "SyncAuth | None":
         return self._data.get("anki_session")
 
-    @_reader
     def get_gcp_tts_api_key(self) -> str | None:
         return self._data.get("gcp_tts_api_key")
 
-    @_reader
     def get_hashed_api_key(self) -> bytes | None:
         return self._data.get("hashed_api_key")
 
-    @_reader
     def get_server_secret_key(self) -> str | None:
         return self._data.get("server_secret_key")
 
-    @_reader
     def get_refresh_token_created_at(self) -> float | None:
         return self._data.get("refresh_token_created_at")
 
     @_writer
-    def set_anki_session(self, session: SyncAuth) -> None:
-        self._data["anki_session"] = session
+    def set_anki_session(self, session: "SyncAuth") -> None:
+        self._replace(anki_session=session)
 
     @_writer
     def set_gcp_tts_api_key(self, api_key: str) -> None:
-        self._data["gcp_tts_api_key"] = api_key
+        self._replace(gcp_tts_api_key=api_key)
 
     @_writer
     def set_hashed_api_key(self, api_key: bytes) -> None:
-        self._data["hashed_api_key"] = api_key
+        self._replace(hashed_api_key=api_key)
 
     @_writer
     def set_server_secret_key(self, server_secret_key: str) -> None:
-        self._data["server_secret_key"] = server_secret_key
+        self._replace(server_secret_key=server_secret_key)
 
     @_writer
     def set_refresh_token_created_at(self, created_at: float | None) -> None:
-        self._data["refresh_token_created_at"] = created_at
+        self._replace(refresh_token_created_at=created_at)
 
     @_writer
     def save(self, credential_name: str = ".credentials") -> None:
         with open(credential_name, "wb") as file:
-            pickle.dump(self._data, file)
+            pickle.dump(dict(self._data), file)
 
     @_writer
     def load(self, credential_name: str = ".credentials") -> None:
         with open(credential_name, "rb") as file:
-            self._data = pickle.load(file)
+            data: Dict[str, Any] = pickle.load(file)
+        self._data = MappingProxyType(data)
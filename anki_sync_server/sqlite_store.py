@@ -0,0 +1,44 @@
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+from threading import Lock
+from typing import Callable, Iterator
+
+
+class SqliteStore:
+    """SQLite database that several processes share, such as the task index.
+
+    The database and its ``schema`` are created on the first connection, in
+    WAL mode so that readers do not wait for a writer. ``migrate`` then gets
+    the chance to upgrade a database created by an older version.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        schema: str,
+        migrate: Callable[[sqlite3.Connection], None] | None = None,
+    ) -> None:
+        self.path = path
+        self._schema = schema
+        self._migrate = migrate
+        self._lock = Lock()
+        self._initialized = False
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection committing on success and rolling back on error."""
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    with closing(sqlite3.connect(self.path, timeout=5)) as connection:
+                        connection.execute("PRAGMA journal_mode=WAL")
+                        connection.executescript(self._schema)
+                        if self._migrate is not None:
+                            self._migrate(connection)
+                    self._initialized = True
+
+        with closing(sqlite3.connect(self.path, timeout=5)) as connection:
+            with connection:
+                yield connection
@@ -1,16 +1,21 @@
 import logging
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List
 
 from anki_sync_server.anki.cloze_note import ClozeNote as ClozeNoteSchema
 from anki_sync_server.server import anki
 from anki_sync_server.tasks.celery_app import celery_app
+from anki_sync_server.timeline import Timeline, recording
 
 logger = logging.getLogger(__name__)
 
 
 @celery_app.task(bind=True, name="add_cloze_note")
 def add_cloze_note_task(
-    self, note_data: Dict[str, Any], user_id: str = None
+    self,
+    note_data: Dict[str, Any],
+    user_id: str = None,
+    callback_url: str = None,
+    queued_at: float = None,
 ) -> Dict[str, Any]:
     """
     Celery task for asynchronously creating a cloze note in Anki.
@@ -18,23 +23,33 @@ def add_cloze_note_task(
     Args:
         note_data: Dictionary containing note fields (word, definition, etc.)
         user_id: Optional user identifier for tracking
+        callback_url: Optional webhook URL notified when the task finishes
+        queued_at: Optional Unix time the task was queued at
 
     Returns:
-        Dictionary with task result (cardId, noteId) or error details
+        Dictionary with task result (cardId, noteId) or error details, and
+        the timeline of the task
     """
+    timeline = task_timeline(queued_at)
     try:
         # Deserialize note from JSON using ClozeNote schema
         schema = ClozeNoteSchema()
         cloze_note = schema.load(note_data)
 
         # Call Anki.add_cloze_note() - wrapped in a list as it expects List[ClozeNote]
-        result_note = anki.add_cloze_note([cloze_note])
+        with recording(timeline):
+            result_notes = anki.add_cloze_note(
+                [cloze_note], on_progress=progress_reporter(self)
+            )
+        note_id = result_notes[0].id
 
         # Return success metadata
         return {
             "success": True,
-            "cardId": result_note.id if hasattr(result_note, "id") else None,
-            "noteId": result_note.id if hasattr(result_note, "id") else None,
+            "cardId": note_id,
+            "noteId": note_id,
+            "mediaSync": media_sync_status(),
+            "timeline": timeline.to_list(),
         }
 
     except Exception as e:
@@ -47,4 +62,111 @@ def add_cloze_note_task(
                 "type": type(e).__name__,
                 "message": str(e),
             },
+            "timeline": timeline.to_list(),
         }
+
+
+@celery_app.task(bind=True, name="add_cloze_notes")
+def add_cloze_notes_task(
+    self,
+    notes_data: List[Dict[str, Any]],
+    user_id: str = None,
+    callback_url: str = None,
+    queued_at: float = None,
+) -> Dict[str, Any]:
+    """
+    Celery task for asynchronously creating a batch of cloze notes in Anki.
+
+    The notes are added as one unit: their audio is synthesized concurrently
+    and they are inserted with a single AnkiWeb sync.
+
+    Args:
+        notes_data: List of dictionaries containing note fields
+        user_id: Optional user identifier for tracking
+        callback_url: Optional webhook URL notified when the task finishes
+        queued_at: Optional Unix time the task was queued at
+
+    Returns:
+        Dictionary with the noteId or error of every note, in order, and the
+        timeline of the task
+    """
+    timeline = task_timeline(queued_at)
+    try:
+        schema = ClozeNoteSchema(many=True)
+        cloze_notes = schema.load(notes_data)
+
+        with recording(timeline):
+            results = serialize_note_results(
+                anki.add_cloze_notes(cloze_notes, on_progress=progress_reporter(self))
+            )
+        return {
+            "success": all(result["error"] is None for result in results),
+            "results": results,
+            "mediaSync": media_sync_status(),
+            "timeline": timeline.to_list(),
+        }
+
+    except Exception as e:
+        logger.exception(f"Error creating cloze notes: {str(e)}")
+
+        return {
+            "success": False,
+            "error": {
+                "type": type(e).__name__,
+                "message": str(e),
+            },
+            "timeline": timeline.to_list(),
+        }
+
+
+def task_timeline(queued_at: float | None) -> Timeline:
+    """A timeline starting when the task was queued, which begins with the
+    time the task waited in the queue."""
+    timeline = Timeline(queued_at)
+    if queued_at is not None:
+        timeline.add("queue_wait", 0, timeline.now())
+    return timeline
+
+
+def progress_reporter(task) -> Callable[[Dict[str, Any]], None] | None:
+    """Publish progress as the task's PROGRESS state metadata.
+
+    The task id is bound here because progress may be reported from another
+    worker thread when notes are group-committed.
+    """
+    task_id = task.request.id
+    if task_id is None:
+        return None
+
+    def report(progress: Dict[str, Any]) -> None:
+        task.update_state(task_id=task_id, state="PROGRESS", meta=progress)
+
+    return report
+
+
+def media_sync_status() -> Dict[str, Any]:
+    """Media sync state of the notes just added.
+
+    With background media sync, media is uploaded after the task finishes;
+    the task status endpoint resolves "pending" once the generation is synced.
+    """
+    generation = anki.media_sync_generation()
+    if generation is None:
+        return {"status": "synced"}
+    return {"status": "pending", "generation": generation}
+
+
+def serialize_note_results(results: List[Any]) -> List[Dict[str, Any]]:
+    """Convert the per-note results of Anki.add_cloze_notes to JSON."""
+    serialized = []
+    for result in results:
+        if isinstance(result, Exception):
+            serialized.append(
+                {
+                    "noteId": None,
+                    "error": {"type": type(result).__name__, "message": str(result)},
+                }
+            )
+        else:
+            serialized.append({"noteId": result.id, "error": None})
+    return serialized
@@ -0,0 +1,248 @@
+"""Two-stage card creation: ``prepare_cloze_notes`` synthesizes the audio on the
+``tts`` queue, which any number of workers can serve, and hands the result to a
+commit task on the ``commit`` queue, served by the single collection writer."""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Dict, List
+
+from celery import chain
+from celery.result import AsyncResult
+
+from anki_sync_server.anki.cloze_note import ClozeNote as ClozeNoteSchema
+from anki_sync_server.anki.prepared_note import PreparedNote
+from anki_sync_server.server import anki, get_note_synthesizer, prepare_concurrency
+from anki_sync_server.tasks import card_creation_task
+from anki_sync_server.tasks.celery_app import celery_app
+from anki_sync_server.timeline import Timeline, recording, timed
+
+logger = logging.getLogger(__name__)
+
+
+def two_stage_pipeline_enabled() -> bool:
+    return os.getenv("ANKI_TWO_STAGE_PIPELINE", "false").lower() == "true"
+
+
+def enqueue_cloze_note_pipeline(
+    note_data: Dict[str, Any],
+    callback_url: str | None = None,
+    queued_at: float | None = None,
+) -> AsyncResult:
+    """Queue a note for the two-stage pipeline.
+
+    Returns:
+        AsyncResult: The commit task, whose result has the same shape as the
+        result of ``add_cloze_note``.
+    """
+    return chain(
+        prepare_cloze_notes_task.s([note_data], queued_at=queued_at),
+        commit_cloze_note_task.s(callback_url=callback_url),
+    ).apply_async()
+
+
+def enqueue_cloze_notes_pipeline(
+    notes_data: List[Dict[str, Any]],
+    callback_url: str | None = None,
+    queued_at: float | None = None,
+) -> AsyncResult:
+    """Queue a batch of notes for the two-stage pipeline.
+
+    Returns:
+        AsyncResult: The commit task, whose result has the same shape as the
+        result of ``add_cloze_notes``.
+    """
+    return chain(
+        prepare_cloze_notes_task.s(notes_data, queued_at=queued_at),
+        commit_cloze_notes_task.s(callback_url=callback_url),
+    ).apply_async()
+
+
+# The chain hands the result, audio included, to the commit task either way;
+# storing it in the result backend would only keep megabytes of audio around
+# for result_expires.
+@celery_app.task(bind=True, name="prepare_cloze_notes", ignore_result=True)
+def prepare_cloze_notes_task(
+    self,
+    notes_data: List[Dict[str, Any]],
+    user_id: str = None,
+    queued_at: float = None,
+) -> Dict[str, Any]:
+    """
+    Celery task synthesizing the audio of cloze notes without the collection.
+
+    Args:
+        notes_data: List of dictionaries containing note fields
+        user_id: Optional user identifier for tracking
+        queued_at: Optional Unix time the task was queued at
+
+    Returns:
+        Dictionary with the prepared note or error of every note, in order,
+        and the timeline so far
+    """
+    timeline = card_creation_task.task_timeline(queued_at)
+    try:
+        schema = ClozeNoteSchema(many=True)
+        cloze_notes = schema.load(notes_data)
+        note_synthesizer = get_note_synthesizer()
+
+        def synthesize(cloze_note) -> Dict[str, Any]:
+            try:
+                return {"note": note_synthesizer.synthesize(cloze_note).to_dict()}
+            except Exception as e:
+                logger.exception(f"Error preparing cloze note: {str(e)}")
+                return {"error": _serialize_error(e)}
+
+        with recording(timeline), timed("prepare"):
+            # Each note runs in a copy of this context, to time its TTS calls
+            contexts = [copy_context() for _ in cloze_notes]
+            with ThreadPoolExecutor(max_workers=prepare_concurrency()) as executor:
+                notes = list(
+                    executor.map(
+                        lambda context, note: context.run(synthesize, note),
+                        contexts,
+                        cloze_notes,
+                    )
+                )
+        return {"success": True, "notes": notes, **_prepared_timeline(timeline)}
+
+    except Exception as e:
+        logger.exception(f"Error preparing cloze notes: {str(e)}")
+        return {
+            "success": False,
+            "error": _serialize_error(e),
+            **_prepared_timeline(timeline),
+        }
+
+
+@celery_app.task(bind=True, name="commit_cloze_note")
+def commit_cloze_note_task(
+    self, prepared: Dict[str, Any], callback_url: str = None
+) -> Dict[str, Any]:
+    """
+    Celery task adding a note prepared by ``prepare_cloze_notes`` to Anki.
+
+    Args:
+        prepared: Result of ``prepare_cloze_notes``
+        callback_url: Optional webhook URL notified when the task finishes
+
+    Returns:
+        Dictionary with task result (cardId, noteId) or error details, and
+        the timeline of both stages
+    """
+    timeline = _commit_timeline(prepared)
+    try:
+        if not prepared["success"]:
+            return {
+                "success": False,
+                "error": prepared["error"],
+                "timeline": timeline.to_list(),
+            }
+
+        with recording(timeline):
+            result = _commit_prepared_notes(self, prepared["notes"])[0]
+        if result["error"] is not None:
+            return {
+                "success": False,
+                "error": result["error"],
+                "timeline": timeline.to_list(),
+            }
+        return {
+            "success": True,
+            "cardId": result["noteId"],
+            "noteId": result["noteId"],
+            "mediaSync": card_creation_task.media_sync_status(),
+            "timeline": timeline.to_list(),
+        }
+
+    except Exception as e:
+        logger.exception(f"Error committing cloze note: {str(e)}")
+        return {
+            "success": False,
+            "error": _serialize_error(e),
+            "timeline": timeline.to_list(),
+        }
+
+
+@celery_app.task(bind=True, name="commit_cloze_notes")
+def commit_cloze_notes_task(
+    self, prepared: Dict[str, Any], callback_url: str = None
+) -> Dict[str, Any]:
+    """
+    Celery task adding a batch prepared by ``prepare_cloze_notes`` to Anki.
+
+    Args:
+        prepared: Result of ``prepare_cloze_notes``
+        callback_url: Optional webhook URL notified when the task finishes
+
+    Returns:
+        Dictionary with the noteId or error of every note, in order, and the
+        timeline of both stages
+    """
+    timeline = _commit_timeline(prepared)
+    try:
+        if not prepared["success"]:
+            return {
+                "success": False,
+                "error": prepared["error"],
+                "timeline": timeline.to_list(),
+            }
+
+        with recording(timeline):
+            results = _commit_prepared_notes(self, prepared["notes"])
+        return {
+            "success": all(result["error"] is None for result in results),
+            "results": results,
+            "mediaSync": card_creation_task.media_sync_status(),
+            "timeline": timeline.to_list(),
+        }
+
+    except Exception as e:
+        logger.exception(f"Error committing cloze notes: {str(e)}")
+        return {
+            "success": False,
+            "error": _serialize_error(e),
+            "timeline": timeline.to_list(),
+        }
+
+
+def _commit_prepared_notes(task, notes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add the successfully prepared notes and merge in the preparation errors."""
+    prepared_notes = [
+        PreparedNote.from_dict(note["note"]) for note in notes if "error" not in note
+    ]
+    added = iter(
+        card_creation_task.serialize_note_results(
+            anki.add_prepared_notes(
+                prepared_notes, on_progress=card_creation_task.progress_reporter(task)
+            )
+        )
+        if prepared_notes
+        else []
+    )
+    return [
+        {"noteId": None, "error": note["error"]} if "error" in note else next(added)
+        for note in notes
+    ]
+
+
+def _prepared_timeline(timeline: Timeline) -> Dict[str, Any]:
+    """The timeline of the prepare stage, handed to the commit task."""
+    return {"queuedAt": timeline.origin, "timeline": timeline.to_list()}
+
+
+def _commit_timeline(prepared: Dict[str, Any]) -> Timeline:
+    """Continue the timeline of the prepare stage, with the time the commit
+    task waited in the queue after it."""
+    timeline = Timeline(prepared.get("queuedAt"))
+    phases = prepared.get("timeline", [])
+    timeline.extend(phases)
+    if phases:
+        prepared_at = max(phase["startMs"] + phase["durationMs"] for phase in phases)
+        timeline.add("commit_queue_wait", prepared_at / 1000, timeline.now())
+    return timeline
+
+
+def _serialize_error(e: Exception) -> Dict[str, str]:
+    return {"type": type(e).__name__, "message": str(e)}
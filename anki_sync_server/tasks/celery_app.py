@@ -1,10 +1,30 @@
+import logging
 import os
+import sqlite3
+from datetime import datetime, timezone
 
-from celery import Celery
+from celery import Celery, states
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+    worker_ready,
+    worker_shutdown,
+)
 from dotenv import load_dotenv
 
+from anki_sync_server import TASK_INDEX_FILE_PATH
+from anki_sync_server.metrics import TASK_SECONDS, create_registry
+from anki_sync_server.tasks.task_index import TaskIndex
+from anki_sync_server.tasks.webhook_dispatcher import WebhookDispatcher
+from anki_sync_server.timeline import phase_durations
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Create Celery app
 celery_app = Celery(__name__)
 
@@ -25,7 +45,151 @@ celery_app.conf.update(
     worker_concurrency=int(os.getenv("CELERY_WORKER_CONCURRENCY", "1")),
     task_time_limit=int(os.getenv("CELERY_TASK_TIME_LIMIT", "300")),
     result_expires=int(os.getenv("CELERY_RESULT_EXPIRES", "86400")),
+    # Two-stage pipeline: audio synthesis scales out on "tts", while the
+    # single collection writer serves "commit" (and the default queue).
+    task_routes={
+        "prepare_cloze_notes": {"queue": "tts"},
+        "commit_cloze_note": {"queue": "commit"},
+        "commit_cloze_notes": {"queue": "commit"},
+    },
 )
 
 # Import tasks to register them with Celery
 from anki_sync_server.tasks import card_creation_task  # noqa: E402, F401
+from anki_sync_server.tasks import card_pipeline_task  # noqa: E402, F401
+
+
+@worker_process_init.connect
+def _warm_up_worker_process(**kwargs):
+    # Prefork pool: each child process has its own collection
+    from anki_sync_server.server import start_warm_up
+
+    start_warm_up()
+
+
+@worker_ready.connect
+def _warm_up_worker(sender=None, **kwargs):
+    # Thread and solo pools run tasks in the main process, which prefork
+    # children must not inherit an open collection from.
+    from celery.concurrency.prefork import TaskPool as PreforkTaskPool
+
+    if isinstance(getattr(sender, "pool", None), PreforkTaskPool):
+        return
+
+    from anki_sync_server.server import start_warm_up
+
+    start_warm_up()
+
+
+# Tasks whose IDs are given to clients, which are indexed and whose completion
+# is pushed to webhooks
+CLIENT_TASKS = {
+    "add_cloze_note",
+    "add_cloze_notes",
+    "commit_cloze_note",
+    "commit_cloze_notes",
+}
+
+webhook_dispatcher = WebhookDispatcher(secret=os.getenv("WEBHOOK_SECRET") or None)
+
+
+@task_postrun.connect
+def _notify_webhooks(
+    task_id=None, task=None, kwargs=None, retval=None, state=None, **_
+):
+    if task is None or task.name not in CLIENT_TASKS:
+        return
+    urls = [(kwargs or {}).get("callback_url"), os.getenv("WEBHOOK_URL")]
+    urls = [url for url in dict.fromkeys(urls) if url]
+    if not urls:
+        return
+
+    event = {
+        "taskId": task_id,
+        "taskName": task.name,
+        "status": "failure",
+        "completedAt": datetime.now(timezone.utc).isoformat(),
+        "result": None,
+        "error": None,
+    }
+    if state == states.SUCCESS:
+        event["result"] = retval
+        if isinstance(retval, dict) and retval.get("success"):
+            event["status"] = "success"
+    else:
+        event["error"] = {"type": type(retval).__name__, "message": str(retval)}
+
+    for url in urls:
+        webhook_dispatcher.dispatch(url, event)
+
+
+task_index = TaskIndex(
+    TASK_INDEX_FILE_PATH, retention_seconds=celery_app.conf.result_expires
+)
+
+
+def _client_task(task_id, task):
+    """The ID and name of the task given to the client that ``task`` runs for:
+    the task itself, or the commit task following a ``prepare_cloze_notes``."""
+    if task is None:
+        return None
+    if task.name in CLIENT_TASKS:
+        return task_id, task.name
+    # The rest of the chain, last task first
+    remaining = getattr(task.request, "chain", None) or []
+    if remaining and remaining[0].get("task") in CLIENT_TASKS:
+        return remaining[0]["options"]["task_id"], remaining[0]["task"]
+    return None
+
+
+@task_prerun.connect
+def _index_task_start(task_id=None, task=None, **_):
+    client_task = _client_task(task_id, task)
+    if client_task is None:
+        return
+    try:
+        task_index.record_started(*client_task)
+    except sqlite3.Error:
+        logger.exception(f"Failed to index the start of task {client_task[0]}")
+
+
+@task_postrun.connect
+def _index_task_end(task_id=None, task=None, retval=None, state=None, **_):
+    if task is None or task.name not in CLIENT_TASKS:
+        return
+
+    status, error, timings = "failure", None, None
+    if state != states.SUCCESS:
+        error = {"type": type(retval).__name__, "message": str(retval)}
+    elif isinstance(retval, dict):
+        if retval.get("success"):
+            status = "success"
+        else:
+            error = retval.get("error")
+        if retval.get("timeline"):
+            timings = phase_durations(retval["timeline"])
+    try:
+        task_index.record_finished(task_id, task.name, status, error, timings=timings)
+    except sqlite3.Error:
+        logger.exception(f"Failed to index the end of task {task_id}")
+
+    if timings:
+        TASK_SECONDS.labels(task=task.name, status=status).observe(
+            timings["total"] / 1000
+        )
+
+
+@worker_init.connect
+def _start_metrics_exporter(**kwargs):
+    port = os.getenv("CELERY_METRICS_PORT")
+    if not port:
+        return
+    from prometheus_client import start_http_server
+
+    start_http_server(int(port), registry=create_registry())
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def _flush_webhooks(**kwargs):
+    webhook_dispatcher.flush(timeout=10)
@@ -0,0 +1,328 @@
+import base64
+import json
+import math
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+from anki_sync_server.sqlite_store import SqliteStore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    task_name TEXT,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    completed_at REAL,
+    notes TEXT,
+    error TEXT,
+    timings TEXT,
+    client TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_created_at ON tasks (created_at, task_id);
+CREATE INDEX IF NOT EXISTS tasks_status_created_at
+    ON tasks (status, created_at, task_id);
+"""
+
+# Columns added after the table was introduced
+_ADDED_COLUMNS = {"timings": "TEXT", "client": "TEXT"}
+
+# Created after the table, which may predate the timings column
+_TIMINGS_INDEX = """
+CREATE INDEX IF NOT EXISTS tasks_completed_at ON tasks (completed_at)
+    WHERE timings IS NOT NULL;
+"""
+
+_COLUMNS = (
+    "task_id, task_name, status, created_at, started_at, completed_at, notes, error"
+)
+
+# Keep SQL statements below SQLite's limit on bound parameters
+_MAX_IDS_PER_QUERY = 500
+
+# Notes of a task, which is one if the worker recorded it before the API did
+_NOTE_COUNT = "COALESCE(json_extract(notes, '$.count'), 1)"
+
+
+class TaskIndex:
+    """SQLite table of the tasks given to clients, for listing and looking up
+    tasks without a round trip to the result backend per task.
+
+    The API records a task when it is queued, and the worker when it starts
+    and finishes, in whichever order they get there. The database is opened in
+    WAL mode, so the API and worker processes can share it.
+    """
+
+    def __init__(self, path: str, retention_seconds: float = 86400) -> None:
+        self._database = SqliteStore(path, _SCHEMA, _migrate)
+        self._retention_seconds = retention_seconds
+        self._pruned_at = 0.0
+
+    def record_queued(
+        self,
+        task_id: str,
+        task_name: str,
+        notes: Dict[str, Any],
+        created_at: float | None = None,
+        client: str | None = None,
+    ) -> None:
+        """Record that a task was queued.
+
+        Args:
+            notes: Summary of the task's notes, with their ``count``.
+            client: Who queued the task, counted by ``queued_notes``.
+        """
+        created_at = time.time() if created_at is None else created_at
+        with self._database.connect() as connection:
+            connection.execute(
+                "INSERT INTO tasks (task_id, task_name, status, created_at, notes,"
+                " client) VALUES (?, ?, 'pending', ?, ?, ?)"
+                " ON CONFLICT (task_id) DO UPDATE SET"
+                " task_name = excluded.task_name,"
+                " created_at = MIN(created_at, excluded.created_at),"
+                " notes = excluded.notes,"
+                " client = excluded.client",
+                (task_id, task_name, created_at, json.dumps(notes), client),
+            )
+            self._prune(connection)
+
+    def record_started(
+        self, task_id: str, task_name: str, started_at: float | None = None
+    ) -> None:
+        started_at = time.time() if started_at is None else started_at
+        with self._database.connect() as connection:
+            connection.execute(
+                "INSERT INTO tasks (task_id, task_name, status, created_at,"
+                " started_at) VALUES (?, ?, 'started', ?, ?)"
+                " ON CONFLICT (task_id) DO UPDATE SET"
+                " status = CASE WHEN status = 'pending' THEN 'started'"
+                " ELSE status END,"
+                " started_at = COALESCE(started_at, excluded.started_at)",
+                (task_id, task_name, started_at, started_at),
+            )
+
+    def record_finished(
+        self,
+        task_id: str,
+        task_name: str,
+        status: str,
+        error: Dict[str, Any] | None = None,
+        completed_at: float | None = None,
+        timings: Dict[str, float] | None = None,
+    ) -> None:
+        """Record that a task finished.
+
+        Args:
+            timings: Milliseconds the task spent in each phase, summarized by
+                ``timing_percentiles``.
+        """
+        completed_at = time.time() if completed_at is None else completed_at
+        with self._database.connect() as connection:
+            connection.execute(
+                "INSERT INTO tasks (task_id, task_name, status, created_at,"
+                " started_at, completed_at, error, timings)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (task_id) DO UPDATE SET"
+                " status = excluded.status,"
+                " started_at = COALESCE(started_at, excluded.started_at),"
+                " completed_at = excluded.completed_at,"
+                " error = excluded.error,"
+                " timings = excluded.timings",
+                (
+                    task_id,
+                    task_name,
+                    status,
+                    completed_at,
+                    completed_at,
+                    completed_at,
+                    None if error is None else json.dumps(error),
+                    None if timings is None else json.dumps(timings),
+                ),
+            )
+
+    def get(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """The recorded tasks among ``task_ids``, by task ID."""
+        task_ids = list(dict.fromkeys(task_ids))
+        tasks = {}
+        with self._database.connect() as connection:
+            for start in range(0, len(task_ids), _MAX_IDS_PER_QUERY):
+                chunk = task_ids[start : start + _MAX_IDS_PER_QUERY]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT {_COLUMNS} FROM tasks WHERE task_id IN ({placeholders})",
+                    chunk,
+                )
+                for row in rows:
+                    tasks[row[0]] = _to_task(row)
+        return tasks
+
+    def search(
+        self,
+        status: str | None = None,
+        since: float | None = None,
+        limit: int = 50,
+        cursor: str | None = None,
+    ) -> Tuple[List[Dict[str, Any]], str | None]:
+        """Tasks created at or after ``since``, newest first.
+
+        Returns:
+            Up to ``limit`` tasks, and the cursor of the next page, or None if
+            there are no more tasks.
+
+        Raises:
+            ValueError: If ``cursor`` is not one returned by this method.
+        """
+        conditions = []
+        parameters: List[Any] = []
+        if status is not None:
+            conditions.append("status = ?")
+            parameters.append(status)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            parameters.append(since)
+        if cursor is not None:
+            created_at, task_id = _decode_cursor(cursor)
+            conditions.append("(created_at, task_id) < (?, ?)")
+            parameters.extend([created_at, task_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._database.connect() as connection:
+            rows = connection.execute(
+                f"SELECT {_COLUMNS} FROM tasks {where}"
+                " ORDER BY created_at DESC, task_id DESC LIMIT ?",
+                [*parameters, limit + 1],
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][3], rows[-1][0])
+        return [_to_task(row) for row in rows], next_cursor
+
+    def queued_notes(
+        self,
+        since: float,
+        client: str | None = None,
+        started_since: float | None = None,
+    ) -> Tuple[int, int]:
+        """Notes of the tasks created at or after ``since`` that have not
+        finished yet, leaving out the tasks started before ``started_since``.
+
+        Returns:
+            The number of such notes, and how many of them ``client`` queued.
+        """
+        with self._database.connect() as connection:
+            queued, client_queued = connection.execute(
+                f"SELECT COALESCE(SUM({_NOTE_COUNT}), 0),"
+                f" COALESCE(SUM(CASE WHEN client = ? THEN {_NOTE_COUNT} END), 0)"
+                " FROM tasks WHERE created_at >= ?"
+                " AND (status = 'pending'"
+                " OR status = 'started' AND (? IS NULL OR started_at >= ?))",
+                (client, since, started_since, started_since),
+            ).fetchone()
+        return queued, client_queued
+
+    def finished_notes(self, since: float) -> int:
+        """Notes of the tasks that ran and finished at or after ``since``."""
+        with self._database.connect() as connection:
+            (finished,) = connection.execute(
+                f"SELECT COALESCE(SUM({_NOTE_COUNT}), 0) FROM tasks"
+                " WHERE completed_at >= ? AND timings IS NOT NULL",
+                (since,),
+            ).fetchone()
+        return finished
+
+    def timing_percentiles(
+        self,
+        since: float,
+        percentiles: Tuple[int, ...] = (50, 90, 99),
+        max_tasks: int = 10000,
+    ) -> Dict[str, Any]:
+        """Percentiles of the time spent in each phase by the tasks that
+        finished at or after ``since``, at most the latest ``max_tasks``.
+
+        Returns:
+            The number of tasks, and the number of tasks with the phase, the
+            percentiles and the maximum in milliseconds, by phase.
+        """
+        with self._database.connect() as connection:
+            rows = connection.execute(
+                "SELECT timings FROM tasks"
+                " WHERE completed_at >= ? AND timings IS NOT NULL"
+                " ORDER BY completed_at DESC LIMIT ?",
+                (since, max_tasks),
+            ).fetchall()
+
+        samples: Dict[str, List[float]] = {}
+        for (timings,) in rows:
+            for phase, milliseconds in json.loads(timings).items():
+                samples.setdefault(phase, []).append(milliseconds)
+
+        phases = {}
+        for phase, values in samples.items():
+            values.sort()
+            phases[phase] = {
+                "count": len(values),
+                **{
+                    f"p{percentile}": values[
+                        max(math.ceil(percentile / 100 * len(values)) - 1, 0)
+                    ]
+                    for percentile in percentiles
+                },
+                "max": values[-1],
+            }
+        return {"tasks": len(rows), "phases": phases}
+
+    def _prune(self, connection: sqlite3.Connection) -> None:
+        """Forget tasks older than the retention, at most once a minute."""
+        now = time.time()
+        if now - self._pruned_at < 60:
+            return
+        self._pruned_at = now
+        connection.execute(
+            "DELETE FROM tasks WHERE created_at < ?", (now - self._retention_seconds,)
+        )
+
+
+def _to_task(row) -> Dict[str, Any]:
+    task_id, task_name, status, created_at, started_at, completed_at, notes, error = (
+        row
+    )
+    return {
+        "taskId": task_id,
+        "taskName": task_name,
+        "status": status,
+        "createdAt": _isoformat(created_at),
+        "startedAt": _isoformat(started_at),
+        "completedAt": _isoformat(completed_at),
+        "notes": None if notes is None else json.loads(notes),
+        "error": None if error is None else json.loads(error),
+    }
+
+
+def _isoformat(timestamp: float | None) -> str | None:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _encode_cursor(created_at: float, task_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, task_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(created_at), str(task_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _migrate(connection: sqlite3.Connection) -> None:
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(tasks)")}
+    for column, column_type in _ADDED_COLUMNS.items():
+        if column not in columns:
+            connection.execute(f"ALTER TABLE tasks ADD COLUMN {column} {column_type}")
+    connection.executescript(_TIMINGS_INDEX)
@@ -0,0 +1,181 @@
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import logging
+import time
+import urllib.request
+from threading import Condition, Thread
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookDispatcher:
+    """Deliver events to webhook URLs from a background thread.
+
+    Events for the same URL are sent together as ``{"events": [...]}`` once
+    ``max_batch_size`` events are pending or the oldest pending event has
+    waited ``flush_interval_seconds``. A failed delivery is retried with
+    exponential backoff, up to ``max_attempts`` attempts. When a secret is
+    set, the body is signed with HMAC-SHA256 in the ``X-Webhook-Signature``
+    header.
+    """
+
+    SIGNATURE_HEADER = "X-Webhook-Signature"
+
+    def __init__(
+        self,
+        max_batch_size: int = 50,
+        flush_interval_seconds: float = 1,
+        max_attempts: int = 5,
+        initial_backoff_seconds: float = 1,
+        timeout: float = 10,
+        secret: str | None = None,
+    ) -> None:
+        self._max_batch_size = max_batch_size
+        self._flush_interval_seconds = flush_interval_seconds
+        self._max_attempts = max_attempts
+        self._initial_backoff_seconds = initial_backoff_seconds
+        self._timeout = timeout
+        self._secret = secret
+        self._condition = Condition()
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._pending_since: Dict[str, float] = {}
+        # (due time, sequence number, url, events, attempt)
+        self._retries: List[Tuple[float, int, str, List[Dict[str, Any]], int]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        # Number of flush calls waiting; while positive, everything is due now
+        self._flushing = 0
+        self._thread: Thread | None = None
+
+    def dispatch(self, url: str, event: Dict[str, Any]) -> None:
+        with self._condition:
+            self._pending.setdefault(url, []).append(event)
+            self._pending_since.setdefault(url, time.monotonic())
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run, name="webhook-dispatcher", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout: float) -> bool:
+        """Send pending events and retries now, and wait until all deliveries
+        are done, e.g. before the process exits.
+
+        Returns:
+            bool: Whether every delivery finished within the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                while self._pending or self._retries or self._in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self._flushing -= 1
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                deliveries = self._take_due_deliveries()
+                while not deliveries:
+                    self._condition.wait(self._time_until_next_due())
+                    deliveries = self._take_due_deliveries()
+                self._in_flight += len(deliveries)
+
+            for url, events, attempt in deliveries:
+                self._deliver(url, events, attempt)
+
+    def _take_due_deliveries(self) -> List[Tuple[str, List[Dict[str, Any]], int]]:
+        now = time.monotonic()
+        deliveries = []
+        for url in list(self._pending):
+            events = self._pending[url]
+            if (
+                not self._flushing
+                and len(events) < self._max_batch_size
+                and now - self._pending_since[url] < self._flush_interval_seconds
+            ):
+                continue
+            batch = events[: self._max_batch_size]
+            rest = events[self._max_batch_size :]
+            deliveries.append((url, batch, 1))
+            if rest:
+                self._pending[url] = rest
+                self._pending_since[url] = now
+            else:
+                del self._pending[url]
+                del self._pending_since[url]
+        while self._retries and (self._flushing or self._retries[0][0] <= now):
+            _, _, url, events, attempt = heapq.heappop(self._retries)
+            deliveries.append((url, events, attempt))
+        return deliveries
+
+    def _time_until_next_due(self) -> float | None:
+        if self._flushing and (self._pending or self._retries):
+            return 0
+        due_times = [
+            since + self._flush_interval_seconds
+            for since in self._pending_since.values()
+        ]
+        if self._retries:
+            due_times.append(self._retries[0][0])
+        if not due_times:
+            return None
+        return max(0, min(due_times) - time.monotonic())
+
+    def _deliver(self, url: str, events: List[Dict[str, Any]], attempt: int) -> None:
+        try:
+            self._send(url, events)
+        except Exception:
+            if attempt >= self._max_attempts:
+                logger.exception(
+                    f"Dropping {len(events)} webhook events for {url} "
+                    + f"after {attempt} attempts"
+                )
+            else:
+                backoff = self._initial_backoff_seconds * 2 ** (attempt - 1)
+                logger.warning(
+                    f"Webhook delivery to {url} failed, retrying in {backoff}s",
+                    exc_info=True,
+                )
+                with self._condition:
+                    heapq.heappush(
+                        self._retries,
+                        (
+                            time.monotonic() + backoff,
+                            next(self._sequence),
+                            url,
+                            events,
+                            attempt + 1,
+                        ),
+                    )
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _send(self, url: str, events: List[Dict[str, Any]]) -> None:
+        """
+        Raises:
+            URLError: If the request fails or the response status is not 2xx
+        """
+        body = json.dumps({"events": events}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self._secret:
+            signature = hmac.new(
+                self._secret.encode("utf-8"), body, hashlib.sha256
+            ).hexdigest()
+            headers[self.SIGNATURE_HEADER] = f"sha256={signature}"
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self._timeout) as response:
+            response.read()
@@ -0,0 +1,104 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Tuple
+
+from anki_sync_server.metrics import observe_phase
+
+# Timelines recording the phases timed in the current context. Notes that are
+# group-committed share one commit, which is recorded on all of their
+# timelines.
+_recording: ContextVar[Tuple["Timeline", ...]] = ContextVar("recording", default=())
+
+
+class Timeline:
+    """When each phase of a task started and how long it took.
+
+    Phases are recorded in milliseconds relative to ``origin``, the wall-clock
+    time the task was queued, so that the stages of a task running in
+    different processes line up. Durations are measured with a monotonic
+    clock.
+    """
+
+    def __init__(self, origin: float | None = None) -> None:
+        now = time.time()
+        self._origin = now if origin is None else origin
+        # Monotonic clock reading at the origin
+        self._monotonic_origin = time.monotonic() - (now - self._origin)
+        self._lock = Lock()
+        self._phases: List[Dict[str, Any]] = []
+
+    @property
+    def origin(self) -> float:
+        return self._origin
+
+    def now(self) -> float:
+        """Seconds since the origin."""
+        return time.monotonic() - self._monotonic_origin
+
+    def add(self, phase: str, start: float, end: float, **details: Any) -> None:
+        """Record a phase between two readings of ``now``."""
+        entry = {
+            "phase": phase,
+            "startMs": round(start * 1000, 1),
+            "durationMs": round(max(end - start, 0) * 1000, 1),
+            **details,
+        }
+        with self._lock:
+            self._phases.append(entry)
+
+    def extend(self, phases: List[Dict[str, Any]]) -> None:
+        """Add the phases of an earlier stage of the task, with the same origin."""
+        with self._lock:
+            self._phases.extend(phases)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._phases, key=lambda entry: entry["startMs"])
+
+
+def phase_durations(phases: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Total milliseconds spent in each phase of a timeline, and in ``total``
+    from the origin to the end of the last phase."""
+    durations: Dict[str, float] = {}
+    end = 0.0
+    for phase in phases:
+        name = phase["phase"]
+        durations[name] = round(durations.get(name, 0) + phase["durationMs"], 1)
+        end = max(end, phase["startMs"] + phase["durationMs"])
+    if phases:
+        durations["total"] = round(end, 1)
+    return durations
+
+
+@contextmanager
+def recording(*timelines: Timeline) -> Iterator[None]:
+    """Record the phases timed in this context on ``timelines``."""
+    token = _recording.set(timelines)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+
+def active_timelines() -> Tuple[Timeline, ...]:
+    return _recording.get()
+
+
+@contextmanager
+def timed(phase: str, **details: Any) -> Iterator[Dict[str, Any]]:
+    """Record how long the block takes as ``phase`` on the active timelines,
+    and in the phase's metric.
+
+    Yields the phase's details, to which the block may add.
+    """
+    timelines = _recording.get()
+    started_at = time.monotonic()
+    starts = [timeline.now() for timeline in timelines]
+    try:
+        yield details
+    finally:
+        observe_phase(phase, time.monotonic() - started_at, details)
+        for timeline, start in zip(timelines, starts):
+            timeline.add(phase, start, timeline.now(), **details)
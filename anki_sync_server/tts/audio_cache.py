@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from threading import Event, Lock
+from typing import Callable, Dict
+
+
+class _InFlight:
+    def __init__(self) -> None:
+        self.done = Event()
+        self.data: bytes | None = None
+        self.error: BaseException | None = None
+
+
+class AudioCache:
+    """Content-addressed, size-capped disk cache for synthesized audio.
+
+    Entries are stored as one file per key in ``cache_dir``. The least recently
+    used entries are evicted once the total size exceeds ``max_bytes``.
+    Concurrent requests for a key that is not cached yet share one call to the
+    factory passed to ``get_or_create``.
+    """
+
+    EXTENSION = ".audio"
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024) -> None:
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._lock = Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        self._in_flight: Dict[str, _InFlight] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(text: str, voice_config: dict) -> str:
+        payload = json.dumps(
+            {"text": text, "voice": voice_config}, sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(key)
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                self._remember(key, len(data))
+            self._entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._forget(key)
+            self._remember(key, len(data))
+            self._evict()
+
+    def get_or_create(self, key: str, factory: Callable[[], bytes]) -> bytes:
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            is_owner = in_flight is None
+            if is_owner:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+
+        if not is_owner:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.data
+
+        try:
+            in_flight.data = factory()
+            self.put(key, in_flight.data)
+            return in_flight.data
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.done.set()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key + self.EXTENSION)
+
+    def _load_index(self) -> None:
+        entries = []
+        for name in os.listdir(self._cache_dir):
+            if not name.endswith(self.EXTENSION):
+                continue
+            stat = os.stat(os.path.join(self._cache_dir, name))
+            entries.append((stat.st_mtime, name[: -len(self.EXTENSION)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._remember(key, size)
+        self._evict()
+
+    def _remember(self, key: str, size: int) -> None:
+        self._entries[key] = size
+        self._total_bytes += size
+
+    def _forget(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        while self._total_bytes > self._max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
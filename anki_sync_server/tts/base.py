@@ -1,9 +1,70 @@
+import unicodedata
 from abc import ABC, abstractmethod
 
+from anki_sync_server.metrics import TTS_BYTES
+from anki_sync_server.timeline import timed
+from anki_sync_server.tts.audio_cache import AudioCache
+from anki_sync_server.tts.transcoder import AudioTranscoder
+
 
 class TtsService(ABC):
+    _audio_cache: AudioCache | None = None
+    _transcoder: AudioTranscoder | None = None
+
+    def set_audio_cache(self, audio_cache: AudioCache | None) -> None:
+        self._audio_cache = audio_cache
+
+    def set_transcoder(self, transcoder: AudioTranscoder | None) -> None:
+        self._transcoder = transcoder
+
     def generate_audio(self, text: str) -> bytes:
-        return self._generate_audio(text)
+        text = self._normalize_text(text)
+        with timed("tts") as details:
+            if self._audio_cache is None:
+                return self._generate_encoded_audio(text)
+
+            voice_config = self.get_voice_config()
+            if self._transcoder is not None:
+                voice_config = {
+                    **voice_config,
+                    "transcoder": self._transcoder.get_config(),
+                }
+            key = AudioCache.make_key(text, voice_config)
+            details["cached"] = True
+
+            def generate() -> bytes:
+                details["cached"] = False
+                return self._generate_encoded_audio(text)
+
+            return self._audio_cache.get_or_create(key, generate)
+
+    def get_file_extension(self) -> str:
+        """The file extension matching the codec of ``generate_audio``."""
+        if self._transcoder is not None:
+            return self._transcoder.get_file_extension()
+        return self._get_file_extension()
+
+    def _get_file_extension(self) -> str:
+        """The file extension matching the codec of ``_generate_audio``."""
+        return "mp3"
+
+    def get_voice_config(self) -> dict:
+        """Settings that affect the generated audio, used in the cache key."""
+        return {}
+
+    def warm_up(self) -> None:
+        """Prepare for the first request, e.g. by connecting to the TTS API."""
+
+    def _generate_encoded_audio(self, text: str) -> bytes:
+        data = self._generate_audio(text)
+        TTS_BYTES.inc(len(data))
+        if self._transcoder is not None:
+            data = self._transcoder.transcode(data)
+        return data
+
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
 
     @abstractmethod
     def _generate_audio(self, text: str) -> bytes:
@@ -0,0 +1,126 @@
+import http.client
+import ssl
+import time
+from threading import BoundedSemaphore, Lock
+from typing import Dict, List, Tuple
+
+# Errors raised when a kept-alive connection was closed by the server while idle.
+_STALE_CONNECTION_ERRORS = (
+    BrokenPipeError,
+    ConnectionAbortedError,
+    ConnectionResetError,
+    http.client.BadStatusLine,
+    http.client.CannotSendRequest,
+)
+
+
+class HttpsConnectionPool:
+    """Thread-safe pool of persistent HTTPS connections to a single host.
+
+    At most ``max_size`` connections are open at once; callers beyond that
+    block until a connection is returned. Connections idle for longer than
+    ``idle_timeout_seconds`` are closed instead of reused, and a request that
+    fails because the server dropped a reused connection is retried once on a
+    fresh one.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int | None = None,
+        max_size: int = 4,
+        idle_timeout_seconds: float = 60,
+        timeout: float = 30,
+        context: ssl.SSLContext | None = None,
+        connection_class: type = http.client.HTTPSConnection,
+    ) -> None:
+        self._host = host
+        self._port = port
+        self._idle_timeout_seconds = idle_timeout_seconds
+        self._timeout = timeout
+        self._context = context
+        self._connection_class = connection_class
+        self._slots = BoundedSemaphore(max_size)
+        self._lock = Lock()
+        self._idle: List[Tuple[http.client.HTTPConnection, float]] = []
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: str | bytes | None = None,
+        headers: Dict[str, str] | None = None,
+    ) -> Tuple[int, bytes]:
+        """Send a request and read the whole response.
+
+        Returns:
+            Tuple[int, bytes]: The response status and body.
+        """
+        with self._slots:
+            connection, reused = self._acquire()
+            try:
+                try:
+                    response = self._send(connection, method, path, body, headers)
+                except _STALE_CONNECTION_ERRORS:
+                    if not reused:
+                        raise
+                    connection.close()
+                    connection = self._connect()
+                    response = self._send(connection, method, path, body, headers)
+                data = response.read()
+            except BaseException:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(connection)
+            return response.status, data
+
+    def warm_up(self) -> None:
+        """Open a connection ahead of the first request."""
+        with self._slots:
+            connection = self._connect()
+            connection.connect()
+            self._release(connection)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            connection.close()
+
+    def _send(
+        self,
+        connection: http.client.HTTPConnection,
+        method: str,
+        path: str,
+        body: str | bytes | None,
+        headers: Dict[str, str] | None,
+    ) -> http.client.HTTPResponse:
+        if isinstance(body, str):
+            # http.client only sends bytes bodies in the same packet as the headers
+            body = body.encode("utf-8")
+        connection.request(method, path, body, headers or {})
+        return connection.getresponse()
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                connection, released_at = self._idle.pop()
+                if now - released_at <= self._idle_timeout_seconds:
+                    return connection, True
+                connection.close()
+        return self._connect(), False
+
+    def _release(self, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+
+    def _connect(self) -> http.client.HTTPConnection:
+        kwargs = {"timeout": self._timeout}
+        if issubclass(self._connection_class, http.client.HTTPSConnection):
+            kwargs["context"] = self._context
+        return self._connection_class(self._host, self._port, **kwargs)
@@ -1,13 +1,35 @@
 import base64
-import http.client
 import json
 
 from anki_sync_server.tts.base import TtsService
+from anki_sync_server.tts.connection_pool import HttpsConnectionPool
 
 
 class GcpTtsService(TtsService):
-    def __init__(self, api_key: str):
+    HOST = "texttospeech.googleapis.com"
+    # audioEncoding -> file extension of the returned audio
+    AUDIO_ENCODINGS = {
+        "MP3": "mp3",
+        "OGG_OPUS": "ogg",
+        "LINEAR16": "wav",
+    }
+
+    def __init__(
+        self,
+        api_key: str,
+        connection_pool: HttpsConnectionPool | None = None,
+        audio_encoding: str = "MP3",
+    ):
+        if audio_encoding not in self.AUDIO_ENCODINGS:
+            raise ValueError(f"Unsupported audio encoding: {audio_encoding}")
         self._api_key = api_key
+        self._audio_encoding = audio_encoding
+        if connection_pool is None:
+            connection_pool = HttpsConnectionPool(self.HOST)
+        self._connection_pool = connection_pool
+
+    def warm_up(self) -> None:
+        self._connection_pool.warm_up()
 
     def _generate_audio(self, text: str) -> bytes:
         """
@@ -27,25 +49,26 @@ class GcpTtsService(TtsService):
         Raises:
             JSONDecodeError: If the response is not a valid JSON
         """
-        conn = http.client.HTTPSConnection("texttospeech.googleapis.com")
         headers = {"content-type": "application/json", "X-Goog-Api-Key": self._api_key}
-        conn.request(
+        _, data = self._connection_pool.request(
             "POST", "/v1/text:synthesize", self._get_payload(text=text), headers
         )
-        response = conn.getresponse()
-        data = response.read()
-        conn.close()
         return json.loads(data)
 
-    def _get_payload(self, text: str) -> str:
-        data = {
+    def get_voice_config(self) -> dict:
+        return {
             "audioConfig": {
-                "audioEncoding": "LINEAR16",
+                "audioEncoding": self._audio_encoding,
                 "effectsProfileId": ["large-home-entertainment-class-device"],
                 "pitch": 0,
                 "speakingRate": 1,
             },
-            "input": {"text": text},
             "voice": {"languageCode": "en-US", "name": "en-US-Wavenet-D"},
         }
+
+    def _get_file_extension(self) -> str:
+        return self.AUDIO_ENCODINGS[self._audio_encoding]
+
+    def _get_payload(self, text: str) -> str:
+        data = {"input": {"text": text}, **self.get_voice_config()}
         return json.dumps(data)
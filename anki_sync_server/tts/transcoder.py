@@ -0,0 +1,71 @@
+import shutil
+import subprocess
+
+
+class AudioTranscoder:
+    """Transcode synthesized audio with ffmpeg, optionally trimming the
+    leading and trailing silence.
+
+    ffmpeg is an optional dependency that is only needed when local
+    transcoding is enabled.
+    """
+
+    # output format -> (ffmpeg encoder, ffmpeg muxer, file extension)
+    FORMATS = {
+        "mp3": ("libmp3lame", "mp3", "mp3"),
+        "ogg": ("libopus", "ogg", "ogg"),
+    }
+    SILENCE_THRESHOLD = "-50dB"
+
+    def __init__(
+        self,
+        output_format: str = "ogg",
+        bitrate: str = "32k",
+        trim_silence: bool = True,
+        ffmpeg_path: str | None = None,
+    ) -> None:
+        if output_format not in self.FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        if ffmpeg_path is None:
+            ffmpeg_path = shutil.which("ffmpeg")
+        if ffmpeg_path is None:
+            raise RuntimeError("ffmpeg is required for audio transcoding")
+
+        self._output_format = output_format
+        self._bitrate = bitrate
+        self._trim_silence = trim_silence
+        self._ffmpeg_path = ffmpeg_path
+
+    def get_file_extension(self) -> str:
+        return self.FORMATS[self._output_format][2]
+
+    def get_config(self) -> dict:
+        """Settings that affect the transcoded audio, used in the cache key."""
+        return {
+            "format": self._output_format,
+            "bitrate": self._bitrate,
+            "trimSilence": self._trim_silence,
+        }
+
+    def transcode(self, data: bytes) -> bytes:
+        """
+        Raises:
+            CalledProcessError: If ffmpeg fails to transcode the audio
+        """
+        encoder, muxer, _ = self.FORMATS[self._output_format]
+        args = [self._ffmpeg_path, "-hide_banner", "-loglevel", "error"]
+        args += ["-i", "pipe:0"]
+        if self._trim_silence:
+            args += ["-af", self._trim_silence_filter()]
+        args += ["-c:a", encoder, "-b:a", self._bitrate, "-f", muxer, "pipe:1"]
+        completed = subprocess.run(args, input=data, capture_output=True, check=True)
+        return completed.stdout
+
+    def _trim_silence_filter(self) -> str:
+        # silenceremove only trims the start reliably, so trim, reverse, trim
+        # the (former) end and reverse back.
+        trim_start = (
+            "silenceremove=start_periods=1:"
+            f"start_threshold={self.SILENCE_THRESHOLD}"
+        )
+        return f"{trim_start},areverse,{trim_start},areverse"
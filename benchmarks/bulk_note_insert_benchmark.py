@@ -0,0 +1,58 @@
+"""Compare the per-note cost of adding notes one by one against a single
+batched backend call, on a throwaway collection.
+
+Usage:
+    python -m benchmarks.bulk_note_insert_benchmark [--notes 200]
+"""
+
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from anki.collection import AddNoteRequest, Collection
+
+from anki_sync_server.anki.model_creator import ModelCreator
+
+
+def _new_notes(collection: Collection, model, count: int):
+    notes = []
+    for i in range(count):
+        note = collection.new_note(model)
+        note["Word"] = f"word{i}"
+        note["Text"] = f"An {{{{c1::word{i}}}}} example."
+        notes.append(note)
+    return notes
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--notes", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        collection = Collection(os.path.join(tmpdirname, "collection.anki2"))
+        model = ModelCreator(collection).create_model()
+        deck_id = collection.decks.id("Benchmark")
+
+        notes = _new_notes(collection, model, args.notes)
+        start = time.perf_counter()
+        for note in notes:
+            collection.add_note(note, deck_id)
+        one_by_one = time.perf_counter() - start
+
+        notes = _new_notes(collection, model, args.notes)
+        start = time.perf_counter()
+        collection.add_notes(
+            [AddNoteRequest(note=note, deck_id=deck_id) for note in notes]
+        )
+        batched = time.perf_counter() - start
+        collection.close()
+
+    print(f"{args.notes} notes")
+    print(f"add_note per note   {one_by_one / args.notes * 1000:7.3f} ms")
+    print(f"add_notes per note  {batched / args.notes * 1000:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare the throughput of CredentialStorage reads across threads under the
+previous reader-writer locks against the copy-on-write snapshot, with a writer
+updating the credentials in the background.
+
+Usage:
+    python -m benchmarks.credential_storage_benchmark [--threads 8] [--reads 50000]
+"""
+
+import threading
+import time
+from argparse import ArgumentParser
+from multiprocessing import Lock
+
+from anki_sync_server.setup.credential_storage import CredentialStorage
+
+
+class _ReaderWriterStorage:
+    """The reader-writer locking CredentialStorage used before, as a baseline."""
+
+    def __init__(self) -> None:
+        self._reader_lock = Lock()
+        self._writer_lock = Lock()
+        self._reader_count = 0
+        self._data = {"server_secret_key": None}
+
+    def get_server_secret_key(self) -> str | None:
+        with self._reader_lock:
+            self._reader_count += 1
+            if self._reader_count == 1:
+                self._writer_lock.acquire()
+
+        result = self._data.get("server_secret_key")
+
+        with self._reader_lock:
+            self._reader_count -= 1
+            if self._reader_count == 0:
+                self._writer_lock.release()
+
+        return result
+
+    def set_server_secret_key(self, server_secret_key: str) -> None:
+        with self._writer_lock:
+            self._data["server_secret_key"] = server_secret_key
+
+
+def _measure(storage, threads: int, reads: int) -> float:
+    """Reads per second of ``threads`` threads reading concurrently."""
+    stop = threading.Event()
+
+    def write():
+        while not stop.is_set():
+            storage.set_server_secret_key("benchmark_secret")
+            time.sleep(0.001)
+
+    def read():
+        for _ in range(reads):
+            storage.get_server_secret_key()
+
+    writer = threading.Thread(target=write)
+    readers = [threading.Thread(target=read) for _ in range(threads)]
+    writer.start()
+    start = time.perf_counter()
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    writer.join()
+    return threads * reads / elapsed
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--reads", type=int, default=50000)
+    args = parser.parse_args()
+
+    baseline = _measure(_ReaderWriterStorage(), args.threads, args.reads)
+    snapshot = _measure(CredentialStorage(), args.threads, args.reads)
+
+    print(f"{args.threads} threads x {args.reads} reads, one writer every 1 ms")
+    print(f"{'reader-writer locks':<24} {baseline:12,.0f} reads/s")
+    print(f"{'copy-on-write snapshot':<24} {snapshot:12,.0f} reads/s")
+    print(f"{'speedup':<24} {snapshot / baseline:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compare the per-request cost of token_required with a full JWT verification
+on every request against the verified-token cache, on an endpoint that does no
+other work.
+
+Usage:
+    python -m benchmarks.token_verification_benchmark [--requests 5000]
+"""
+
+import statistics
+import time
+from argparse import ArgumentParser
+from datetime import timedelta
+
+from flask import Flask
+
+from anki_sync_server.server.authentication import token_required, verified_tokens
+from anki_sync_server.server.token_issuer import TokenIssuer
+from anki_sync_server.setup.credential_storage import CredentialStorage
+
+SECRET = "benchmark_secret_key_of_at_least_32_bytes"
+
+
+@token_required
+def _endpoint():
+    return "ok"
+
+
+def _measure(app: Flask, headers: dict, requests: int, cached: bool):
+    latencies = []
+    with app.test_request_context(headers=headers):
+        _endpoint()
+        for _ in range(requests):
+            if not cached:
+                verified_tokens.clear()
+            start = time.perf_counter()
+            _endpoint()
+            latencies.append((time.perf_counter() - start) * 1_000_000)
+    return latencies
+
+
+def _report(name: str, latencies) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<24} mean {statistics.mean(latencies):7.1f} us   "
+        f"p50 {statistics.median(latencies):7.1f} us   p95 {p95:7.1f} us"
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    token = TokenIssuer(SECRET).issue("access", timedelta(minutes=5))
+    headers = {"x-access-token": token}
+
+    # In memory only, the credentials file is left untouched
+    CredentialStorage().set_server_secret_key(SECRET)
+    uncached = _measure(app, headers, args.requests, cached=False)
+    cached = _measure(app, headers, args.requests, cached=True)
+
+    print(f"{args.requests} authenticated requests")
+    _report("full verification", uncached)
+    _report("verified-token cache", cached)
+    print(
+        "speedup (mean)           "
+        f"{statistics.mean(uncached) / statistics.mean(cached):.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
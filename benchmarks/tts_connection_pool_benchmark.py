@@ -0,0 +1,145 @@
+"""Compare per-request latency of a new HTTPS connection per request against
+HttpsConnectionPool, using a local HTTPS stand-in for the Google TTS API.
+
+Usage:
+    python -m benchmarks.tts_connection_pool_benchmark [--requests 200]
+
+Requires the ``openssl`` command line tool to create a throwaway certificate.
+"""
+
+import http.client
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from anki_sync_server.tts.connection_pool import HttpsConnectionPool
+
+RESPONSE = json.dumps({"audioContent": "aGVsbG8="}).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _create_certificate(directory: str):
+    cert_file = os.path.join(directory, "cert.pem")
+    key_file = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-keyout",
+            key_file,
+            "-out",
+            cert_file,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert_file, key_file
+
+
+def _start_server(cert_file: str, key_file: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _client_context() -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _new_connection_per_request(port: int, body: str, headers: dict) -> None:
+    conn = http.client.HTTPSConnection("127.0.0.1", port, context=_client_context())
+    conn.request("POST", "/v1/text:synthesize", body, headers)
+    conn.getresponse().read()
+    conn.close()
+
+
+def _measure(func, requests: int):
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _report(name: str, latencies) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<28} mean {statistics.mean(latencies):7.3f} ms   "
+        f"p50 {statistics.median(latencies):7.3f} ms   p95 {p95:7.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    body = json.dumps({"input": {"text": "construction"}})
+    headers = {"content-type": "application/json", "X-Goog-Api-Key": "benchmark"}
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        server = _start_server(*_create_certificate(tmpdirname))
+        port = server.server_address[1]
+        pool = HttpsConnectionPool("127.0.0.1", port, context=_client_context())
+        try:
+            baseline = _measure(
+                lambda: _new_connection_per_request(port, body, headers),
+                args.requests,
+            )
+            pooled = _measure(
+                lambda: pool.request("POST", "/v1/text:synthesize", body, headers),
+                args.requests,
+            )
+        finally:
+            pool.close()
+            server.shutdown()
+
+    print(f"{args.requests} requests against a local HTTPS stand-in")
+    _report("new connection per request", baseline)
+    _report("HttpsConnectionPool", pooled)
+    print(
+        "speedup (mean)               "
+        f"{statistics.mean(baseline) / statistics.mean(pooled):.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
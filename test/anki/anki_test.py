@@ -0,0 +1,289 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from anki.collection import Collection, SyncOutput, SyncStatus
+
+from anki_sync_server.anki.anki import Anki
+from anki_sync_server.anki.cloze_note import ClozeNote
+from anki_sync_server.anki.note_creator import NoteCreator
+from anki_sync_server.anki.prepared_note import PreparedNote
+from anki_sync_server.timeline import Timeline, recording
+from anki_sync_server.tts.base import TtsService
+
+
+class FakeTtsService(TtsService):
+    def _generate_audio(self, text: str) -> bytes:
+        if text == "broken":
+            raise Exception("No audio content")
+        return text.encode("utf-8")
+
+
+def cloze_note(word: str):
+    return ClozeNote().load(
+        {
+            "word": word,
+            "partOfSpeech": "noun",
+            "guideWord": "BUILDING",
+            "englishDefinition": "definition",
+            "definitionTranslation": "translation",
+            "cefrLevel": "B2",
+            "code": "[ U ]",
+            "englishExample": "A {{c1::" + word + "}} example.",
+            "exampleTranslation": "example translation",
+        }
+    )
+
+
+class AnkiTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.collection = Collection(os.path.join(self.tmpdir.name, "c.anki2"))
+        sync_patcher = mock.patch.object(Anki, "_sync")
+        self.mock_sync = sync_patcher.start()
+        self.addCleanup(sync_patcher.stop)
+
+    def tearDown(self):
+        self.collection.close()
+        self.tmpdir.cleanup()
+
+    def test_add_cloze_note_returns_every_created_note(self):
+        anki = Anki(self.collection, FakeTtsService())
+
+        notes = anki.add_cloze_note([cloze_note("one"), cloze_note("two")])
+
+        self.assertEqual(["one", "two"], [note["Word"] for note in notes])
+        self.assertEqual(2, len({note.id for note in notes}))
+        self.assertEqual(2, self.collection.note_count())
+        self.assertEqual(2, self.mock_sync.call_count)
+
+    def test_notes_are_added_in_one_backend_call(self):
+        anki = Anki(self.collection, FakeTtsService())
+
+        with mock.patch.object(
+            self.collection, "add_notes", wraps=self.collection.add_notes
+        ) as mock_add_notes, mock.patch.object(
+            self.collection, "add_note"
+        ) as mock_add_note:
+            anki.add_cloze_notes([cloze_note("one"), cloze_note("two")])
+
+        mock_add_notes.assert_called_once()
+        mock_add_note.assert_not_called()
+
+    def test_add_cloze_notes_reports_partial_failures(self):
+        anki = Anki(self.collection, FakeTtsService())
+
+        results = anki.add_cloze_notes([cloze_note("one"), cloze_note("broken")])
+
+        self.assertEqual("one", results[0]["Word"])
+        self.assertIsInstance(results[1], Exception)
+        self.assertEqual(1, self.collection.note_count())
+
+    def test_fall_back_to_single_inserts_when_batch_is_rejected(self):
+        anki = Anki(self.collection, FakeTtsService())
+        add_note = self.collection.add_note
+
+        def add_note_failing_on_two(note, deck_id):
+            if note["Word"] == "two":
+                raise RuntimeError("rejected")
+            return add_note(note, deck_id)
+
+        with mock.patch.object(
+            self.collection, "add_notes", side_effect=RuntimeError("rejected")
+        ), mock.patch.object(
+            self.collection, "add_note", side_effect=add_note_failing_on_two
+        ):
+            results = anki.add_cloze_notes([cloze_note("one"), cloze_note("two")])
+
+        self.assertEqual("one", results[0]["Word"])
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertEqual(1, self.collection.note_count())
+
+    def test_add_prepared_notes_writes_synthesized_media(self):
+        anki = Anki(self.collection, FakeTtsService())
+        synthesizer = NoteCreator(None, FakeTtsService())
+        prepared_note = PreparedNote.from_dict(
+            synthesizer.synthesize(cloze_note("one")).to_dict()
+        )
+
+        (note,) = anki.add_prepared_notes([prepared_note])
+
+        self.assertEqual(1, self.collection.note_count())
+        for filename in prepared_note.media:
+            self.assertIn(filename, note["DefinitionAudio"] + note["TextAudio"])
+            self.assertTrue(self.collection.media.have(filename))
+
+    def test_pre_sync_is_skipped_while_collection_is_fresh(self):
+        anki = Anki(self.collection, FakeTtsService(), sync_staleness_seconds=60)
+        self.mock_sync.side_effect = (
+            lambda *args, **kwargs: anki._sync_freshness.record_success(
+                anki._sync_marker()
+            )
+        )
+
+        anki.add_cloze_note([cloze_note("one")])
+        anki.add_cloze_note([cloze_note("two")])
+
+        # pre-sync + post-sync, then only the post-sync of the second note
+        self.assertEqual(
+            [(True,), (), ()],
+            [call.args[:1] for call in self.mock_sync.call_args_list],
+        )
+
+    def test_warm_up_resolves_deck_and_syncs_ahead_of_first_note(self):
+        anki = Anki(self.collection, FakeTtsService(), sync_staleness_seconds=60)
+        self.mock_sync.side_effect = (
+            lambda *args, **kwargs: anki._sync_freshness.record_success(
+                anki._sync_marker()
+            )
+        )
+
+        anki.warm_up()
+        with mock.patch.object(
+            self.collection.decks, "id", wraps=self.collection.decks.id
+        ) as mock_deck_id:
+            (note,) = anki.add_cloze_note([cloze_note("one")])
+
+        mock_deck_id.assert_not_called()
+        self.assertEqual(
+            self.collection.decks.id(anki._deck_name), note.cards()[0].did
+        )
+        # warm-up pre-sync, then only the post-sync of the note
+        self.assertEqual(
+            [(True,), ()],
+            [call.args[:1] for call in self.mock_sync.call_args_list],
+        )
+
+    def test_deck_deleted_by_a_normal_sync_is_created_again(self):
+        anki = Anki(self.collection, FakeTtsService())
+        anki.add_cloze_note([cloze_note("one")])
+        old_deck_id = anki._deck_id
+        sync_output = mock.Mock(required=SyncOutput.NORMAL_SYNC, new_endpoint="")
+
+        def delete_deck(*args):
+            # As if the deck was deleted on another device
+            self.collection.decks.remove([old_deck_id])
+            return sync_output
+
+        with mock.patch.object(
+            self.collection,
+            "sync_status",
+            return_value=mock.Mock(required=SyncStatus.NORMAL_SYNC),
+        ), mock.patch.object(
+            self.collection, "sync_collection", side_effect=delete_deck
+        ), mock.patch.object(
+            anki, "_request_media_sync"
+        ):
+            anki._sync_collection(False, None)
+        (note,) = anki.add_cloze_note([cloze_note("two")])
+
+        self.assertNotEqual(old_deck_id, note.cards()[0].did)
+        self.assertEqual(
+            self.collection.decks.id(anki._deck_name), note.cards()[0].did
+        )
+
+    def test_progress_is_reported_for_each_phase(self):
+        anki = Anki(self.collection, FakeTtsService())
+        progress = []
+
+        anki.add_cloze_note([cloze_note("one")], on_progress=progress.append)
+
+        self.assertEqual(
+            ["prepare", "pre_sync", "add", "sync"],
+            [item["phase"] for item in progress],
+        )
+        self.assertEqual(5, progress[0]["total"])
+
+    def test_phases_are_recorded_on_the_active_timeline(self):
+        anki = Anki(self.collection, FakeTtsService())
+        timeline = Timeline()
+
+        with recording(timeline):
+            anki.add_cloze_notes([cloze_note("one"), cloze_note("two")])
+
+        phases = [phase["phase"] for phase in timeline.to_list()]
+        self.assertEqual(4, phases.count("tts"))
+        self.assertEqual(2, phases.count("media_write"))
+        for phase in ["prepare", "lock_wait", "pre_sync", "add", "sync"]:
+            self.assertIn(phase, phases)
+
+    def test_group_committed_notes_share_the_commit_phases(self):
+        anki = Anki(self.collection, FakeTtsService(), group_commit_window_seconds=5)
+        followers_pending = threading.Event()
+
+        def sync(*args, **kwargs):
+            # Hold the first commit in flight until both followers queue up
+            if self.mock_sync.call_count == 1:
+                followers_pending.wait()
+
+        self.mock_sync.side_effect = sync
+        timelines = [Timeline(), Timeline(), Timeline()]
+
+        def add(word, timeline):
+            with recording(timeline):
+                anki.add_cloze_note([cloze_note(word)])
+
+        threads = [
+            threading.Thread(target=add, args=(word, timeline))
+            for word, timeline in zip(["one", "two", "three"], timelines)
+        ]
+        threads[0].start()
+        while self.mock_sync.call_count == 0:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while anki._group_committer._pending_items < 2:
+            time.sleep(0.001)
+        followers_pending.set()
+        for thread in threads:
+            thread.join()
+
+        # The followers share one pre-sync and one post-sync
+        self.assertEqual(4, self.mock_sync.call_count)
+        for timeline in timelines[1:]:
+            phases = {phase["phase"]: phase for phase in timeline.to_list()}
+            self.assertIn("group_commit", phases)
+            self.assertIn("sync", phases)
+            self.assertEqual(2, phases["add"]["notes"])
+
+    def test_media_sync_polls_until_done_and_reports_changed_counts(self):
+        anki = Anki(self.collection, FakeTtsService())
+        statuses = [
+            mock.Mock(active=True),
+            mock.Mock(active=True),
+            mock.Mock(active=False),
+        ]
+        for status, checked in zip(statuses, [5, 5, 12]):
+            status.progress.checked = f"Checked: {checked}"
+            status.progress.added = "Added: 3↑ 1↓"
+            status.progress.removed = "Removed: 0↑ 2↓"
+        progress = []
+
+        with mock.patch.object(self.collection, "sync_media"), mock.patch.object(
+            self.collection, "media_sync_status", side_effect=statuses
+        ):
+            start = time.monotonic()
+            anki._sync_media(None, lambda phase, **details: progress.append(details))
+            elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.5)
+        # The unchanged second poll is not reported
+        self.assertEqual(2, len(progress))
+        self.assertEqual(5, progress[0]["media"]["checked"])
+        self.assertEqual(
+            {
+                "checked": 12,
+                "uploaded": 3,
+                "downloaded": 1,
+                "removedRemote": 0,
+                "removedLocal": 2,
+            },
+            progress[-1]["media"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
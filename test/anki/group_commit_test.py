@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+
+from anki_sync_server.anki.group_commit import GroupCommitter
+
+
+class GroupCommitterTest(unittest.TestCase):
+    def test_submit_returns_results_of_own_items(self):
+        committer = GroupCommitter(
+            lambda items: [item * 10 for item in items], window_seconds=0.01
+        )
+        self.assertEqual([10, 20], committer.submit([1, 2]))
+
+    def test_lone_submission_is_committed_without_waiting(self):
+        committer = GroupCommitter(lambda items: items, window_seconds=5)
+
+        started_at = time.monotonic()
+        committer.submit([1])
+
+        self.assertLess(time.monotonic() - started_at, 1)
+
+    def test_submissions_behind_a_commit_in_flight_share_one_commit(self):
+        commits = []
+        first_commit_started = threading.Event()
+        release_first_commit = threading.Event()
+
+        def commit(items):
+            commits.append(list(items))
+            if len(commits) == 1:
+                first_commit_started.set()
+                release_first_commit.wait()
+            return [item * 10 for item in items]
+
+        committer = GroupCommitter(commit, window_seconds=5, max_items=5)
+        results = {}
+
+        def submit(value):
+            results[value] = committer.submit([value])
+
+        first = threading.Thread(target=submit, args=(0,))
+        first.start()
+        first_commit_started.wait()
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        # Every follower is pending before the commit in flight ends
+        while committer._pending_items < 4:
+            time.sleep(0.001)
+        release_first_commit.set()
+        for thread in [first, *threads]:
+            thread.join()
+
+        self.assertEqual([[0], [1, 2, 3, 4]], [commits[0], sorted(commits[1])])
+        for i in range(5):
+            self.assertEqual([i * 10], results[i])
+
+    def test_group_is_committed_once_max_items_are_pending(self):
+        commits = []
+        release_first_commit = threading.Event()
+
+        def commit(items):
+            commits.append(list(items))
+            if len(commits) == 1:
+                release_first_commit.wait()
+            return items
+
+        committer = GroupCommitter(commit, window_seconds=5, max_items=2)
+        first = threading.Thread(target=committer.submit, args=([0],))
+        first.start()
+        while not commits:
+            time.sleep(0.001)
+
+        committer.submit([1, 2])
+        release_first_commit.set()
+        first.join()
+
+        self.assertEqual([[0], [1, 2]], commits)
+
+    def test_per_item_exception_is_returned_to_its_caller(self):
+        error = ValueError("bad note")
+        committer = GroupCommitter(
+            lambda items: [error if item == 2 else item for item in items],
+            window_seconds=0.01,
+        )
+        self.assertEqual([1, error], committer.submit([1, 2]))
+
+    def test_commit_exception_is_raised_to_every_caller(self):
+        def commit(items):
+            raise RuntimeError("sync failed")
+
+        committer = GroupCommitter(commit, window_seconds=0.01)
+        with self.assertRaises(RuntimeError):
+            committer.submit([1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import time
+import unittest
+from threading import Event
+
+from anki_sync_server.anki.media_sync_lane import MediaSyncLane
+from anki_sync_server.anki.media_sync_state import MediaSyncState
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            raise AssertionError("Condition not met in time")
+        time.sleep(0.01)
+
+
+class MediaSyncLaneTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.state = MediaSyncState(os.path.join(self.tmpdir.name, "state.json"))
+
+    def test_requests_are_coalesced_into_one_sync(self):
+        synced_auths = []
+        lane = MediaSyncLane(
+            synced_auths.append, self.state, debounce_seconds=0.1, max_delay_seconds=1
+        )
+
+        generations = [lane.request("auth-1"), lane.request("auth-2")]
+
+        wait_until(lambda: self.state.is_synced(generations[-1]))
+        self.assertEqual([1, 2], generations)
+        self.assertEqual(["auth-2"], synced_auths)
+
+    def test_request_during_sync_triggers_another_sync(self):
+        started = Event()
+        release = Event()
+        synced_auths = []
+
+        def sync_media(auth):
+            started.set()
+            release.wait(5)
+            synced_auths.append(auth)
+
+        lane = MediaSyncLane(
+            sync_media, self.state, debounce_seconds=0.01, max_delay_seconds=0.01
+        )
+        first = lane.request("auth-1")
+        started.wait(5)
+        second = lane.request("auth-2")
+        self.assertFalse(self.state.is_synced(second))
+
+        release.set()
+        wait_until(lambda: self.state.is_synced(second))
+        self.assertTrue(self.state.is_synced(first))
+        self.assertEqual(["auth-1", "auth-2"], synced_auths)
+
+    def test_failed_sync_is_retried(self):
+        attempts = []
+
+        def sync_media(auth):
+            attempts.append(auth)
+            if len(attempts) == 1:
+                raise Exception("Media sync timed out")
+
+        lane = MediaSyncLane(
+            sync_media, self.state, debounce_seconds=0.01, max_delay_seconds=0.01
+        )
+        generation = lane.request("auth")
+
+        wait_until(lambda: self.state.is_synced(generation))
+        self.assertEqual(["auth", "auth"], attempts)
+
+
+class MediaSyncStateTest(unittest.TestCase):
+    def test_state_is_shared_through_the_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "state.json")
+            writer = MediaSyncState(path)
+            generation = writer.request()
+
+            reader = MediaSyncState(path)
+            self.assertFalse(reader.is_synced(generation))
+            writer.complete(generation)
+            self.assertTrue(reader.is_synced(generation))
+            self.assertEqual((1, 1), reader.read())
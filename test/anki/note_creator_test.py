@@ -80,6 +80,43 @@ class NoteCreatorTest(unittest.TestCase):
         self.assertEqual(note["DefinitionAudio"], "[sound:definition.mp3]")
         self.assertEqual(note["TextAudio"], "[sound:text.mp3]")
 
+    def test_prepare_does_not_need_a_collection_note(self):
+        cloze_note = ClozeNote().load(
+            {
+                "word": "construction",
+                "partOfSpeech": "noun",
+                "guideWord": "BUILDING",
+                "englishDefinition": "the work of building or making something",
+                "definitionTranslation": "建造;構築;建設",
+                "cefrLevel": "B2",
+                "code": "[ U ]",
+                "englishExample": "A marvellous work of {{c1::construction}}.",
+                "exampleTranslation": "建築業的傑作。",
+            }
+        )
+        mock_media_creator = mock.MagicMock()
+        mock_media_creator.create_media.side_effect = ["word.mp3", "text.mp3"]
+        mock_tts_service = mock.MagicMock()
+        mock_tts_service.generate_audio.side_effect = [b"word", b"text"]
+
+        creator = NoteCreator(mock_media_creator, mock_tts_service)
+        prepared_note = creator.prepare(cloze_note)
+
+        mock_tts_service.generate_audio.assert_has_calls(
+            [mock.call("construction"), mock.call("A marvellous work of construction.")]
+        )
+        self.assertEqual("[sound:word.mp3]", prepared_note.fields["DefinitionAudio"])
+        self.assertEqual("[sound:text.mp3]", prepared_note.fields["TextAudio"])
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            collection = Collection(os.path.join(tmpdirname, "collection.anki2"))
+            model = ModelCreator(collection).create_model()
+            note = creator.fill(collection.new_note(model), prepared_note)
+
+        self.assertEqual("construction", note["Word"])
+        self.assertEqual("A marvellous work of {{c1::construction}}.", note["Text"])
+        self.assertEqual("[sound:word.mp3]", note["DefinitionAudio"])
+
 
 if __name__ == "__main__":
     unittest.main()
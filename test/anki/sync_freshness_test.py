@@ -0,0 +1,49 @@
+import unittest
+
+from anki_sync_server.anki.sync_freshness import SyncFreshnessTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SyncFreshnessTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tracker = SyncFreshnessTracker(30, clock=self.clock)
+
+    def test_not_fresh_before_first_sync(self):
+        self.assertFalse(self.tracker.is_fresh((1, 100)))
+
+    def test_fresh_within_staleness_bound(self):
+        self.tracker.record_success((1, 100))
+        self.clock.now = 29
+        self.assertTrue(self.tracker.is_fresh((1, 100)))
+
+    def test_stale_after_staleness_bound(self):
+        self.tracker.record_success((1, 100))
+        self.clock.now = 30
+        self.assertFalse(self.tracker.is_fresh((1, 100)))
+
+    def test_not_fresh_when_collection_changed_since_sync(self):
+        self.tracker.record_success((1, 100))
+        self.assertFalse(self.tracker.is_fresh((1, 101)))
+        self.assertFalse(self.tracker.is_fresh((2, 100)))
+
+    def test_not_fresh_after_failed_sync(self):
+        self.tracker.record_success((1, 100))
+        self.tracker.record_failure()
+        self.assertFalse(self.tracker.is_fresh((1, 100)))
+
+    def test_disabled_with_zero_staleness(self):
+        tracker = SyncFreshnessTracker(0, clock=self.clock)
+        tracker.record_success((1, 100))
+        self.assertFalse(tracker.is_fresh((1, 100)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Note data and authentication shared by the API and task tests."""
+
+import unittest
+from datetime import timedelta
+from typing import Dict
+from unittest.mock import patch
+
+from anki_sync_server.server.task_watcher import TaskWatcher
+from anki_sync_server.server.token_issuer import TokenIssuer
+from anki_sync_server.setup.credential_storage import CredentialStorage
+
+NOTE = {
+    "word": "test",
+    "partOfSpeech": "noun",
+    "guideWord": "test",
+    "englishDefinition": "definition",
+    "definitionTranslation": "translation",
+    "cefrLevel": "A1",
+    "code": "test",
+    "englishExample": "example",
+    "exampleTranslation": "example translation",
+}
+
+SECRET = "test_secret_key_of_at_least_32_bytes"
+
+
+def patch_server_secret_key(test_case: unittest.TestCase) -> None:
+    """Sign and verify tokens with ``SECRET`` until the test ends."""
+    patcher = patch.object(
+        CredentialStorage, "get_server_secret_key", return_value=SECRET
+    )
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+def access_headers() -> Dict[str, str]:
+    """The headers of a request with an access token signed with ``SECRET``."""
+    token = TokenIssuer(SECRET).issue("access", timedelta(minutes=5))
+    return {"x-access-token": token}
+
+
+def patch_task_watcher(test_case: unittest.TestCase, status: str) -> None:
+    """Report every task as ``status`` to the requests waiting for it, until
+    the test ends."""
+
+    def fetch(task_ids):
+        return {task_id: {"taskId": task_id, "status": status} for task_id in task_ids}
+
+    patcher = patch(
+        "anki_sync_server.server.api_v1.task_watcher",
+        TaskWatcher(fetch, poll_interval_seconds=0.01),
+    )
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from celery import Celery
+from prometheus_client import CollectorRegistry
+
+from anki_sync_server.metrics import REGISTRY, QueueDepthCollector, mark_dead
+from anki_sync_server.timeline import timed
+
+
+class MetricsTest(unittest.TestCase):
+    def test_timed_phases_are_observed(self):
+        def count(cached):
+            return (
+                REGISTRY.get_sample_value(
+                    "anki_tts_seconds_count", {"cached": cached}
+                )
+                or 0
+            )
+
+        before = count("true"), count("false")
+
+        with timed("tts", cached=True):
+            pass
+        with timed("tts") as details:
+            details["cached"] = False
+
+        self.assertEqual(
+            (before[0] + 1, before[1] + 1), (count("true"), count("false"))
+        )
+
+    def test_queue_depth_is_read_from_the_broker(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        broker_path = os.path.join(tmpdir.name, "broker.db")
+        app = Celery(broker=f"sqla+sqlite:///{broker_path}")
+
+        @app.task(name="noop")
+        def noop():
+            pass
+
+        noop.delay()
+        noop.delay()
+        registry = CollectorRegistry()
+        registry.register(QueueDepthCollector(app, ["celery", "tts"]))
+
+        self.assertEqual(
+            2, registry.get_sample_value("anki_queue_depth", {"queue": "celery"})
+        )
+        self.assertEqual(
+            0, registry.get_sample_value("anki_queue_depth", {"queue": "tts"})
+        )
+
+    def test_live_gauges_of_a_dead_process_are_dropped(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        live = os.path.join(tmpdir.name, f"gauge_livesum_{os.getpid()}.db")
+        counter = os.path.join(tmpdir.name, f"counter_{os.getpid()}.db")
+        for path in (live, counter):
+            open(path, "wb").close()
+
+        with patch.dict(os.environ, {"PROMETHEUS_MULTIPROC_DIR": tmpdir.name}):
+            mark_dead()
+
+        self.assertFalse(os.path.exists(live))
+        self.assertTrue(os.path.exists(counter))
+
+
+if __name__ == "__main__":
+    unittest.main()
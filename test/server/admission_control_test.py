@@ -0,0 +1,152 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from helpers import NOTE, access_headers, patch_server_secret_key
+
+from anki_sync_server.metrics import REGISTRY
+from anki_sync_server.server import api_v1
+from anki_sync_server.server.admission_control import (
+    MAX_RETRY_AFTER_SECONDS,
+    AdmissionControl,
+)
+from anki_sync_server.server.main import app
+from anki_sync_server.tasks.task_index import TaskIndex
+
+
+class AdmissionControlTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.index = TaskIndex(os.path.join(tmpdir.name, "tasks.db"))
+        self.admission_control = AdmissionControl(
+            self.index, max_queued_notes=10, max_queued_notes_per_client=4
+        )
+
+    def queue(self, task_id, client, count):
+        self.index.record_queued(
+            task_id, "add_cloze_notes", {"count": count}, client=client
+        )
+
+    def test_notes_are_admitted_within_the_limits(self):
+        self.queue("a", "x", 3)
+
+        self.assertIsNone(self.admission_control.admit("x", 1))
+
+    def test_client_over_its_quota_is_rejected(self):
+        self.queue("a", "x", 4)
+
+        self.assertIsNotNone(self.admission_control.admit("x", 1))
+        self.assertIsNone(self.admission_control.admit("y", 4))
+
+    def test_notes_are_rejected_when_the_queue_is_full(self):
+        for client in ("x", "y", "z"):
+            self.queue(client, client, 3)
+
+        self.assertIsNotNone(self.admission_control.admit("w", 2))
+        self.assertIsNone(self.admission_control.admit("w", 1))
+
+    def test_tasks_started_before_the_time_limit_are_not_counted(self):
+        admission_control = AdmissionControl(
+            self.index, max_queued_notes_per_client=4, task_time_limit_seconds=300
+        )
+        self.queue("a", "x", 4)
+        self.index.record_started("a", "add_cloze_notes", time.time() - 301)
+
+        self.assertIsNone(admission_control.admit("x", 1))
+
+    def test_batch_larger_than_the_limit_is_admitted_into_an_empty_queue(self):
+        self.assertIsNone(self.admission_control.admit("x", 50))
+
+    def test_retry_after_follows_the_recent_throughput(self):
+        self.queue("a", "x", 4)
+        # 30 notes finished over the throughput window of 300 s, 0.1 per second
+        for task_id in ("b", "c", "d"):
+            self.queue(task_id, "y", 10)
+            self.index.record_finished(
+                task_id, "add_cloze_notes", "success", timings={}
+            )
+
+        # 2 notes over the quota
+        self.assertEqual(20, self.admission_control.admit("x", 2))
+
+    def test_retry_after_without_throughput_is_the_maximum(self):
+        self.queue("a", "x", 4)
+
+        self.assertEqual(MAX_RETRY_AFTER_SECONDS, self.admission_control.admit("x", 1))
+
+    def test_decisions_are_counted(self):
+        def count(decision):
+            return (
+                REGISTRY.get_sample_value(
+                    "anki_admissions_total", {"decision": decision}
+                )
+                or 0
+            )
+
+        before = count("admitted"), count("client_quota")
+        self.queue("a", "x", 4)
+        self.admission_control.admit("y", 1)
+        self.admission_control.admit("x", 1)
+
+        self.assertEqual(
+            (before[0] + 1, before[1] + 1), (count("admitted"), count("client_quota"))
+        )
+
+
+@patch("anki_sync_server.server.api_v1.add_cloze_note_task")
+class AdmissionControlEndpointTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.index = TaskIndex(os.path.join(tmpdir.name, "tasks.db"))
+        patch_server_secret_key(self)
+        for patcher in (
+            patch.object(api_v1, "task_index", self.index),
+            patch.object(
+                api_v1,
+                "admission_control",
+                AdmissionControl(self.index, max_queued_notes_per_client=1),
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def test_client_over_its_quota_gets_429(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        response = self.client.post(
+            "/api/v1/clozeNotes", json=NOTE, headers=access_headers()
+        )
+        self.assertEqual(202, response.status_code)
+
+        # Neither logging in again nor a forged X-Real-IP header resets the quota
+        mock_task.delay.return_value = MagicMock(id="task-2")
+        response = self.client.post(
+            "/api/v1/clozeNotes",
+            json=NOTE,
+            headers={**access_headers(), "X-Real-IP": "203.0.113.7"},
+        )
+
+        self.assertEqual(429, response.status_code)
+        self.assertEqual(str(MAX_RETRY_AFTER_SECONDS), response.headers["Retry-After"])
+        mock_task.delay.assert_called_once()
+        self.assertEqual((1, 1), self.index.queued_notes(time.time() - 60, "127.0.0.1"))
+
+    def test_quota_is_kept_per_address_behind_the_proxy(self, mock_task):
+        with patch.dict(os.environ, {"TRUST_PROXY_HEADERS": "true"}):
+            for task_id, address in (("task-1", "203.0.113.7"), ("task-2", "::1")):
+                mock_task.delay.return_value = MagicMock(id=task_id)
+                response = self.client.post(
+                    "/api/v1/clozeNotes",
+                    json=NOTE,
+                    headers={**access_headers(), "X-Real-IP": address},
+                )
+                self.assertEqual(202, response.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -47,9 +47,9 @@ class AnkiLazyInitializationTest(unittest.TestCase):
         proxy = _AnkiProxy()
         self.assertIsInstance(proxy, _AnkiProxy)
 
-    @mock.patch('anki_sync_server.server.create_anki_collection')
+    @mock.patch('anki_sync_server.utils.create_anki_collection')
     @mock.patch('anki_sync_server.server.GcpTtsService')
-    @mock.patch('anki_sync_server.server.Anki')
+    @mock.patch('anki_sync_server.anki.anki.Anki')
     @mock.patch('anki_sync_server.server.CredentialStorage')
     def test_lazy_initialization_on_first_access(
         self, mock_creds, mock_anki_cls, mock_tts, mock_create_collection
@@ -91,12 +91,22 @@ class AnkiLazyInitializationTest(unittest.TestCase):
         
         # Verify initialization happened
         mock_create_collection.assert_called_once()
-        mock_tts.assert_called_once_with("test_key")
-        mock_anki_cls.assert_called_once_with(mock_collection, mock_tts_instance)
+        mock_tts.assert_called_once_with(
+            "test_key", connection_pool=mock.ANY, audio_encoding="MP3"
+        )
+        mock_anki_cls.assert_called_once_with(
+            mock_collection,
+            mock_tts_instance,
+            group_commit_window_seconds=0,
+            group_commit_max_notes=50,
+            sync_staleness_seconds=30,
+            prepare_concurrency=8,
+            media_sync_state=None,
+        )
 
-    @mock.patch('anki_sync_server.server.create_anki_collection')
+    @mock.patch('anki_sync_server.utils.create_anki_collection')
     @mock.patch('anki_sync_server.server.GcpTtsService')
-    @mock.patch('anki_sync_server.server.Anki')
+    @mock.patch('anki_sync_server.anki.anki.Anki')
     @mock.patch('anki_sync_server.server.CredentialStorage')
     def test_singleton_pattern(
         self, mock_creds, mock_anki_cls, mock_tts, mock_create_collection
@@ -138,9 +148,9 @@ class AnkiLazyInitializationTest(unittest.TestCase):
         mock_create_collection.assert_called_once()
         mock_anki_cls.assert_called_once()
 
-    @mock.patch('anki_sync_server.server.create_anki_collection')
+    @mock.patch('anki_sync_server.utils.create_anki_collection')
     @mock.patch('anki_sync_server.server.GcpTtsService')
-    @mock.patch('anki_sync_server.server.Anki')
+    @mock.patch('anki_sync_server.anki.anki.Anki')
     @mock.patch('anki_sync_server.server.CredentialStorage')
     def test_proxy_attribute_error_handling(
         self, mock_creds, mock_anki_cls, mock_tts, mock_create_collection
@@ -180,6 +190,17 @@ class AnkiLazyInitializationTest(unittest.TestCase):
         self.assertIn("_AnkiProxy", str(context.exception))
         self.assertIn("non_existent_method", str(context.exception))
 
+    def test_tts_connection_pool_covers_the_worker_concurrency(self):
+        import anki_sync_server.server as server_module
+
+        with mock.patch.dict(
+            os.environ,
+            {"CELERY_WORKER_CONCURRENCY": "16", "ANKI_PREPARE_CONCURRENCY": "8"},
+        ):
+            self.assertEqual(128, server_module._tts_connection_pool_size())
+            with mock.patch.dict(os.environ, {"TTS_CONNECTION_POOL_SIZE": "4"}):
+                self.assertEqual(4, server_module._tts_connection_pool_size())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,167 @@
+import fcntl
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import bcrypt
+from helpers import patch_server_secret_key
+
+from anki_sync_server.server import api_v1
+from anki_sync_server.server.api_key_verifier import ApiKeyVerifier
+from anki_sync_server.server.main import app
+from anki_sync_server.setup.credential_storage import CredentialStorage
+
+API_KEY = "test_api_key"
+# The lowest cost, to keep the tests fast
+HASHED_API_KEY = bcrypt.hashpw(API_KEY.encode(), bcrypt.gensalt(rounds=4))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ApiKeyVerifierTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.lock_dir = os.path.join(tmpdir.name, "login_locks")
+        self.clock = FakeClock()
+
+    def create_verifier(self, **kwargs):
+        return ApiKeyVerifier(self.lock_dir, clock=self.clock, **kwargs)
+
+    def test_verify(self):
+        verifier = self.create_verifier()
+
+        self.assertEqual((True, None), verifier.verify("a", API_KEY, HASHED_API_KEY))
+        self.assertEqual((False, None), verifier.verify("a", "wrong", HASHED_API_KEY))
+
+    @patch("anki_sync_server.server.api_key_verifier.bcrypt.checkpw")
+    def test_verified_key_skips_the_hash_until_it_expires(self, mock_checkpw):
+        mock_checkpw.return_value = True
+        verifier = self.create_verifier(cache_seconds=300)
+
+        verifier.verify("a", API_KEY, HASHED_API_KEY)
+        self.clock.now = 299
+        self.assertEqual((True, None), verifier.verify("a", API_KEY, HASHED_API_KEY))
+        self.assertEqual(1, mock_checkpw.call_count)
+
+        self.clock.now = 300
+        verifier.verify("a", API_KEY, HASHED_API_KEY)
+        self.assertEqual(2, mock_checkpw.call_count)
+
+    def test_verified_key_is_checked_again_when_the_hash_changes(self):
+        verifier = self.create_verifier()
+        verifier.verify("a", API_KEY, HASHED_API_KEY)
+
+        new_hash = bcrypt.hashpw(b"new_api_key", bcrypt.gensalt(rounds=4))
+        self.assertEqual((False, None), verifier.verify("a", API_KEY, new_hash))
+
+    def test_attempts_are_throttled_per_client(self):
+        verifier = self.create_verifier(attempts_per_minute=2)
+        verifier.verify("a", "wrong", HASHED_API_KEY)
+        self.clock.now = 20
+        verifier.verify("a", "wrong", HASHED_API_KEY)
+
+        self.clock.now = 30
+        self.assertEqual((False, 30), verifier.verify("a", API_KEY, HASHED_API_KEY))
+        self.assertEqual((True, None), verifier.verify("b", API_KEY, HASHED_API_KEY))
+
+        self.clock.now = 60
+        self.assertEqual((True, None), verifier.verify("a", API_KEY, HASHED_API_KEY))
+
+    def test_attempt_fails_fast_when_all_slots_are_taken(self):
+        verifier = self.create_verifier(max_concurrent=1)
+        os.makedirs(self.lock_dir)
+        # Held by another process
+        with open(os.path.join(self.lock_dir, "0.lock"), "w") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            self.assertEqual((False, 1), verifier.verify("a", API_KEY, HASHED_API_KEY))
+
+        self.assertEqual((True, None), verifier.verify("a", API_KEY, HASHED_API_KEY))
+
+    def test_attempts_that_fail_fast_are_not_counted(self):
+        verifier = self.create_verifier(max_concurrent=1, attempts_per_minute=1)
+        os.makedirs(self.lock_dir)
+        with open(os.path.join(self.lock_dir, "0.lock"), "w") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            verifier.verify("a", API_KEY, HASHED_API_KEY)
+
+        self.assertEqual((True, None), verifier.verify("a", API_KEY, HASHED_API_KEY))
+
+    def test_attempts_are_throttled_across_processes(self):
+        verifier = self.create_verifier(attempts_per_minute=1, cache_seconds=0)
+        other_verifier = self.create_verifier(attempts_per_minute=1, cache_seconds=0)
+
+        verifier.verify("a", API_KEY, HASHED_API_KEY)
+
+        self.assertEqual(
+            (False, 60), other_verifier.verify("a", API_KEY, HASHED_API_KEY)
+        )
+
+
+class LoginTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        patch_server_secret_key(self)
+        for patcher in (
+            patch.object(
+                CredentialStorage, "get_hashed_api_key", return_value=HASHED_API_KEY
+            ),
+            patch.object(
+                api_v1,
+                "api_key_verifier",
+                ApiKeyVerifier(tmpdir.name, attempts_per_minute=1),
+            ),
+            patch("anki_sync_server.server.token_issuer.token_state"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = app.test_client()
+
+    def test_login(self):
+        response = self.client.post("/api/v1/login", json={"key": API_KEY})
+
+        self.assertEqual(201, response.status_code)
+        self.assertIn("accessToken", response.get_json())
+
+    def test_repeated_login_is_not_throttled(self):
+        for _ in range(2):
+            response = self.client.post("/api/v1/login", json={"key": API_KEY})
+            self.assertEqual(201, response.status_code)
+
+    def test_throttled_login(self):
+        response = self.client.post("/api/v1/login", json={"key": "wrong"})
+        self.assertEqual(403, response.status_code)
+
+        response = self.client.post("/api/v1/login", json={"key": API_KEY})
+        self.assertEqual(429, response.status_code)
+        self.assertEqual("60", response.headers["Retry-After"])
+
+    def test_real_ip_header_is_ignored_unless_trusted(self):
+        self.client.post(
+            "/api/v1/login", json={"key": "wrong"}, headers={"X-Real-IP": "192.0.2.1"}
+        )
+
+        response = self.client.post(
+            "/api/v1/login", json={"key": API_KEY}, headers={"X-Real-IP": "192.0.2.2"}
+        )
+        self.assertEqual(429, response.status_code)
+
+        with patch.dict(os.environ, {"TRUST_PROXY_HEADERS": "true"}):
+            response = self.client.post(
+                "/api/v1/login",
+                json={"key": API_KEY},
+                headers={"X-Real-IP": "192.0.2.2"},
+            )
+        self.assertEqual(201, response.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
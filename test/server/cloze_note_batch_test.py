@@ -0,0 +1,90 @@
+import json
+import unittest
+from unittest.mock import ANY, MagicMock, patch
+
+from helpers import NOTE, access_headers, patch_server_secret_key
+
+from anki_sync_server.server.main import app
+
+
+class TestClozeNoteBatch(unittest.TestCase):
+    def setUp(self):
+        patch_server_secret_key(self)
+        self.headers = access_headers()
+        self.client = app.test_client()
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_notes_task")
+    def test_queue_json_array_as_one_task(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        response = self.client.post(
+            "/api/v1/clozeNotes:batch", json=[NOTE, NOTE], headers=self.headers
+        )
+
+        self.assertEqual(202, response.status_code)
+        self.assertEqual("task-1", response.json["taskId"])
+        self.assertEqual(2, response.json["count"])
+        mock_task.delay.assert_called_once_with([NOTE, NOTE], queued_at=ANY)
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_notes_task")
+    def test_queue_ndjson_stream(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        response = self.client.post(
+            "/api/v1/clozeNotes:batch",
+            data="\n".join(json.dumps(note) for note in [NOTE, NOTE, NOTE]) + "\n",
+            content_type="application/x-ndjson",
+            headers=self.headers,
+        )
+
+        self.assertEqual(202, response.status_code)
+        mock_task.delay.assert_called_once_with([NOTE, NOTE, NOTE], queued_at=ANY)
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_notes_task")
+    def test_oversized_ndjson_stream_is_rejected_before_reading_on(self, mock_task):
+        lines = [json.dumps(NOTE)] * 501 + ["not json"]
+
+        response = self.client.post(
+            "/api/v1/clozeNotes:batch",
+            data="\n".join(lines) + "\n",
+            content_type="application/x-ndjson",
+            headers=self.headers,
+        )
+
+        # The invalid line after the 501st note is never parsed
+        self.assertEqual(400, response.status_code)
+        self.assertIn("At most 500", response.json["message"])
+        mock_task.delay.assert_not_called()
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_notes_task")
+    def test_reject_batch_with_invalid_note(self, mock_task):
+        response = self.client.post(
+            "/api/v1/clozeNotes:batch",
+            json=[NOTE, {"word": "test"}],
+            headers=self.headers,
+        )
+
+        self.assertEqual(400, response.status_code)
+        self.assertIn("1", response.json["message"])
+        mock_task.delay.assert_not_called()
+
+    @patch("anki_sync_server.server.api_v1.anki")
+    def test_synchronous_batch_returns_per_note_results(self, mock_anki):
+        note = MagicMock(id=123)
+        mock_anki.add_cloze_notes.return_value = [note, RuntimeError("failed")]
+
+        response = self.client.post(
+            "/api/v1/clozeNotes:batch?async=false",
+            json=[NOTE, NOTE],
+            headers=self.headers,
+        )
+
+        self.assertEqual(200, response.status_code)
+        results = response.json["results"]
+        self.assertEqual({"noteId": 123, "error": None}, results[0])
+        self.assertIsNone(results[1]["noteId"])
+        self.assertEqual("RuntimeError", results[1]["error"]["type"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+from unittest.mock import ANY, MagicMock, patch
+
+from celery.exceptions import TimeLimitExceeded
+from helpers import NOTE, access_headers, patch_server_secret_key, patch_task_watcher
+
+from anki_sync_server.server.main import app
+
+
+@patch("anki_sync_server.server.api_v1.add_cloze_note_task")
+class TestClozeNote(unittest.TestCase):
+    def setUp(self):
+        patch_server_secret_key(self)
+        patch_task_watcher(self, "success")
+        self.headers = access_headers()
+        self.client = app.test_client()
+
+    def test_fast_task_returns_result(self, mock_task):
+        result = {"success": True, "noteId": 1, "cardId": 1}
+        mock_task.delay.return_value = MagicMock(id="task-1")
+        mock_task.delay.return_value.get.return_value = result
+
+        response = self.client.post(
+            "/api/v1/clozeNotes?wait=2000", json=NOTE, headers=self.headers
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("success", response.get_json()["status"])
+        self.assertEqual(result, response.get_json()["result"])
+        mock_task.delay.return_value.get.assert_called_once()
+
+    def test_task_that_raised_returns_a_failure_result(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+        mock_task.delay.return_value.get.return_value = TimeLimitExceeded(300)
+
+        response = self.client.post(
+            "/api/v1/clozeNotes?wait=2000", json=NOTE, headers=self.headers
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("failure", response.get_json()["status"])
+        self.assertEqual(
+            {"type": "TimeLimitExceeded", "message": "TimeLimitExceeded(300,)"},
+            response.get_json()["result"]["error"],
+        )
+        _, kwargs = mock_task.delay.return_value.get.call_args
+        self.assertFalse(kwargs["propagate"])
+
+    def test_slow_task_is_accepted(self, mock_task):
+        patch_task_watcher(self, "started")
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        response = self.client.post(
+            "/api/v1/clozeNotes?wait=100", json=NOTE, headers=self.headers
+        )
+
+        self.assertEqual(202, response.status_code)
+        self.assertEqual("/api/v1/tasks/task-1", response.get_json()["statusUrl"])
+        # Not finished, so its result is not fetched
+        mock_task.delay.return_value.get.assert_not_called()
+
+    def test_without_wait_the_result_is_not_awaited(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        response = self.client.post(
+            "/api/v1/clozeNotes", json=NOTE, headers=self.headers
+        )
+
+        self.assertEqual(202, response.status_code)
+        mock_task.delay.return_value.get.assert_not_called()
+
+    @patch("anki_sync_server.server.api_v1.get_task_result", return_value=None)
+    def test_wait_is_capped(self, mock_get_task_result, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        self.client.post(
+            "/api/v1/clozeNotes?wait=999999", json=NOTE, headers=self.headers
+        )
+
+        mock_get_task_result.assert_called_once_with(mock_task.delay.return_value, 30)
+
+    def test_invalid_wait_is_rejected_before_queueing(self, mock_task):
+        response = self.client.post(
+            "/api/v1/clozeNotes?wait=soon", json=NOTE, headers=self.headers
+        )
+
+        self.assertEqual(400, response.status_code)
+        mock_task.delay.assert_not_called()
+
+    @patch(
+        "socket.getaddrinfo",
+        return_value=[(None, None, None, "", ("93.184.215.14", 0))],
+    )
+    def test_callback_url_is_passed_to_the_task(self, mock_getaddrinfo, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        response = self.client.post(
+            "/api/v1/clozeNotes?callbackUrl=https://example.com/hook",
+            json=NOTE,
+            headers=self.headers,
+        )
+
+        self.assertEqual(202, response.status_code)
+        mock_task.delay.assert_called_once_with(
+            NOTE, callback_url="https://example.com/hook", queued_at=ANY
+        )
+
+    def test_invalid_callback_url_is_rejected(self, mock_task):
+        response = self.client.post(
+            "/api/v1/clozeNotes?callbackUrl=file:///etc/passwd",
+            json=NOTE,
+            headers=self.headers,
+        )
+
+        self.assertEqual(400, response.status_code)
+        mock_task.delay.assert_not_called()
+
+    def test_callback_url_to_an_internal_address_is_rejected(self, mock_task):
+        for host in ["127.0.0.1", "10.0.0.5", "169.254.169.254", "[::1]", "0.0.0.0"]:
+            with self.subTest(host=host):
+                response = self.client.post(
+                    f"/api/v1/clozeNotes?callbackUrl=http://{host}/hook",
+                    json=NOTE,
+                    headers=self.headers,
+                )
+
+                self.assertEqual(400, response.status_code)
+        mock_task.delay.assert_not_called()
+
+    @patch(
+        "socket.getaddrinfo",
+        return_value=[
+            (None, None, None, "", ("93.184.215.14", 0)),
+            (None, None, None, "", ("192.168.1.10", 0)),
+        ],
+    )
+    def test_callback_host_resolving_to_a_private_address_is_rejected(
+        self, mock_getaddrinfo, mock_task
+    ):
+        response = self.client.post(
+            "/api/v1/clozeNotes?callbackUrl=https://hook.example.com/hook",
+            json=NOTE,
+            headers=self.headers,
+        )
+
+        self.assertEqual(400, response.status_code)
+        mock_task.delay.assert_not_called()
+
+    @patch.dict("os.environ", {"WEBHOOK_ALLOWED_HOSTS": "hooks.internal, other"})
+    def test_only_allowed_callback_hosts_are_accepted(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        allowed = self.client.post(
+            "/api/v1/clozeNotes?callbackUrl=http://hooks.internal:8080/hook",
+            json=NOTE,
+            headers=self.headers,
+        )
+        rejected = self.client.post(
+            "/api/v1/clozeNotes?callbackUrl=https://example.com/hook",
+            json=NOTE,
+            headers=self.headers,
+        )
+
+        self.assertEqual(202, allowed.status_code)
+        self.assertEqual(400, rejected.status_code)
+        mock_task.delay.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+from unittest.mock import patch
+
+from anki_sync_server.server.main import app
+from anki_sync_server.tasks.celery_app import celery_app
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    @patch.object(celery_app, "connection_for_read", side_effect=OSError("down"))
+    def test_metrics_are_exposed_without_a_token(self, mock_connection_for_read):
+        response = app.test_client().get("/metrics")
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        body = response.get_data(as_text=True)
+        self.assertIn("anki_lock_wait_seconds", body)
+        self.assertIn("anki_sync_outcomes", body)
+        # The queue depth is still described when the broker is unreachable
+        self.assertIn("# TYPE anki_queue_depth gauge", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest.mock import ANY, MagicMock, patch
+
+from celery.exceptions import TaskRevokedError
+from helpers import NOTE, access_headers, patch_server_secret_key, patch_task_watcher
+
+from anki_sync_server.server.main import app, warm_up_api_process
+
+
+@patch.dict(os.environ, {"ANKI_API_QUEUE_ONLY": "true"})
+@patch("anki_sync_server.server.api_v1.anki")
+class TestQueueOnlyMode(unittest.TestCase):
+    def setUp(self):
+        patch_server_secret_key(self)
+        patch_task_watcher(self, "success")
+        self.headers = access_headers()
+        self.client = app.test_client()
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_note_task")
+    def test_sync_request_waits_for_queued_task(self, mock_task, mock_anki):
+        mock_task.delay.return_value.get.return_value = {
+            "success": True,
+            "noteId": 1,
+            "cardId": 1,
+        }
+
+        response = self.client.post(
+            "/api/v1/clozeNotes?async=false", json=NOTE, headers=self.headers
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({"status": "ok"}, response.get_json())
+        mock_task.delay.assert_called_once_with(NOTE, queued_at=ANY)
+        mock_anki.add_cloze_note.assert_not_called()
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_note_task")
+    def test_sync_request_times_out_with_task_id(self, mock_task, mock_anki):
+        patch_task_watcher(self, "started")
+        mock_task.delay.return_value = MagicMock(id="task-1")
+
+        with patch.dict(os.environ, {"ANKI_API_SYNC_TIMEOUT_SECONDS": "0.1"}):
+            response = self.client.post(
+                "/api/v1/clozeNotes?async=false", json=NOTE, headers=self.headers
+            )
+
+        self.assertEqual(504, response.status_code)
+        self.assertEqual("task-1", response.get_json()["taskId"])
+        mock_task.delay.return_value.get.assert_not_called()
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_note_task")
+    def test_sync_request_of_a_revoked_task_fails(self, mock_task, mock_anki):
+        # Revoked is not one of the API statuses
+        patch_task_watcher(self, "unknown")
+        mock_task.delay.return_value.get.return_value = TaskRevokedError("revoked")
+
+        response = self.client.post(
+            "/api/v1/clozeNotes?async=false", json=NOTE, headers=self.headers
+        )
+
+        self.assertEqual(500, response.status_code)
+        self.assertEqual(
+            {"type": "TaskRevokedError", "message": "revoked"},
+            response.get_json()["error"],
+        )
+
+    @patch("anki_sync_server.server.main.start_warm_up")
+    def test_api_process_does_not_warm_up(self, mock_start_warm_up, mock_anki):
+        with patch.dict(os.environ, {"ANKI_WARM_UP": "true"}):
+            warm_up_api_process()
+
+        mock_start_warm_up.assert_not_called()
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_notes_task")
+    def test_sync_batch_returns_task_results(self, mock_task, mock_anki):
+        results = [{"noteId": 1, "error": None}]
+        mock_task.delay.return_value.get.return_value = {
+            "success": True,
+            "results": results,
+        }
+
+        response = self.client.post(
+            "/api/v1/clozeNotes:batch?async=false", json=[NOTE], headers=self.headers
+        )
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({"status": "ok", "results": results}, response.get_json())
+        mock_anki.add_cloze_notes.assert_not_called()
+
+
+class TestApiImports(unittest.TestCase):
+    def test_api_does_not_load_the_anki_backend(self):
+        code = (
+            "import sys\n"
+            "import anki_sync_server.server.main\n"
+            "assert 'anki.collection' not in sys.modules\n"
+            "assert 'anki._backend' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
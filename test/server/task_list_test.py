@@ -0,0 +1,114 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from helpers import NOTE, access_headers, patch_server_secret_key
+
+from anki_sync_server.server.main import app
+from anki_sync_server.tasks.task_index import TaskIndex
+
+
+class TestTaskList(unittest.TestCase):
+    def setUp(self):
+        patch_server_secret_key(self)
+        self.headers = access_headers()
+        self.client = app.test_client()
+
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.task_index = TaskIndex(os.path.join(tmpdir.name, "tasks.db"))
+        for target in [
+            "anki_sync_server.server.api_v1.task_index",
+            "anki_sync_server.server.task_status.task_index",
+        ]:
+            index_patcher = patch(target, self.task_index)
+            index_patcher.start()
+            self.addCleanup(index_patcher.stop)
+
+    @patch("anki_sync_server.server.api_v1.add_cloze_note_task")
+    def test_queued_task_is_listed(self, mock_task):
+        mock_task.delay.return_value = MagicMock(id="task-1")
+        self.client.post("/api/v1/clozeNotes", json=NOTE, headers=self.headers)
+
+        response = self.client.get("/api/v1/tasks", headers=self.headers)
+
+        self.assertEqual(200, response.status_code)
+        (task,) = response.get_json()["tasks"]
+        self.assertEqual("task-1", task["taskId"])
+        self.assertEqual("pending", task["status"])
+        self.assertEqual({"count": 1, "words": ["test"]}, task["notes"])
+        self.assertIsNotNone(task["createdAt"])
+        self.assertIsNone(response.get_json()["nextCursor"])
+
+    def test_failures_since_are_paged(self):
+        now = time.time()
+        for age, task_id in enumerate(["c", "b", "a"]):
+            self.task_index.record_queued(task_id, "add_cloze_note", {}, now - age)
+            self.task_index.record_finished(task_id, "add_cloze_note", "failure")
+
+        query = {
+            "status": "failure",
+            "since": datetime.fromtimestamp(now - 1.5, timezone.utc).isoformat(),
+            "limit": 1,
+        }
+        first_page = self.client.get(
+            "/api/v1/tasks", query_string=query, headers=self.headers
+        ).get_json()
+        second_page = self.client.get(
+            "/api/v1/tasks",
+            query_string={**query, "cursor": first_page["nextCursor"]},
+            headers=self.headers,
+        ).get_json()
+
+        self.assertEqual(["c"], [task["taskId"] for task in first_page["tasks"]])
+        self.assertEqual(["b"], [task["taskId"] for task in second_page["tasks"]])
+        self.assertIsNone(second_page["nextCursor"])
+
+    def test_invalid_filters_are_rejected(self):
+        for query in ["status=done", "since=yesterday", "limit=0", "cursor=x"]:
+            response = self.client.get(f"/api/v1/tasks?{query}", headers=self.headers)
+            self.assertEqual(400, response.status_code, query)
+
+    def test_timings_summarize_the_last_hour_by_default(self):
+        self.task_index.record_finished(
+            "a", "add_cloze_note", "success", timings={"tts": 120.0, "total": 900.0}
+        )
+
+        response = self.client.get("/api/v1/tasks/timings", headers=self.headers)
+
+        self.assertEqual(200, response.status_code)
+        body = response.get_json()
+        self.assertEqual(1, body["tasks"])
+        self.assertEqual(120.0, body["phases"]["tts"]["p99"])
+        self.assertIsNotNone(body["since"])
+
+    @patch("anki_sync_server.server.api_v1.TaskStatus.get_task_statuses")
+    def test_lookup_reports_unknown_tasks(self, mock_get_task_statuses):
+        mock_get_task_statuses.return_value = {
+            "a": {"taskId": "a", "status": "success", "createdAt": "2024-01-01"},
+            "b": {"taskId": "b", "status": "pending", "createdAt": None},
+        }
+
+        response = self.client.post(
+            "/api/v1/tasks:lookup", json={"ids": ["a", "b", "a"]}, headers=self.headers
+        )
+
+        self.assertEqual(200, response.status_code)
+        body = response.get_json()
+        self.assertEqual(["a"], [task["taskId"] for task in body["tasks"]])
+        self.assertEqual(["b"], body["notFound"])
+        mock_get_task_statuses.assert_called_once_with(["a", "b"])
+
+    def test_lookup_requires_ids(self):
+        response = self.client.post(
+            "/api/v1/tasks:lookup", json={"ids": []}, headers=self.headers
+        )
+
+        self.assertEqual(400, response.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from anki_sync_server.server.task_state_cache import TaskStateCache
+from anki_sync_server.server.task_status import TaskStatus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TaskStateCacheTest(unittest.TestCase):
+    def test_entries_expire_after_their_ttl(self):
+        clock = FakeClock()
+        cache = TaskStateCache(clock=clock)
+        cache.put("a", {"status": "success"}, ttl_seconds=10)
+
+        clock.now = 9
+        self.assertEqual({"status": "success"}, cache.get("a"))
+        clock.now = 10
+        self.assertIsNone(cache.get("a"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TaskStateCache(max_entries=2)
+        cache.put("a", {"status": "success"}, ttl_seconds=10)
+        cache.put("b", {"status": "success"}, ttl_seconds=10)
+        cache.get("a")
+        cache.put("c", {"status": "success"}, ttl_seconds=10)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_cached_status_cannot_be_modified(self):
+        cache = TaskStateCache()
+        cache.put("a", {"result": {"noteId": 1}}, ttl_seconds=10)
+
+        cache.get("a")["result"]["noteId"] = 2
+
+        self.assertEqual({"result": {"noteId": 1}}, cache.get("a"))
+
+
+class TaskStatusCacheTest(unittest.TestCase):
+    def setUp(self):
+        TaskStatus._terminal_states.clear()
+
+    def mock_result(self, state, result, date_done):
+        mock_result = MagicMock()
+        mock_result.id = "task-123"
+        mock_result.state = state
+        mock_result.successful.return_value = state == "SUCCESS"
+        mock_result.failed.return_value = state == "FAILURE"
+        mock_result.result = result
+        mock_result.date_done = date_done
+        return mock_result
+
+    @patch("anki_sync_server.server.task_status.AsyncResult")
+    def test_finished_task_is_served_from_cache(self, mock_async_result_class):
+        date_done = datetime.now(timezone.utc) - timedelta(minutes=5)
+        mock_async_result_class.return_value = self.mock_result(
+            "SUCCESS", {"success": True, "noteId": 456}, date_done
+        )
+
+        first = TaskStatus.get_task_status("task-123")
+        second = TaskStatus.get_task_status("task-123")
+
+        mock_async_result_class.assert_called_once()
+        self.assertEqual(first, second)
+        self.assertEqual(date_done.isoformat(), second["completedAt"])
+
+    @patch("anki_sync_server.server.task_status.AsyncResult")
+    def test_running_task_is_not_cached(self, mock_async_result_class):
+        mock_async_result_class.return_value = self.mock_result("STARTED", None, None)
+
+        TaskStatus.get_task_status("task-123")
+        TaskStatus.get_task_status("task-123")
+
+        self.assertEqual(2, mock_async_result_class.call_count)
+
+    @patch("anki_sync_server.server.task_status.AsyncResult")
+    def test_expired_result_is_not_cached(self, mock_async_result_class):
+        date_done = datetime.now(timezone.utc) - timedelta(days=2)
+        mock_async_result_class.return_value = self.mock_result(
+            "SUCCESS", {"success": True}, date_done
+        )
+
+        TaskStatus.get_task_status("task-123")
+        TaskStatus.get_task_status("task-123")
+
+        self.assertEqual(2, mock_async_result_class.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,6 +7,9 @@ from anki_sync_server.server.task_status import TaskStatus
 class TestTaskStatus(unittest.TestCase):
     """Unit tests for task status tracking."""
 
+    def setUp(self):
+        TaskStatus._terminal_states.clear()
+
     @patch("anki_sync_server.server.task_status.AsyncResult")
     def test_get_task_status_pending(self, mock_async_result_class):
         """Test fetching status of a pending task."""
@@ -47,6 +50,32 @@ class TestTaskStatus(unittest.TestCase):
         assert status["taskId"] == "task-123"
         assert status["status"] == "started"
 
+    @patch("anki_sync_server.server.task_status.AsyncResult")
+    def test_get_task_status_progress(self, mock_async_result_class):
+        """Test fetching progress reported by a running task."""
+        # Setup
+        mock_result = MagicMock()
+        mock_result.id = "task-123"
+        mock_result.state = "PROGRESS"
+        mock_result.successful.return_value = False
+        mock_result.failed.return_value = False
+        mock_result.info = {
+            "phase": "media_sync",
+            "current": 4,
+            "total": 5,
+            "media": {"checked": 12, "uploaded": 2},
+        }
+        mock_async_result_class.return_value = mock_result
+
+        # Execute
+        status = TaskStatus.get_task_status("task-123")
+
+        # Assert
+        assert status["status"] == "started"
+        assert status["progress"]["phase"] == "media_sync"
+        assert status["progress"]["current"] == 4
+        assert status["progress"]["media"]["uploaded"] == 2
+
     @patch("anki_sync_server.server.task_status.AsyncResult")
     def test_get_task_status_success(self, mock_async_result_class):
         """Test fetching status of a successful task."""
@@ -108,6 +137,32 @@ class TestTaskStatus(unittest.TestCase):
         # Assert
         assert status is None
 
+    @patch("anki_sync_server.server.task_status.MediaSyncState")
+    @patch("anki_sync_server.server.task_status.AsyncResult")
+    def test_get_task_status_resolves_background_media_sync(
+        self, mock_async_result_class, mock_media_sync_state_class
+    ):
+        """Test that pending media is reported as synced once its generation is."""
+        mock_result = MagicMock()
+        mock_result.id = "task-123"
+        mock_result.state = "SUCCESS"
+        mock_result.successful.return_value = True
+        mock_result.failed.return_value = False
+        mock_result.result = {
+            "noteId": 456,
+            "mediaSync": {"status": "pending", "generation": 3},
+        }
+        mock_async_result_class.return_value = mock_result
+
+        mock_media_sync_state_class.return_value.is_synced.return_value = False
+        status = TaskStatus.get_task_status("task-123")
+        assert status["result"]["mediaSync"]["status"] == "pending"
+
+        mock_media_sync_state_class.return_value.is_synced.return_value = True
+        status = TaskStatus.get_task_status("task-123")
+        assert status["result"]["mediaSync"] == {"status": "synced", "generation": 3}
+        mock_media_sync_state_class.return_value.is_synced.assert_called_with(3)
+
 
 if __name__ == "__main__":
     unittest.main()
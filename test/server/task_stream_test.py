@@ -0,0 +1,161 @@
+import json
+import os
+import tempfile
+import unittest
+from threading import BoundedSemaphore
+from unittest.mock import MagicMock, patch
+
+from celery.backends.database import DatabaseBackend
+from helpers import access_headers, patch_server_secret_key
+
+from anki_sync_server.server.main import app
+from anki_sync_server.server.task_status import TaskStatus
+from anki_sync_server.server.task_watcher import TaskWatcher
+from anki_sync_server.tasks.celery_app import celery_app
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def started_statuses(task_ids):
+    return {task_id: {"taskId": task_id, "status": "started"} for task_id in task_ids}
+
+
+class TestTaskStream(unittest.TestCase):
+    def setUp(self):
+        patch_server_secret_key(self)
+        self.headers = access_headers()
+        self.client = app.test_client()
+
+    def test_stream_pushes_status_until_all_tasks_finish(self):
+        statuses = {
+            "a": [{"taskId": "a", "status": "started"}],
+            "b": [{"taskId": "b", "status": "success"}],
+        }
+
+        def fetch(task_ids):
+            return {
+                task_id: statuses[task_id].pop(0)
+                if len(statuses[task_id]) > 1
+                else statuses[task_id][0]
+                for task_id in task_ids
+            }
+
+        statuses["a"].append({"taskId": "a", "status": "failure"})
+        watcher = TaskWatcher(fetch, poll_interval_seconds=0.01)
+
+        with patch("anki_sync_server.server.api_v1.task_watcher", watcher):
+            response = self.client.get(
+                "/api/v1/tasks/stream?ids=a,b,a", headers=self.headers
+            )
+            body = response.get_data(as_text=True)
+            response.close()
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("text/event-stream", response.mimetype)
+        events = parse_events(body)
+        self.assertEqual(("end", {}), events[-1])
+        self.assertCountEqual(
+            [("a", "started"), ("b", "success"), ("a", "failure")],
+            [(data["taskId"], data["status"]) for _, data in events[:-1]],
+        )
+
+    def test_stream_ends_for_unknown_tasks(self):
+        def fetch(task_ids):
+            return {
+                task_id: {"taskId": task_id, "status": "pending", "createdAt": None}
+                for task_id in task_ids
+            }
+
+        watcher = TaskWatcher(fetch, poll_interval_seconds=0.01)
+
+        with patch("anki_sync_server.server.api_v1.task_watcher", watcher):
+            response = self.client.get(
+                "/api/v1/tasks/stream?ids=unknown", headers=self.headers
+            )
+            body = response.get_data(as_text=True)
+            response.close()
+
+        self.assertEqual(
+            [("notFound", {"taskId": "unknown"}), ("end", {})], parse_events(body)
+        )
+
+    def test_stream_times_out(self):
+        watcher = TaskWatcher(started_statuses, poll_interval_seconds=0.01)
+
+        with patch("anki_sync_server.server.api_v1.task_watcher", watcher), patch(
+            "anki_sync_server.server.api_v1.TaskStreamResource.MAX_DURATION_SECONDS",
+            0.1,
+        ):
+            response = self.client.get(
+                "/api/v1/tasks/stream?ids=a", headers=self.headers
+            )
+            body = response.get_data(as_text=True)
+            response.close()
+
+        events = parse_events(body)
+        self.assertEqual(("status", {"taskId": "a", "status": "started"}), events[0])
+        self.assertEqual(("timeout", {"taskIds": ["a"]}), events[-1])
+
+    def test_streams_past_the_cap_are_rejected(self):
+        watcher = TaskWatcher(started_statuses, poll_interval_seconds=0.01)
+        streams = BoundedSemaphore(1)
+
+        with patch("anki_sync_server.server.api_v1.task_watcher", watcher), patch(
+            "anki_sync_server.server.api_v1.TaskStreamResource._streams", streams
+        ):
+            first = self.client.get("/api/v1/tasks/stream?ids=a", headers=self.headers)
+            second = self.client.get(
+                "/api/v1/tasks/stream?ids=a", headers=self.headers
+            )
+            first.close()
+            third = self.client.get("/api/v1/tasks/stream?ids=a", headers=self.headers)
+            third.close()
+
+        self.assertEqual(200, first.status_code)
+        self.assertEqual(503, second.status_code)
+        self.assertEqual("15", second.headers["Retry-After"])
+        self.assertEqual(200, third.status_code)
+
+    def test_stream_requires_task_ids(self):
+        response = self.client.get("/api/v1/tasks/stream", headers=self.headers)
+
+        self.assertEqual(400, response.status_code)
+
+
+class TestTaskStatuses(unittest.TestCase):
+    def setUp(self):
+        TaskStatus._terminal_states.clear()
+
+    def test_statuses_are_fetched_in_one_query(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            url = "sqlite:///" + os.path.join(tmpdir, "results.db")
+            backend = DatabaseBackend(url=url, app=celery_app)
+            backend.store_result("done", {"success": True}, "SUCCESS")
+            backend.store_result("running", {"phase": "add"}, "PROGRESS")
+            mock_app = MagicMock(backend=backend)
+            mock_app.conf.result_expires = 86400
+
+            with patch(
+                "anki_sync_server.server.task_status.celery_app", mock_app
+            ), patch.object(
+                backend, "ResultSession", wraps=backend.ResultSession
+            ) as mock_session:
+                statuses = TaskStatus.get_task_statuses(["done", "running", "new"])
+
+            mock_session.assert_called_once()
+            self.assertEqual("success", statuses["done"]["status"])
+            self.assertEqual({"success": True}, statuses["done"]["result"])
+            self.assertIsNotNone(statuses["done"]["completedAt"])
+            self.assertEqual("started", statuses["running"]["status"])
+            self.assertEqual({"phase": "add"}, statuses["running"]["progress"])
+            self.assertEqual("pending", statuses["new"]["status"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import time
+import unittest
+from threading import Lock
+
+from anki_sync_server.server.task_watcher import TaskWatcher
+
+
+class FakeBackend:
+    def __init__(self):
+        self.lock = Lock()
+        self.statuses = {}
+        self.fetches = []
+
+    def set(self, task_id, status):
+        with self.lock:
+            self.statuses[task_id] = {"taskId": task_id, "status": status}
+
+    def fetch(self, task_ids):
+        with self.lock:
+            self.fetches.append(sorted(task_ids))
+            return {
+                task_id: self.statuses.get(
+                    task_id, {"taskId": task_id, "status": "pending"}
+                )
+                for task_id in task_ids
+            }
+
+
+class TaskWatcherTest(unittest.TestCase):
+    def test_subscribers_share_one_fetch_and_receive_changes(self):
+        backend = FakeBackend()
+        watcher = TaskWatcher(backend.fetch, poll_interval_seconds=0.01)
+
+        first = watcher.subscribe(["a", "b"])
+        second = watcher.subscribe(["a"])
+        self.assertEqual("pending", first.get(timeout=5)["status"])
+        self.assertEqual("pending", first.get(timeout=5)["status"])
+        self.assertEqual("pending", second.get(timeout=5)["status"])
+
+        backend.set("a", "success")
+        self.assertEqual({"taskId": "a", "status": "success"}, first.get(timeout=5))
+        self.assertEqual({"taskId": "a", "status": "success"}, second.get(timeout=5))
+
+        # each poll fetches every watched task at once
+        self.assertTrue(all(len(fetch) <= 2 for fetch in backend.fetches))
+        watcher.unsubscribe(first)
+        watcher.unsubscribe(second)
+
+    def test_unchanged_status_is_not_pushed_again(self):
+        backend = FakeBackend()
+        backend.set("a", "started")
+        watcher = TaskWatcher(backend.fetch, poll_interval_seconds=0.01)
+
+        queue = watcher.subscribe(["a"])
+        queue.get(timeout=5)
+        while len(backend.fetches) < 3:
+            time.sleep(0.001)
+
+        self.assertTrue(queue.empty())
+        watcher.unsubscribe(queue)
+
+    def test_terminal_task_is_no_longer_polled(self):
+        backend = FakeBackend()
+        backend.set("a", "failure")
+        watcher = TaskWatcher(backend.fetch, poll_interval_seconds=0.01)
+
+        queue = watcher.subscribe(["a", "b"])
+        received = {queue.get(timeout=5)["taskId"], queue.get(timeout=5)["taskId"]}
+        fetch_count = len(backend.fetches)
+        while len(backend.fetches) < fetch_count + 2:
+            time.sleep(0.001)
+
+        self.assertEqual({"a", "b"}, received)
+        self.assertEqual(["b"], backend.fetches[-1])
+        watcher.unsubscribe(queue)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import patch
+
+import jwt
+from helpers import SECRET, access_headers
+
+from anki_sync_server.server.authentication import verified_tokens
+from anki_sync_server.server.main import app
+from anki_sync_server.server.token_cache import VerifiedTokenCache
+from anki_sync_server.server.token_issuer import TokenIssuer
+from anki_sync_server.setup.credential_storage import CredentialStorage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class VerifiedTokenCacheTest(unittest.TestCase):
+    def test_token_is_valid_until_it_expires(self):
+        clock = FakeClock()
+        cache = VerifiedTokenCache(clock=clock)
+        cache.put("token", SECRET, {"exp": 10})
+
+        clock.now = 9
+        self.assertIsNotNone(cache.get("token", SECRET))
+        clock.now = 10
+        self.assertIsNone(cache.get("token", SECRET))
+
+    def test_claims_of_a_cached_token_are_returned(self):
+        cache = VerifiedTokenCache(clock=FakeClock())
+        cache.put("token", SECRET, {"exp": 10, "sid": "s1"})
+
+        self.assertEqual({"exp": 10, "sid": "s1"}, cache.get("token", SECRET))
+
+    def test_rotating_the_secret_key_drops_all_tokens(self):
+        cache = VerifiedTokenCache(clock=FakeClock())
+        cache.put("token", SECRET, {"exp": 10})
+
+        self.assertIsNone(cache.get("token", "rotated_secret"))
+        self.assertIsNone(cache.get("token", SECRET))
+
+    def test_least_recently_used_token_is_evicted(self):
+        cache = VerifiedTokenCache(max_entries=2, clock=FakeClock())
+        cache.put("a", SECRET, {"exp": 10})
+        cache.put("b", SECRET, {"exp": 10})
+        cache.get("a", SECRET)
+        cache.put("c", SECRET, {"exp": 10})
+
+        self.assertIsNotNone(cache.get("a", SECRET))
+        self.assertIsNone(cache.get("b", SECRET))
+        self.assertIsNotNone(cache.get("c", SECRET))
+
+    def test_expired_token_is_not_cached(self):
+        clock = FakeClock()
+        clock.now = 10
+        cache = VerifiedTokenCache(clock=clock)
+        cache.put("token", SECRET, {"exp": 10})
+
+        clock.now = 0
+        self.assertIsNone(cache.get("token", SECRET))
+
+
+class TokenRequiredTest(unittest.TestCase):
+    def setUp(self):
+        self.secret_key = SECRET
+        secret_patcher = patch.object(
+            CredentialStorage,
+            "get_server_secret_key",
+            side_effect=lambda: self.secret_key,
+        )
+        secret_patcher.start()
+        self.addCleanup(secret_patcher.stop)
+        verified_tokens.clear()
+        self.addCleanup(verified_tokens.clear)
+        self.headers = access_headers()
+        self.client = app.test_client()
+
+    def test_token_is_verified_once(self):
+        with patch.object(
+            TokenIssuer, "verify", autospec=True, side_effect=TokenIssuer.verify
+        ) as mock_verify:
+            for _ in range(3):
+                response = self.client.get("/api/v1/health", headers=self.headers)
+                self.assertEqual(200, response.status_code)
+
+        mock_verify.assert_called_once()
+
+    def test_cached_token_is_not_decoded_again(self):
+        self.client.get("/api/v1/health", headers=self.headers)
+
+        with patch.object(jwt, "decode", side_effect=jwt.decode) as mock_decode:
+            response = self.client.get("/api/v1/health", headers=self.headers)
+
+        self.assertEqual(200, response.status_code)
+        mock_decode.assert_not_called()
+
+    def test_token_is_rejected_after_the_secret_key_rotates(self):
+        self.client.get("/api/v1/health", headers=self.headers)
+
+        self.secret_key = "rotated_secret_key_of_at_least_32_bytes"
+        response = self.client.get("/api/v1/health", headers=self.headers)
+
+        self.assertEqual(401, response.status_code)
+        self.assertEqual({"message": "Invalid token"}, response.get_json())
+
+    def test_invalid_token_is_not_cached(self):
+        headers = {"x-access-token": "invalid_token"}
+        for _ in range(2):
+            response = self.client.get("/api/v1/health", headers=headers)
+            self.assertEqual(401, response.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,13 @@
+import os
+import tempfile
 import unittest
 from datetime import datetime, timedelta
 from unittest.mock import patch
 
+import jwt
+
 from anki_sync_server.server.token_issuer import TokenIssuer
+from anki_sync_server.server.token_state_store import TokenStateStore
 from anki_sync_server.setup.credential_storage import CredentialStorage
 
 
@@ -11,6 +16,14 @@ class TestTokenIssuer(unittest.TestCase):
         self.secret_key = "test_secret"
         self.token_ttl = timedelta(minutes=5)
         self.issuer = TokenIssuer(self.secret_key)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.token_state = TokenStateStore(os.path.join(tmpdir.name, "token_state.db"))
+        token_state_patcher = patch(
+            "anki_sync_server.server.token_issuer.token_state", self.token_state
+        )
+        token_state_patcher.start()
+        self.addCleanup(token_state_patcher.stop)
 
     def test_issue_access_token(self):
         token = self.issuer.issue("access", self.token_ttl)
@@ -63,11 +76,39 @@ class TestTokenIssuer(unittest.TestCase):
 
     def test_verify_refresh_token_created_at(self):
         token = self.issuer.issue("refresh", self.token_ttl)
-        CredentialStorage().set_refresh_token_created_at(None)
+        self.token_state.set("refresh_token_created_at", None)
+        is_valid, error = self.issuer.verify(token, "refresh")
+        self.assertFalse(is_valid)
+        self.assertEqual(error, "Invalid token")
+
+    def test_verify_refresh_token_replaced_by_a_newer_one(self):
+        token = self.issuer.issue("refresh", self.token_ttl)
+        self.token_state.set("refresh_token_created_at", 0.0)
         is_valid, error = self.issuer.verify(token, "refresh")
         self.assertFalse(is_valid)
         self.assertEqual(error, "Invalid token")
 
+    def test_verify_refresh_token_recorded_in_credentials(self):
+        with patch.object(TokenStateStore, "set"):
+            token = self.issuer.issue("refresh", self.token_ttl)
+        iat = jwt.decode(token, self.secret_key, algorithms=["HS256"])["iat"]
+        with patch.object(
+            CredentialStorage, "get_refresh_token_created_at", return_value=iat
+        ):
+            is_valid, error = self.issuer.verify(token, "refresh")
+        self.assertTrue(is_valid)
+        self.assertIsNone(error)
+
+    def test_verify_access_token_does_not_read_the_token_state(self):
+        token = self.issuer.issue("access", self.token_ttl)
+        with patch.object(TokenStateStore, "get") as mock_get, patch.object(
+            CredentialStorage, "get_refresh_token_created_at"
+        ) as mock_created_at:
+            is_valid, _ = self.issuer.verify(token, "access")
+        self.assertTrue(is_valid)
+        mock_get.assert_not_called()
+        mock_created_at.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from anki_sync_server.server.token_state_store import TokenStateStore
+
+
+class TokenStateStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, "data", "token_state.db")
+
+    def test_unset_value_is_the_default(self):
+        store = TokenStateStore(self.path)
+
+        self.assertIsNone(store.get("refresh_token_created_at"))
+        self.assertEqual(1.5, store.get("refresh_token_created_at", 1.5))
+
+    def test_value_set_to_none_is_not_the_default(self):
+        store = TokenStateStore(self.path)
+        store.set("refresh_token_created_at", None)
+
+        self.assertIsNone(store.get("refresh_token_created_at", 1.5))
+
+    def test_change_is_seen_by_other_processes(self):
+        # Each process has its own store on the same database
+        store = TokenStateStore(self.path)
+        other_store = TokenStateStore(self.path)
+        self.assertIsNone(other_store.get("refresh_token_created_at"))
+
+        store.set("refresh_token_created_at", 1700000000.25)
+        self.assertEqual(1700000000.25, other_store.get("refresh_token_created_at"))
+
+        other_store.set("refresh_token_created_at", 1700000001.5)
+        self.assertEqual(1700000001.5, store.get("refresh_token_created_at"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import tempfile
+import threading
 import unittest
 
 from anki_sync_server.setup.credential_storage import CredentialStorage
@@ -70,6 +71,42 @@ class CredentialStorageTest(unittest.TestCase):
             self.assertEqual("api_key1", credential_storage.get_gcp_tts_api_key())
             self.assertEqual("api_key2", credential_storage.get_hashed_api_key())
 
+    def test_concurrent_writes_are_not_lost(self):
+        credential_storage = CredentialStorage()
+        setters = [
+            (credential_storage.set_anki_session, "session"),
+            (credential_storage.set_gcp_tts_api_key, "api_key1"),
+            (credential_storage.set_hashed_api_key, b"api_key2"),
+            (credential_storage.set_server_secret_key, "server_secret"),
+            (credential_storage.set_refresh_token_created_at, 123456),
+        ]
+        threads = [
+            threading.Thread(target=setter, args=(value,)) for setter, value in setters
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual("session", credential_storage.get_anki_session())
+        self.assertEqual("api_key1", credential_storage.get_gcp_tts_api_key())
+        self.assertEqual(b"api_key2", credential_storage.get_hashed_api_key())
+        self.assertEqual("server_secret", credential_storage.get_server_secret_key())
+        self.assertEqual(123456, credential_storage.get_refresh_token_created_at())
+
+    def test_load_replaces_all_credentials(self):
+        credential_storage = CredentialStorage()
+        credential_storage.set_server_secret_key("server_secret")
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            credential_storage.save(tmpdirname + "/.credentials")
+            credential_storage.set_server_secret_key("rotated_secret")
+            credential_storage.set_gcp_tts_api_key("api_key1")
+            credential_storage.load(tmpdirname + "/.credentials")
+
+        self.assertEqual("server_secret", credential_storage.get_server_secret_key())
+        self.assertIsNone(credential_storage.get_gcp_tts_api_key())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from anki_sync_server.sqlite_store import SqliteStore
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS items (name TEXT PRIMARY KEY);"
+
+
+class SqliteStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "nested", "store.db")
+
+    def test_schema_is_created_in_wal_mode(self):
+        store = SqliteStore(self.path, SCHEMA)
+
+        with store.connect() as connection:
+            connection.execute("INSERT INTO items VALUES ('a')")
+            mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+
+        self.assertEqual(mode, "wal")
+        with store.connect() as connection:
+            rows = connection.execute("SELECT name FROM items").fetchall()
+        self.assertEqual(rows, [("a",)])
+
+    def test_error_rolls_back(self):
+        store = SqliteStore(self.path, SCHEMA)
+
+        with self.assertRaises(RuntimeError):
+            with store.connect() as connection:
+                connection.execute("INSERT INTO items VALUES ('a')")
+                raise RuntimeError()
+
+        with store.connect() as connection:
+            count = connection.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self.assertEqual(count, 0)
+
+    def test_migrate_runs_once(self):
+        calls = []
+        store = SqliteStore(self.path, SCHEMA, calls.append)
+
+        with store.connect():
+            pass
+        with store.connect():
+            pass
+
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,12 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 from marshmallow import ValidationError
 
-from anki_sync_server.tasks.card_creation_task import add_cloze_note_task
+from anki_sync_server.tasks.card_creation_task import (
+    add_cloze_note_task,
+    add_cloze_notes_task,
+)
 
 
 class TestCardCreationTask(unittest.TestCase):
@@ -34,7 +37,8 @@ class TestCardCreationTask(unittest.TestCase):
 
         result_note = MagicMock()
         result_note.id = 123456
-        mock_anki.add_cloze_note.return_value = result_note
+        mock_anki.add_cloze_note.return_value = [result_note]
+        mock_anki.media_sync_generation.return_value = None
 
         # Execute
         result = add_cloze_note_task(note_data)
@@ -42,8 +46,9 @@ class TestCardCreationTask(unittest.TestCase):
         # Assert
         assert result["success"] is True
         assert result["noteId"] == 123456
+        assert result["mediaSync"] == {"status": "synced"}
         mock_schema.load.assert_called_once_with(note_data)
-        mock_anki.add_cloze_note.assert_called_once_with([loaded_note])
+        mock_anki.add_cloze_note.assert_called_once_with([loaded_note], on_progress=ANY)
 
     @patch("anki_sync_server.tasks.card_creation_task.anki")
     @patch("anki_sync_server.tasks.card_creation_task.ClozeNoteSchema")
@@ -102,6 +107,37 @@ class TestCardCreationTask(unittest.TestCase):
         assert result["error"]["type"] == "RuntimeError"
         assert "Anki collection locked" in result["error"]["message"]
 
+    @patch("anki_sync_server.tasks.card_creation_task.anki")
+    def test_add_cloze_notes_task_reports_each_note(self, mock_anki):
+        """Test that a batch reports the note id or error of every note."""
+        note_data = {
+            "word": "test",
+            "partOfSpeech": "noun",
+            "guideWord": "test",
+            "englishDefinition": "definition",
+            "definitionTranslation": "translation",
+            "cefrLevel": "A1",
+            "code": "test",
+            "englishExample": "example",
+            "exampleTranslation": "example translation",
+        }
+        created_note = MagicMock()
+        created_note.id = 123456
+        mock_anki.add_cloze_notes.return_value = [
+            created_note,
+            RuntimeError("TTS failed"),
+        ]
+        mock_anki.media_sync_generation.return_value = 7
+
+        result = add_cloze_notes_task([note_data, note_data])
+
+        assert result["success"] is False
+        assert result["results"][0] == {"noteId": 123456, "error": None}
+        assert result["results"][1]["noteId"] is None
+        assert result["results"][1]["error"]["message"] == "TTS failed"
+        assert result["mediaSync"] == {"status": "pending", "generation": 7}
+        mock_anki.add_cloze_notes.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,119 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from helpers import NOTE
+
+from anki_sync_server.anki.prepared_note import PreparedNote
+from anki_sync_server.tasks.card_pipeline_task import (
+    commit_cloze_note_task,
+    commit_cloze_notes_task,
+    prepare_cloze_notes_task,
+)
+
+
+class TestCardPipelineTask(unittest.TestCase):
+    """Unit tests for the two-stage card creation tasks."""
+
+    @patch("anki_sync_server.tasks.card_pipeline_task.get_note_synthesizer")
+    def test_prepare_cloze_notes_task_serializes_each_note(self, mock_get_synthesizer):
+        """Test that prepared notes carry their audio and failures are reported."""
+        mock_synthesizer = mock_get_synthesizer.return_value
+        mock_synthesizer.synthesize.side_effect = [
+            PreparedNote({"Word": "test"}, {"googletts-1.mp3": b"audio"}),
+            RuntimeError("TTS failed"),
+        ]
+
+        result = prepare_cloze_notes_task([NOTE, NOTE])
+
+        assert result["success"] is True
+        prepared_note = PreparedNote.from_dict(result["notes"][0]["note"])
+        assert prepared_note.fields == {"Word": "test"}
+        assert prepared_note.media == {"googletts-1.mp3": b"audio"}
+        assert result["notes"][1]["error"]["message"] == "TTS failed"
+
+    def test_prepared_audio_is_not_stored_in_the_result_backend(self):
+        """Test that the prepare result only travels to the commit task."""
+        assert prepare_cloze_notes_task.ignore_result is True
+
+    @patch("anki_sync_server.tasks.card_creation_task.anki")
+    @patch("anki_sync_server.tasks.card_pipeline_task.anki")
+    def test_commit_cloze_notes_task_merges_prepare_errors(
+        self, mock_anki, mock_creation_anki
+    ):
+        """Test that only prepared notes are committed, in their original order."""
+        created_note = MagicMock()
+        created_note.id = 123456
+        mock_anki.add_prepared_notes.return_value = [created_note]
+        mock_creation_anki.media_sync_generation.return_value = None
+        prepare_error = {"type": "RuntimeError", "message": "TTS failed"}
+
+        result = commit_cloze_notes_task(
+            {
+                "success": True,
+                "notes": [
+                    {"error": prepare_error},
+                    {"note": PreparedNote({"Word": "test"}).to_dict()},
+                ],
+            }
+        )
+
+        assert result["success"] is False
+        assert result["results"] == [
+            {"noteId": None, "error": prepare_error},
+            {"noteId": 123456, "error": None},
+        ]
+        (prepared_notes,) = mock_anki.add_prepared_notes.call_args.args
+        assert [note.fields for note in prepared_notes] == [{"Word": "test"}]
+
+    @patch("anki_sync_server.tasks.card_creation_task.anki")
+    @patch("anki_sync_server.tasks.card_pipeline_task.anki")
+    def test_commit_cloze_note_task_returns_single_note_result(
+        self, mock_anki, mock_creation_anki
+    ):
+        """Test that a single note resolves like add_cloze_note."""
+        created_note = MagicMock()
+        created_note.id = 123456
+        mock_anki.add_prepared_notes.return_value = [created_note]
+        mock_creation_anki.media_sync_generation.return_value = None
+
+        result = commit_cloze_note_task(
+            {"success": True, "notes": [{"note": PreparedNote({}).to_dict()}]}
+        )
+
+        assert isinstance(result.pop("timeline"), list)
+        assert result == {
+            "success": True,
+            "cardId": 123456,
+            "noteId": 123456,
+            "mediaSync": {"status": "synced"},
+        }
+
+    @patch("anki_sync_server.tasks.card_pipeline_task.anki")
+    def test_commit_cloze_note_task_passes_prepare_failure_through(self, mock_anki):
+        """Test that a failed prepare stage is reported without committing."""
+        failure = {"success": False, "error": {"type": "X", "message": "bad"}}
+
+        result = commit_cloze_note_task(failure)
+
+        result.pop("timeline")
+        assert result == failure
+        mock_anki.add_prepared_notes.assert_not_called()
+
+    @patch("anki_sync_server.tasks.card_pipeline_task.get_note_synthesizer")
+    def test_commit_continues_the_timeline_of_the_prepare_stage(
+        self, mock_get_synthesizer
+    ):
+        """Test that both stages are timed from when the notes were queued."""
+        mock_get_synthesizer.return_value.synthesize.side_effect = RuntimeError("x")
+
+        prepared = prepare_cloze_notes_task([NOTE], queued_at=time.time() - 1)
+        result = commit_cloze_note_task(prepared)
+
+        phases = [phase["phase"] for phase in result["timeline"]]
+        assert phases == ["queue_wait", "prepare", "commit_queue_wait"]
+        assert result["timeline"][0]["durationMs"] >= 1000
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from anki_sync_server.tasks.celery_app import _index_task_end, _index_task_start
+from anki_sync_server.tasks.task_index import TaskIndex
+
+
+class TaskIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.index = TaskIndex(os.path.join(self.tmpdir.name, "data", "tasks.db"))
+        self.now = time.time()
+
+    def isoformat(self, timestamp):
+        return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+    def test_task_lifecycle_is_recorded(self):
+        notes = {"count": 1, "words": ["test"]}
+        self.index.record_queued("a", "add_cloze_note", notes, created_at=self.now)
+        self.index.record_started("a", "add_cloze_note", started_at=self.now + 1)
+        self.index.record_finished(
+            "a",
+            "add_cloze_note",
+            "failure",
+            {"type": "RuntimeError", "message": "TTS failed"},
+            completed_at=self.now + 2,
+        )
+
+        task = self.index.get(["a", "unknown"])["a"]
+
+        self.assertEqual("failure", task["status"])
+        self.assertEqual(notes, task["notes"])
+        self.assertEqual(self.isoformat(self.now), task["createdAt"])
+        self.assertEqual(self.isoformat(self.now + 1), task["startedAt"])
+        self.assertEqual(self.isoformat(self.now + 2), task["completedAt"])
+        self.assertEqual("TTS failed", task["error"]["message"])
+
+    def test_worker_may_record_the_task_before_the_api(self):
+        self.index.record_started("a", "add_cloze_note", started_at=self.now + 1)
+        self.index.record_finished(
+            "a", "add_cloze_note", "success", completed_at=self.now + 2
+        )
+        self.index.record_queued("a", "add_cloze_note", {"count": 1}, self.now)
+
+        task = self.index.get(["a"])["a"]
+
+        self.assertEqual("success", task["status"])
+        self.assertEqual(self.isoformat(self.now), task["createdAt"])
+        self.assertEqual(self.isoformat(self.now + 1), task["startedAt"])
+        self.assertEqual({"count": 1}, task["notes"])
+
+    def test_search_filters_and_pages_newest_first(self):
+        for age, task_id in enumerate(["e", "d", "c", "b", "a"]):
+            self.index.record_queued(task_id, "add_cloze_note", {}, self.now - age)
+            status = "failure" if task_id != "c" else "success"
+            self.index.record_finished(task_id, "add_cloze_note", status)
+
+        since = self.now - 3
+        tasks, cursor = self.index.search(status="failure", since=since, limit=2)
+        self.assertEqual(["e", "d"], [task["taskId"] for task in tasks])
+        tasks, cursor = self.index.search(
+            status="failure", since=since, limit=2, cursor=cursor
+        )
+        self.assertEqual(["b"], [task["taskId"] for task in tasks])
+        self.assertIsNone(cursor)
+
+    def test_search_by_status_uses_the_index(self):
+        self.index.search(status="failure", since=0)
+
+        with sqlite3.connect(self.index._database.path) as connection:
+            plan = connection.execute(
+                "EXPLAIN QUERY PLAN SELECT task_id FROM tasks"
+                " WHERE status = ? AND created_at >= ?"
+                " ORDER BY created_at DESC, task_id DESC",
+                ("failure", 0),
+            ).fetchall()
+
+        self.assertIn("tasks_status_created_at", " ".join(row[-1] for row in plan))
+
+    def test_old_tasks_are_pruned(self):
+        self.index.record_queued("old", "add_cloze_note", {}, self.now - 86401)
+        self.index.record_queued("new", "add_cloze_note", {}, self.now)
+
+        self.assertEqual(["new"], list(self.index.get(["old", "new"])))
+
+    def test_timing_percentiles_cover_finished_tasks_since(self):
+        for i in range(1, 101):
+            timings = {"tts": float(i), "total": float(i * 10)}
+            if i % 2:
+                timings["pre_sync"] = 5.0
+            self.index.record_finished(
+                str(i), "add_cloze_note", "success", timings=timings
+            )
+        self.index.record_finished(
+            "old", "add_cloze_note", "success", completed_at=self.now - 3600
+        )
+
+        summary = self.index.timing_percentiles(self.now - 60)
+
+        self.assertEqual(100, summary["tasks"])
+        self.assertEqual(
+            {"count": 100, "p50": 50.0, "p90": 90.0, "p99": 99.0, "max": 100.0},
+            summary["phases"]["tts"],
+        )
+        self.assertEqual(50, summary["phases"]["pre_sync"]["count"])
+        self.assertEqual(1000.0, summary["phases"]["total"]["max"])
+
+    def test_tables_without_timings_are_migrated(self):
+        os.makedirs(os.path.dirname(self.index._database.path))
+        with sqlite3.connect(self.index._database.path) as connection:
+            connection.execute(
+                "CREATE TABLE tasks (task_id TEXT PRIMARY KEY, task_name TEXT,"
+                " status TEXT NOT NULL, created_at REAL NOT NULL, started_at REAL,"
+                " completed_at REAL, notes TEXT, error TEXT)"
+            )
+        connection.close()
+
+        self.index.record_finished("a", "add_cloze_note", "success", timings={})
+        self.index.record_queued("b", "add_cloze_note", {"count": 2}, client="c")
+
+        self.assertEqual(1, self.index.timing_percentiles(self.now - 60)["tasks"])
+        self.assertEqual((2, 2), self.index.queued_notes(self.now - 60, "c"))
+
+    def test_queued_notes_count_unfinished_tasks_since(self):
+        self.index.record_queued("a", "add_cloze_notes", {"count": 3}, client="x")
+        self.index.record_queued("b", "add_cloze_note", {"count": 1}, client="y")
+        self.index.record_queued("c", "add_cloze_note", {"count": 1}, client="x")
+        self.index.record_started("c", "add_cloze_note")
+        self.index.record_queued(
+            "d", "add_cloze_note", {"count": 1}, self.now - 120, client="x"
+        )
+        self.index.record_queued("e", "add_cloze_note", {"count": 5}, client="x")
+        self.index.record_finished("e", "add_cloze_note", "success", timings={})
+        # Recorded by the worker only, without notes
+        self.index.record_started("f", "add_cloze_note")
+
+        self.assertEqual((6, 4), self.index.queued_notes(self.now - 60, "x"))
+        self.assertEqual((6, 0), self.index.queued_notes(self.now - 60))
+        self.assertEqual(5, self.index.finished_notes(self.now - 60))
+
+    def test_queued_notes_leave_out_tasks_started_before(self):
+        self.index.record_queued("a", "add_cloze_notes", {"count": 3}, client="x")
+        self.index.record_started("a", "add_cloze_notes", self.now - 600)
+        self.index.record_queued("b", "add_cloze_note", {"count": 1}, client="x")
+        self.index.record_started("b", "add_cloze_note", self.now - 10)
+        self.index.record_queued("c", "add_cloze_note", {"count": 1}, client="x")
+
+        self.assertEqual(
+            (2, 2), self.index.queued_notes(self.now - 3600, "x", self.now - 300)
+        )
+        self.assertEqual((5, 5), self.index.queued_notes(self.now - 3600, "x"))
+
+    def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.index.search(cursor="not-a-cursor")
+
+
+class IndexTaskSignalsTest(unittest.TestCase):
+    @patch("anki_sync_server.tasks.celery_app.task_index")
+    def test_prepare_stage_starts_its_commit_task(self, mock_task_index):
+        task = MagicMock()
+        task.name = "prepare_cloze_notes"
+        task.request.chain = [
+            {"task": "commit_cloze_note", "options": {"task_id": "commit-1"}}
+        ]
+
+        _index_task_start(task_id="prepare-1", task=task)
+
+        mock_task_index.record_started.assert_called_once_with(
+            "commit-1", "commit_cloze_note"
+        )
+
+    @patch("anki_sync_server.tasks.celery_app.task_index")
+    def test_unsuccessful_result_is_recorded_as_failure(self, mock_task_index):
+        task = MagicMock()
+        task.name = "add_cloze_note"
+        error = {"type": "ValidationError", "message": "Missing field"}
+
+        _index_task_end(
+            task_id="task-1",
+            task=task,
+            retval={"success": False, "error": error},
+            state="SUCCESS",
+        )
+
+        mock_task_index.record_finished.assert_called_once_with(
+            "task-1", "add_cloze_note", "failure", error, timings=None
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import hashlib
+import hmac
+import json
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from unittest.mock import MagicMock, patch
+
+from anki_sync_server.tasks.celery_app import _notify_webhooks
+from anki_sync_server.tasks.webhook_dispatcher import WebhookDispatcher
+
+
+class WebhookServer:
+    """Local webhook receiver failing the first ``failures`` requests."""
+
+    def __init__(self, failures=0):
+        self.requests = []
+        self.failures = failures
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.requests.append((dict(self.headers), body))
+                status = 500 if len(receiver.requests) <= receiver.failures else 204
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hook"
+
+    def events(self):
+        return [json.loads(body)["events"] for _, body in self.requests]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class WebhookDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.server = WebhookServer()
+        self.addCleanup(self.server.close)
+
+    def test_events_are_delivered_in_batches(self):
+        dispatcher = WebhookDispatcher(max_batch_size=2, flush_interval_seconds=60)
+
+        for task_id in ["a", "b", "c"]:
+            dispatcher.dispatch(self.server.url, {"taskId": task_id})
+
+        self.assertTrue(dispatcher.flush(timeout=5))
+        self.assertEqual(
+            [[{"taskId": "a"}, {"taskId": "b"}], [{"taskId": "c"}]],
+            self.server.events(),
+        )
+
+    def test_pending_events_are_sent_after_flush_interval(self):
+        dispatcher = WebhookDispatcher(flush_interval_seconds=0.01)
+
+        dispatcher.dispatch(self.server.url, {"taskId": "a"})
+        dispatcher.dispatch(self.server.url, {"taskId": "b"})
+
+        self.assertTrue(dispatcher.flush(timeout=5))
+        self.assertEqual(
+            [{"taskId": "a"}, {"taskId": "b"}],
+            [event for batch in self.server.events() for event in batch],
+        )
+
+    def test_failed_delivery_is_retried(self):
+        self.server.failures = 2
+        dispatcher = WebhookDispatcher(
+            flush_interval_seconds=0, initial_backoff_seconds=0.01
+        )
+
+        dispatcher.dispatch(self.server.url, {"taskId": "a"})
+
+        self.assertTrue(dispatcher.flush(timeout=5))
+        self.assertEqual([[{"taskId": "a"}]] * 3, self.server.events())
+
+    def test_delivery_is_dropped_after_max_attempts(self):
+        self.server.failures = 10
+        dispatcher = WebhookDispatcher(
+            flush_interval_seconds=0, initial_backoff_seconds=0.01, max_attempts=2
+        )
+
+        dispatcher.dispatch(self.server.url, {"taskId": "a"})
+
+        self.assertTrue(dispatcher.flush(timeout=5))
+        self.assertEqual(2, len(self.server.requests))
+
+    def test_body_is_signed_with_secret(self):
+        dispatcher = WebhookDispatcher(flush_interval_seconds=0, secret="s3cret")
+
+        dispatcher.dispatch(self.server.url, {"taskId": "a"})
+
+        self.assertTrue(dispatcher.flush(timeout=5))
+        headers, body = self.server.requests[0]
+        expected = hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+        self.assertEqual(f"sha256={expected}", headers["X-Webhook-Signature"])
+
+
+class NotifyWebhooksTest(unittest.TestCase):
+    @patch.dict("os.environ", {"WEBHOOK_URL": "https://example.com/global"})
+    @patch("anki_sync_server.tasks.celery_app.webhook_dispatcher")
+    def test_finished_task_is_sent_to_request_and_global_url(self, mock_dispatcher):
+        task = MagicMock()
+        task.name = "add_cloze_note"
+        retval = {"success": True, "noteId": 1, "cardId": 1}
+
+        _notify_webhooks(
+            task_id="task-1",
+            task=task,
+            kwargs={"callback_url": "https://example.com/hook"},
+            retval=retval,
+            state="SUCCESS",
+        )
+
+        urls = [call.args[0] for call in mock_dispatcher.dispatch.call_args_list]
+        self.assertEqual(
+            ["https://example.com/hook", "https://example.com/global"], urls
+        )
+        event = mock_dispatcher.dispatch.call_args.args[1]
+        self.assertEqual("task-1", event["taskId"])
+        self.assertEqual("success", event["status"])
+        self.assertEqual(retval, event["result"])
+
+    @patch.dict("os.environ", {"WEBHOOK_URL": ""})
+    @patch("anki_sync_server.tasks.celery_app.webhook_dispatcher")
+    def test_other_tasks_are_not_sent(self, mock_dispatcher):
+        task = MagicMock()
+        task.name = "prepare_cloze_notes"
+
+        _notify_webhooks(
+            task_id="task-1",
+            task=task,
+            kwargs={"callback_url": "https://example.com/hook"},
+            retval={},
+            state="SUCCESS",
+        )
+
+        mock_dispatcher.dispatch.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from anki_sync_server.timeline import Timeline, phase_durations, recording, timed
+
+
+class TimelineTest(unittest.TestCase):
+    def test_phases_are_relative_to_the_origin(self):
+        timeline = Timeline(origin=time.time() - 2)
+
+        with recording(timeline), timed("tts", cached=False):
+            pass
+
+        (phase,) = timeline.to_list()
+        self.assertEqual("tts", phase["phase"])
+        self.assertFalse(phase["cached"])
+        self.assertGreaterEqual(phase["startMs"], 2000)
+        self.assertLess(phase["durationMs"], 1000)
+
+    def test_nothing_is_recorded_outside_of_recording(self):
+        timeline = Timeline()
+
+        with timed("tts"):
+            pass
+
+        self.assertEqual([], timeline.to_list())
+
+    def test_recording_does_not_leak_into_other_threads(self):
+        timeline = Timeline()
+
+        def time_phase():
+            with timed("tts"):
+                pass
+
+        with recording(timeline), ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(time_phase).result()
+
+        self.assertEqual([], timeline.to_list())
+
+    def test_phase_durations_sum_each_phase(self):
+        phases = [
+            {"phase": "queue_wait", "startMs": 0, "durationMs": 50},
+            {"phase": "tts", "startMs": 50, "durationMs": 100},
+            {"phase": "tts", "startMs": 60, "durationMs": 120},
+        ]
+
+        self.assertEqual(
+            {"queue_wait": 50, "tts": 220, "total": 180}, phase_durations(phases)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
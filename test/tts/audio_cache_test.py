@@ -0,0 +1,88 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from anki_sync_server.tts.audio_cache import AudioCache
+from anki_sync_server.tts.base import TtsService
+
+
+class CountingTtsService(TtsService):
+    def __init__(self):
+        self.calls = []
+
+    def _generate_audio(self, text: str) -> bytes:
+        self.calls.append(text)
+        return text.encode("utf-8")
+
+
+class AudioCacheTest(unittest.TestCase):
+    def test_get_or_create_calls_factory_once(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            cache = AudioCache(tmpdirname)
+            calls = []
+
+            def factory():
+                calls.append(1)
+                return b"audio"
+
+            self.assertEqual(b"audio", cache.get_or_create("key", factory))
+            self.assertEqual(b"audio", cache.get_or_create("key", factory))
+            self.assertEqual(1, len(calls))
+
+    def test_cache_persists_across_instances(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            AudioCache(tmpdirname).put("key", b"audio")
+            self.assertEqual(b"audio", AudioCache(tmpdirname).get("key"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            cache = AudioCache(tmpdirname, max_bytes=10)
+            cache.put("a", b"1234")
+            cache.put("b", b"1234")
+            cache.get("a")
+            cache.put("c", b"1234")
+
+            self.assertEqual(b"1234", cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual(b"1234", cache.get("c"))
+            self.assertEqual(2, len(os.listdir(tmpdirname)))
+
+    def test_concurrent_requests_share_one_synthesis(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            cache = AudioCache(tmpdirname)
+            calls = []
+
+            def factory():
+                calls.append(1)
+                time.sleep(0.1)
+                return b"audio"
+
+            results = []
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(cache.get_or_create("key", factory))
+                )
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(1, len(calls))
+            self.assertEqual([b"audio"] * 5, results)
+
+    def test_tts_service_uses_cache_for_normalized_text(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            tts = CountingTtsService()
+            tts.set_audio_cache(AudioCache(tmpdirname))
+
+            self.assertEqual(b"hello world", tts.generate_audio("hello world"))
+            self.assertEqual(b"hello world", tts.generate_audio(" hello\n world "))
+            self.assertEqual(["hello world"], tts.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import http.client
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from anki_sync_server.tts.connection_pool import HttpsConnectionPool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    drop_after_response = False
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        body = str(self.client_address[1]).encode()
+        self.send_response(200)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Close without announcing it, like a server dropping an idle connection.
+        self.close_connection = self.drop_after_response
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpsConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        _Handler.drop_after_response = False
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _pool(self, **kwargs):
+        return HttpsConnectionPool(
+            "127.0.0.1",
+            self.server.server_address[1],
+            connection_class=http.client.HTTPConnection,
+            **kwargs
+        )
+
+    def test_connection_is_reused(self):
+        pool = self._pool()
+        ports = {pool.request("POST", "/", b"{}")[1] for _ in range(5)}
+        self.assertEqual(1, len(ports))
+
+    def test_idle_connection_is_not_reused_after_timeout(self):
+        pool = self._pool(idle_timeout_seconds=0)
+        ports = {pool.request("POST", "/", b"{}")[1] for _ in range(3)}
+        self.assertEqual(3, len(ports))
+
+    def test_reconnect_when_server_dropped_connection(self):
+        _Handler.drop_after_response = True
+        pool = self._pool()
+        status, first = pool.request("POST", "/", b"{}")
+        status, second = pool.request("POST", "/", b"{}")
+        self.assertEqual(200, status)
+        self.assertNotEqual(first, second)
+
+    def test_concurrent_requests(self):
+        pool = self._pool(max_size=2)
+        statuses = []
+        threads = [
+            threading.Thread(
+                target=lambda: statuses.append(pool.request("POST", "/", b"{}")[0])
+            )
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([200] * 10, statuses)
+
+
+if __name__ == "__main__":
+    unittest.main()
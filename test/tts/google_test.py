@@ -1,4 +1,5 @@
 import base64
+import json
 import os
 import tempfile
 import unittest
@@ -22,6 +23,26 @@ class GcpTtsServiceTest(unittest.TestCase):
             with self.assertRaises(Exception, msg="No audio content"):
                 tts.generate_audio("hello")
 
+    def test_audio_encoding_matches_file_extension(self):
+        for encoding, extension in [("MP3", "mp3"), ("OGG_OPUS", "ogg")]:
+            tts = GcpTtsService(api_key="test", audio_encoding=encoding)
+            payload = json.loads(tts._get_payload("hello"))
+            self.assertEqual(encoding, payload["audioConfig"]["audioEncoding"])
+            self.assertEqual({"text": "hello"}, payload["input"])
+            self.assertEqual(extension, tts.get_file_extension())
+
+    def test_unsupported_audio_encoding(self):
+        with self.assertRaises(ValueError):
+            GcpTtsService(api_key="test", audio_encoding="FLAC")
+
+    def test_warm_up_opens_a_pooled_connection(self):
+        connection_pool = mock.MagicMock()
+        tts = GcpTtsService(api_key="test", connection_pool=connection_pool)
+
+        tts.warm_up()
+
+        connection_pool.warm_up.assert_called_once_with()
+
 
 if __name__ == "__main__":
     unittest.main()
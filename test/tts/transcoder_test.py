@@ -0,0 +1,40 @@
+import unittest
+from unittest import mock
+
+from anki_sync_server.tts.transcoder import AudioTranscoder
+
+
+class AudioTranscoderTest(unittest.TestCase):
+    def test_requires_ffmpeg(self):
+        with mock.patch("shutil.which", return_value=None):
+            with self.assertRaises(RuntimeError):
+                AudioTranscoder()
+
+    def test_transcode_pipes_audio_through_ffmpeg(self):
+        transcoder = AudioTranscoder("ogg", ffmpeg_path="/usr/bin/ffmpeg")
+        with mock.patch("subprocess.run") as mock_run:
+            mock_run.return_value.stdout = b"ogg"
+            self.assertEqual(b"ogg", transcoder.transcode(b"wav"))
+
+        args = mock_run.call_args.args[0]
+        self.assertEqual("/usr/bin/ffmpeg", args[0])
+        self.assertIn("libopus", args)
+        self.assertIn("-af", args)
+        self.assertEqual(b"wav", mock_run.call_args.kwargs["input"])
+        self.assertEqual("ogg", transcoder.get_file_extension())
+
+    def test_transcode_without_silence_trimming(self):
+        transcoder = AudioTranscoder(
+            "mp3", trim_silence=False, ffmpeg_path="/usr/bin/ffmpeg"
+        )
+        with mock.patch("subprocess.run") as mock_run:
+            transcoder.transcode(b"wav")
+
+        args = mock_run.call_args.args[0]
+        self.assertIn("libmp3lame", args)
+        self.assertNotIn("-af", args)
+        self.assertEqual("mp3", transcoder.get_file_extension())
+
+
+if __name__ == "__main__":
+    unittest.main()